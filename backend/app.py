@@ -1,68 +1,107 @@
-from flask import Flask, jsonify
+import os
+
+from flask import Flask, current_app, g, jsonify, request
 from flask_cors import CORS
 from werkzeug.exceptions import HTTPException
 from api_errors import ApiError, error_response
+import comps
+import db
+import metrics
+import profiling
+from routes.metrics import metrics_bp
+from routes.profiles import profiles_bp
 from routes.properties import properties_bp
 from routes.scrape import scrape_bp
 
-app = Flask(__name__)
 
-# Enable CORS for localhost frontend
-CORS(
-    app,
-    origins=["http://localhost:5173"]
-)
+def create_app(config=None):
+    """
+    Build the Flask app. Nothing here connects to Postgres or AWS; the engine
+    and S3 clients are created by the first request that needs them, in
+    whichever process serves it (see db.get_engine).
+    """
+    app = Flask(__name__)
+    if config:
+        app.config.update(config)
 
-# ✅ Register blueprints BEFORE running the app
-app.register_blueprint(properties_bp)
-app.register_blueprint(scrape_bp)
+    # Enable CORS for localhost frontend
+    CORS(
+        app,
+        origins=["http://localhost:5173"]
+    )
 
-@app.get("/health")
-def health():
-    return jsonify(status="ok")
+    # one Session per request, closed at teardown
+    db.init_app(app)
+    # latency/SQL histograms for /metrics
+    metrics.init_app(app)
+    # opt-in per-request profiles; registers nothing unless PROFILE_TOKEN is set
+    profiling.init_app(app)
+    # comps index warms up in the background from each process's first request
+    comps.init_app(app)
 
-import os
+    app.register_blueprint(properties_bp)
+    app.register_blueprint(scrape_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(profiles_bp)
 
-@app.get("/whoami")
-def whoami():
-    return jsonify(
-        app_file=__file__,
-        pid=os.getpid(),
-        routes=str(app.url_map),
-    )
+    @app.get("/health")
+    def health():
+        return jsonify(status="ok")
 
-@app.errorhandler(ApiError)
-def handle_api_error(err: ApiError):
-    payload, status = error_response(err.code, err.message, err.status, err.details)
-    return jsonify(payload), status
+    @app.get("/whoami")
+    def whoami():
+        return jsonify(
+            app_file=__file__,
+            pid=os.getpid(),
+            routes=str(current_app.url_map),
+        )
 
+    register_error_handlers(app)
+    app.logger.debug("routes: %s", app.url_map)
+    return app
 
-@app.errorhandler(HTTPException)
-def handle_http_exception(err: HTTPException):
-    # Handles default Flask 404/405 etc in the same shape
-    payload, status = error_response(
-        code=err.name.upper().replace(" ", "_"),   # e.g. NOT_FOUND, METHOD_NOT_ALLOWED
-        message=err.description,
-        status=err.code or 500,
-    )
-    return jsonify(payload), status
 
+def _record_error(code: str, err: Exception, message=None):
+    # which request failed and why; picked up by the profile capture, if any
+    message = str(err) if message is None else str(message)
+    g.request_error = {"code": code, "type": type(err).__name__, "message": message[:500]}
+
+
+def register_error_handlers(app):
+    @app.errorhandler(ApiError)
+    def handle_api_error(err: ApiError):
+        # str() of the ApiError dataclass is empty
+        _record_error(err.code, err, err.message)
+        payload, status = error_response(err.code, err.message, err.status, err.details)
+        return jsonify(payload), status
+
+
+    @app.errorhandler(HTTPException)
+    def handle_http_exception(err: HTTPException):
+        # Handles default Flask 404/405 etc in the same shape
+        code = err.name.upper().replace(" ", "_")   # e.g. NOT_FOUND, METHOD_NOT_ALLOWED
+        _record_error(code, err, err.description)
+        payload, status = error_response(
+            code=code,
+            message=err.description,
+            status=err.code or 500,
+        )
+        return jsonify(payload), status
 
-@app.errorhandler(Exception)
-def handle_unhandled_exception(err: Exception):
-    # Don’t leak internals to frontend
-    payload, status = error_response(
-        code="INTERNAL_SERVER_ERROR",
-        message="An unexpected error occurred.",
-        status=500,
-    )
-    # You can still log the real exception server-side:
-    app.logger.exception(err)
-    return jsonify(payload), status
 
+    @app.errorhandler(Exception)
+    def handle_unhandled_exception(err: Exception):
+        # Don’t leak internals to frontend
+        payload, status = error_response(
+            code="INTERNAL_SERVER_ERROR",
+            message="An unexpected error occurred.",
+            status=500,
+        )
+        # You can still log the real exception server-side, with the request that raised it:
+        _record_error("INTERNAL_SERVER_ERROR", err)
+        current_app.logger.exception("%s %s raised %s", request.method, request.full_path.rstrip("?"), type(err).__name__)
+        return jsonify(payload), status
 
-# Optional: print routes at startup
-print(app.url_map)
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    create_app().run(host="0.0.0.0", port=5000, debug=True)
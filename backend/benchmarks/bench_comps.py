@@ -0,0 +1,119 @@
+"""
+Comps index build time, memory and query latency on synthetic listings,
+with every sampled query checked against a brute-force scan of its zip.
+Also times incremental inserts. Runs no queries, but importing db still
+needs DATABASE_URL set.
+
+Run from backend/:
+    python -m benchmarks.bench_comps --rows 3000000 --zips 20000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from comps import CompsIndex
+
+
+def make_listings(rows: int, zips: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    # skewed zip sizes, like real markets
+    zip_of = np.sort(rng.zipf(1.3, rows) % zips)
+    sqft = rng.integers(500, 4000, rows).astype(np.float64)
+    beds = rng.integers(1, 7, rows).astype(np.float64)
+    baths = np.round(rng.uniform(1, 4, rows) * 2) / 2
+    price = sqft * rng.uniform(80, 600, rows)
+    beds[rng.random(rows) < 0.03] = np.nan
+    baths[rng.random(rows) < 0.05] = np.nan
+
+    bounds = []
+    edges = np.flatnonzero(np.diff(zip_of)) + 1
+    starts = np.concatenate(([0], edges))
+    ends = np.concatenate((edges, [rows]))
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        bounds.append((f"{int(zip_of[start]):05d}", start, end))
+    return np.arange(1, rows + 1), bounds, sqft, beds, baths, price
+
+
+def brute_force(index, snapshot, zip_code, point, k, exclude_id):
+    start, end, _, _ = snapshot.partitions[zip_code]
+    dist = ((snapshot.points[start:end] - point) ** 2).sum(axis=1)
+    ids = snapshot.ids[start:end]
+    keep = ids != exclude_id
+    order = np.argsort(dist[keep], kind="stable")[:k]
+    return sorted(np.sqrt(dist[keep][order]).tolist())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--zips", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--inserts", type=int, default=20_000)
+    args = parser.parse_args()
+
+    ids, bounds, sqft, beds, baths, price = make_listings(args.rows, args.zips)
+    scales = [np.nanstd(sqft), np.nanstd(beds), np.nanstd(baths), np.std(np.log(price))]
+    fill = (float(np.nanmean(beds)), float(np.nanmean(baths)))
+
+    # synthetic rows: never catch up with the properties table
+    index = CompsIndex(refresh_seconds=float("inf"))
+    t0 = time.perf_counter()
+    index.build_from_arrays(ids, bounds, sqft, beds, baths, price, scales, fill)
+    build_s = time.perf_counter() - t0
+    snapshot = index._snapshot
+    largest = max(end - start for _, start, end in bounds)
+
+    rng = np.random.default_rng(7)
+    sample = rng.integers(0, args.rows, args.queries)
+    zip_by_row = np.empty(args.rows, dtype=object)
+    for zip_code, start, end in bounds:
+        zip_by_row[start:end] = zip_code
+
+    mismatches = 0
+    elapsed = []
+    for row in sample.tolist():
+        b = None if np.isnan(beds[row]) else beds[row]
+        ba = None if np.isnan(baths[row]) else baths[row]
+        t0 = time.perf_counter()
+        comps = index.nearest(zip_by_row[row], sqft[row], b, ba, price[row], k=args.k, exclude_id=int(ids[row]))
+        elapsed.append(time.perf_counter() - t0)
+
+        point = index._features(
+            np.array([sqft[row]]), np.array([beds[row]]), np.array([baths[row]]), np.array([price[row]])
+        )[0]
+        expected = brute_force(index, snapshot, zip_by_row[row], point, args.k, int(ids[row]))
+        if not np.allclose(sorted(c[1] for c in comps), expected, rtol=1e-5, atol=1e-6):
+            mismatches += 1
+
+    us = np.array(elapsed) * 1e6
+    print(f"rows:            {args.rows:,} in {len(bounds):,} zips (largest {largest:,})")
+    print(f"build:           {build_s:.2f}s")
+    print(f"index size:      {index.nbytes() / 1e6:.1f} MB ({index.nbytes() / args.rows:.1f} bytes/row)")
+    print(f"query k={args.k}:     p50 {np.percentile(us, 50):.0f} us  p99 {np.percentile(us, 99):.0f} us")
+    print(f"mismatches:      {mismatches} / {args.queries}")
+
+    # incremental inserts: tails first, then one rebuild once they pass the threshold
+    class Row:
+        __slots__ = ("id", "zip", "sqft", "beds", "baths", "price")
+
+        def __init__(self, i, row):
+            self.id, self.zip = args.rows + i + 1, zip_by_row[row]
+            self.sqft, self.beds, self.baths, self.price = float(sqft[row]), 3, 2.0, float(price[row]) * 1.01
+
+    new_rows = [Row(i, r) for i, r in enumerate(rng.integers(0, args.rows, args.inserts).tolist())]
+    t0 = time.perf_counter()
+    for start in range(0, len(new_rows), 500):
+        index.add(new_rows[start:start + 500])
+    insert_s = time.perf_counter() - t0
+    probe = new_rows[0]
+    found = {c[0] for c in index.nearest(probe.zip, probe.sqft, 3, 2.0, probe.price, k=args.k)}
+    print(f"inserts:         {args.inserts:,} in {insert_s:.2f}s, new row found as its own comp: {probe.id in found}")
+
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Photo pipeline throughput against local stand-ins: scraper.stub_source serves
+listing photos (one of a few shared stock images per listing, the rest
+unique) and s3_stub plays S3. Checks that every photo gets a row, that shared
+images were uploaded once, that a second pass uploads nothing, and that
+uploads stayed within the worker count and byte-rate cap.
+
+Inserts throwaway properties and rolls everything back at the end. Run from
+backend/ with DATABASE_URL set:
+    python -m benchmarks.bench_photos --listings 200 --photos 4 --photo-size 200000
+    python -m benchmarks.bench_photos --max-bytes-per-sec 5000000 --multipart-threshold 5242880 --photo-size 6000000 --listings 10
+"""
+import argparse
+import os
+import time
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--listings", type=int, default=200)
+    parser.add_argument("--photos", type=int, default=4, help="per listing")
+    parser.add_argument("--photo-size", type=int, default=200_000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--max-bytes-per-sec", type=int, default=0)
+    parser.add_argument("--multipart-threshold", type=int, default=8 * 1024 * 1024)
+    args = parser.parse_args()
+
+    # downloads go through the scraper's shared client; don't let its default
+    # politeness towards real hosts throttle the local stub
+    os.environ.setdefault("SCRAPE_HOST_CONCURRENCY", "16")
+    os.environ.setdefault("SCRAPE_HOST_RATE", "10000")
+    os.environ.setdefault("SCRAPE_HOST_BURST", "100")
+
+    from db import SessionLocal
+    from models import Property, PropertyPhoto
+    from photos import PhotoStore, ingest_photos
+    from s3_stub import start_s3_stub
+    from scraper.stub_source import start_stub_server, stub_listing
+
+    source = start_stub_server(rate=0, latency=0.0, photos=args.photos, photo_size=args.photo_size)
+    s3 = start_s3_stub()
+    store = PhotoStore(
+        "bench-photos",
+        endpoint_url=s3.url,
+        workers=args.workers,
+        max_bytes_per_sec=args.max_bytes_per_sec,
+        multipart_threshold=args.multipart_threshold,
+        multipart_chunksize=max(5 * 1024 * 1024, args.multipart_threshold),
+    )
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "stub")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "stub")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+    session = SessionLocal()
+    try:
+        items = [stub_listing("bench photos", i, source.url, args.photos) for i in range(args.listings)]
+        photo_urls = {item["listing_url"]: item.pop("photo_urls") for item in items}
+        for item in items:
+            item["listing_source"] = "bench-photos"
+        rows = session.execute(
+            pg_insert(Property).values(items).returning(Property.id, Property.listing_url)
+        ).all()
+        photos_by_property = {row.id: photo_urls[row.listing_url] for row in rows}
+
+        ok = True
+        for attempt in ("first", "repeat"):
+            received = s3.stats.bytes_received
+            t0 = time.perf_counter()
+            stats = ingest_photos(session, photos_by_property, store=store)
+            elapsed = time.perf_counter() - t0
+            uploaded = s3.stats.bytes_received - received
+            print(
+                f"{attempt:<7} {stats['photos']:>5} photos  {stats['distinct']:>5} distinct  "
+                f"{stats['uploaded']:>5} uploaded  {stats['reused']:>5} reused  {elapsed:6.2f}s  "
+                f"{uploaded / elapsed / 1e6:7.1f} MB/s to s3  errors {stats['download_errors']}/{stats['upload_errors']}"
+            )
+            if attempt == "first":
+                # one stock image per listing, shared across the run
+                expected = args.listings * (args.photos - 1) + min(args.listings, 7)
+                if stats["uploaded"] != expected:
+                    print(f"FAIL: uploaded {stats['uploaded']} objects, expected {expected}")
+                    ok = False
+                if args.max_bytes_per_sec and uploaded / elapsed > args.max_bytes_per_sec * 1.1:
+                    print(f"FAIL: {uploaded / elapsed:,.0f} B/s over the {args.max_bytes_per_sec:,} B/s cap")
+                    ok = False
+            elif stats["uploaded"]:
+                print(f"FAIL: repeat uploaded {stats['uploaded']} objects")
+                ok = False
+
+        count = session.query(PropertyPhoto).filter(PropertyPhoto.property_id.in_(list(photos_by_property))).count()
+        print(
+            f"rows:   {count} (expected {args.listings * args.photos})  "
+            f"s3 peak in flight {s3.stats.peak_in_flight} (workers {args.workers})  "
+            f"multipart uploads {s3.stats.multipart_uploads}"
+        )
+        if count != args.listings * args.photos or s3.stats.peak_in_flight > args.workers:
+            ok = False
+    finally:
+        session.rollback()
+        session.close()
+        store.shutdown()
+        source.shutdown()
+        s3.shutdown()
+
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
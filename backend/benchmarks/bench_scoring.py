@@ -0,0 +1,75 @@
+"""
+Scalar vs vectorized scoring throughput.
+
+Run from backend/:
+    python -m benchmarks.bench_scoring --rows 50000
+"""
+import argparse
+import random
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+
+from scoring import compute_analysis, compute_analysis_batch, needs_rehab
+
+DESCRIPTIONS = [
+    "Solid brick home near ferry. Needs light rehab.",
+    "Large single-family with basement unit.",
+    "Fixer-upper with strong rental upside.",
+    "Cash-flow oriented BRRR candidate.",
+    "Classic BRRR market with strong rents.",
+    None,
+]
+
+
+def make_rows(n: int, seed: int = 42):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        rows.append(SimpleNamespace(
+            id=i + 1,
+            price=None if rng.random() < 0.03 else Decimal(str(rng.randrange(80000, 900000, 500))),
+            beds=None if rng.random() < 0.03 else rng.randint(0, 6),
+            sqft=None if rng.random() < 0.05 else rng.randint(500, 4000),
+            description=rng.choice(DESCRIPTIONS),
+            market_ppsf=None if rng.random() < 0.1 else rng.uniform(80, 600),
+            comp_arv=None if rng.random() < 0.5 else float(rng.randrange(80000, 1200000)),
+        ))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+
+    t0 = time.perf_counter()
+    scalar = [compute_analysis(r, r.market_ppsf, r.comp_arv) for r in rows]
+    scalar_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batch = compute_analysis_batch(
+        [r.price for r in rows],
+        [r.beds for r in rows],
+        [r.sqft for r in rows],
+        [needs_rehab(r.description) for r in rows],
+        [r.market_ppsf for r in rows],
+        [r.comp_arv for r in rows],
+    )
+    batch_s = time.perf_counter() - t0
+
+    mismatches = sum(1 for a, b in zip(scalar, batch) if a != b)
+
+    print(f"rows:        {args.rows}")
+    print(f"scalar:      {args.rows / scalar_s:,.0f} rows/s ({scalar_s:.3f}s)")
+    print(f"vectorized:  {args.rows / batch_s:,.0f} rows/s ({batch_s:.3f}s)")
+    print(f"mismatches:  {mismatches}")
+
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Scraper throughput and politeness against the local stub source.
+
+Starts scraper.stub_source in-process (latency per request, 429s past its
+rate limit), then scrapes it once sequentially (one request in flight) and
+once through the concurrent runner with the configured host policy, and
+checks the server never saw more requests in flight or per second than the
+policy allows. Finally scrapes the same query twice through a fresh fetch
+cache (with and without server ETags) and reports how many pages and body
+bytes the repeat saved. No database needed.
+
+Run from backend/:
+    python -m benchmarks.bench_scraper --results 1000 --latency 0.05 --rate 20
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+from scraper.base import HostPolicy
+from scraper.fetch_cache import FetchCache
+from scraper.http import PoliteClient
+from scraper.runner import iter_source_pages
+from scraper.stub_source import StubHttpAdapter, start_stub_server
+
+
+async def _run(url, policy, query, results):
+    http = PoliteClient(policy)
+    try:
+        t0 = time.perf_counter()
+        items = []
+        async for _, _, page, _ in iter_source_pages(http, StubHttpAdapter(url), query, results):
+            items.extend(page.items)
+        return items, time.perf_counter() - t0, http.retry_count
+    finally:
+        await http.aclose()
+
+
+def bench(label, policy, args):
+    server = start_stub_server(latency=args.latency, rate=args.server_rate, total=args.results)
+    try:
+        items, elapsed, retries = asyncio.run(_run(server.url, policy, label, args.results))
+    finally:
+        server.shutdown()
+        server.server_close()
+    stats = server.stats
+    print(
+        f"{label:<11} {len(items):>6} items  {elapsed:6.2f}s  {len(items) / elapsed:8.0f} items/s  "
+        f"requests {stats.requests:>4}  429s {stats.rejected:>3}  retries {retries:>3}  "
+        f"peak in flight {stats.peak_in_flight:>2}  max req/s {stats.max_rate():>3}"
+    )
+    return items, elapsed, stats
+
+
+async def _cached_pass(url, policy, query, results, cache):
+    http = PoliteClient(policy, cache=cache)
+    hits = misses = 0
+    keys = []
+    try:
+        async for _, _, page, _ in iter_source_pages(http, StubHttpAdapter(url), query, results):
+            hits += page.cache_hit
+            misses += not page.cache_hit
+            if not page.cache_hit and not page.partial:
+                keys.append(page.cache_key)
+    finally:
+        await http.aclose()
+    # what execute_scrape_run does once the batch is committed
+    cache.mark_ingested(keys)
+    return hits, misses
+
+
+def bench_repeat(label, policy, args, etags):
+    server = start_stub_server(latency=args.latency, rate=args.server_rate, total=args.results, etags=etags)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            cache = FetchCache(directory, 1024 * 1024)
+            for attempt in ("first", "repeat"):
+                before = server.stats.bytes_sent
+                t0 = time.perf_counter()
+                hits, misses = asyncio.run(_cached_pass(server.url, policy, label, args.results, cache))
+                print(
+                    f"{label:<11} {attempt:<7} hits {hits:>3}  misses {misses:>3}  "
+                    f"{time.perf_counter() - t0:5.2f}s  {server.stats.bytes_sent - before:>9,} body bytes"
+                )
+    finally:
+        server.shutdown()
+        server.server_close()
+    return hits, misses
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--results", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub seconds per request")
+    parser.add_argument("--server-rate", type=float, default=20.0, help="stub 429s above this req/s")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=15.0, help="client req/s per host")
+    parser.add_argument("--burst", type=int, default=5)
+    args = parser.parse_args()
+
+    # pages are StubHttpAdapter.page_size (25); sequential is unthrottled, one at a time
+    sequential = HostPolicy(concurrency=1, rate=1000, burst=1, max_retries=5)
+    concurrent = HostPolicy(concurrency=args.concurrency, rate=args.rate, burst=args.burst, max_retries=5)
+
+    seq_items, seq_s, _ = bench("sequential", sequential, args)
+    con_items, con_s, stats = bench("concurrent", concurrent, args)
+
+    ok = True
+    if len(con_items) != args.results or len({i["listing_url"] for i in con_items}) != args.results:
+        print(f"FAIL: expected {args.results} distinct items, got {len(con_items)}")
+        ok = False
+    if stats.peak_in_flight > args.concurrency:
+        print(f"FAIL: {stats.peak_in_flight} requests in flight, limit {args.concurrency}")
+        ok = False
+    # a full bucket can add `burst` on top of one second's refill
+    if stats.max_rate() > args.rate + args.burst:
+        print(f"FAIL: {stats.max_rate()} req/s served, limit {args.rate}/s + burst {args.burst}")
+        ok = False
+    print(f"speedup:    {seq_s / con_s:.1f}x")
+
+    for label, etags in (("etag/304", True), ("body hash", False)):
+        hits, misses = bench_repeat(label, concurrent, args, etags)
+        if misses:
+            print(f"FAIL: {label} repeat fetched {misses} unchanged pages")
+            ok = False
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
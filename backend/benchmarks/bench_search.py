@@ -0,0 +1,88 @@
+"""
+Trigram search vs the old four-column ILIKE scan.
+
+Loads synthetic rows (listing_source='bench-search') until the table holds
+--rows of them, runs ANALYZE, then times each query shape per search term.
+Needs DATABASE_URL and the 357025dc9e36 migration.
+
+Run from backend/:
+    python -m benchmarks.bench_search --rows 1000000
+    python -m benchmarks.bench_search --cleanup
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import text
+
+from benchmarks.synthetic import delete_properties, load_properties
+from db import engine
+
+BENCH_SOURCE = "bench-search"
+
+TERMS = ["newark", "forest ave", "maple st scranton", "fixer", "scrantn", "zz-no-match"]
+
+QUERIES = {
+    "ilike_4col_count": """
+        SELECT count(*) FROM properties
+        WHERE address ILIKE :like OR city ILIKE :like OR state ILIKE :like OR zip ILIKE :like
+    """,
+    "trgm_like_count": """
+        SELECT count(*) FROM properties
+        WHERE search_document LIKE lower(:like)
+    """,
+    "ilike_4col_page": """
+        SELECT id FROM properties
+        WHERE address ILIKE :like OR city ILIKE :like OR state ILIKE :like OR zip ILIKE :like
+        ORDER BY created_at DESC LIMIT 20
+    """,
+    "trgm_like_page": """
+        SELECT id FROM properties
+        WHERE search_document LIKE lower(:like)
+        ORDER BY created_at DESC LIMIT 20
+    """,
+    "trgm_ranked_top10": """
+        SELECT id FROM properties
+        WHERE search_document %> :q
+        ORDER BY search_document <->> :q LIMIT 10
+    """,
+}
+
+
+def time_query(sql: str, params: dict, repeat: int):
+    timings = []
+    matches = None
+    with engine.connect() as conn:
+        conn.execute(text("SET pg_trgm.word_similarity_threshold = 0.4"))
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            result = conn.execute(text(sql), params).all()
+            timings.append((time.perf_counter() - t0) * 1000)
+            matches = result[0][0] if sql.lstrip().lower().startswith("select count") else len(result)
+    return statistics.median(timings), matches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cleanup", action="store_true", help="delete benchmark rows and exit")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        print(f"deleted {delete_properties(BENCH_SOURCE):,} benchmark rows")
+        return
+
+    print(f"loading up to {args.rows:,} benchmark rows...")
+    load_properties(args.rows, BENCH_SOURCE)
+
+    print(f"\n{'term':<20} {'query':<20} {'median ms':>10} {'rows':>10}")
+    for term in TERMS:
+        params = {"q": term, "like": f"%{term}%"}
+        for name, sql in QUERIES.items():
+            ms, matches = time_query(sql, params, args.repeat)
+            print(f"{term:<20} {name:<20} {ms:>10.2f} {matches:>10,}")
+
+
+if __name__ == "__main__":
+    main()
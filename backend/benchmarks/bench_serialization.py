@@ -0,0 +1,81 @@
+"""
+ORM + to_dict() + jsonify vs column projection + serialization.dumps for
+one GET /properties page.
+
+Both paths run the same query against the same rows. The CPU column is
+process time (Python-side hydration and encoding); the wall column also
+includes the database round trip. Needs DATABASE_URL and existing rows
+(see benchmarks.synthetic).
+
+Run from backend/:
+    python -m benchmarks.bench_serialization --page-size 100 --repeat 200
+"""
+import argparse
+import time
+
+from flask import jsonify
+
+from app import create_app
+from db import SessionLocal
+from models import AnalysisResult, Property
+from serialization import ANALYSIS_LIST_COLUMNS, PROPERTY_LIST_COLUMNS, dumps, property_rows_to_dicts
+
+
+def orm_page(session, page_size, with_analysis):
+    query = session.query(Property)
+    if with_analysis:
+        query = query.add_entity(AnalysisResult).outerjoin(
+            AnalysisResult, AnalysisResult.property_id == Property.id
+        )
+    rows = query.order_by(Property.created_at.desc(), Property.id.desc()).limit(page_size).all()
+    if with_analysis:
+        items = [{**p.to_dict(), "analysis": a.to_dict() if a else None} for p, a in rows]
+    else:
+        items = [p.to_dict() for p in rows]
+    body = jsonify({"items": items}).get_data()
+    # what a request-scoped session pays at teardown
+    session.expunge_all()
+    return body
+
+
+def projection_page(session, page_size, with_analysis):
+    query = session.query(*PROPERTY_LIST_COLUMNS)
+    if with_analysis:
+        query = query.add_columns(*ANALYSIS_LIST_COLUMNS).outerjoin(
+            AnalysisResult, AnalysisResult.property_id == Property.id
+        )
+    rows = query.order_by(Property.created_at.desc(), Property.id.desc()).limit(page_size).all()
+    return dumps({"items": property_rows_to_dicts(rows, with_analysis)})
+
+
+def _time(fn, session, repeat, *args):
+    fn(session, *args)  # warm-up: compiled-statement cache, connection
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    for _ in range(repeat):
+        fn(session, *args)
+    return (time.process_time() - cpu0) / repeat, (time.perf_counter() - wall0) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        with create_app().app_context():
+            for with_analysis in (False, True):
+                label = "include=analysis" if with_analysis else "properties only"
+                orm_cpu, orm_wall = _time(orm_page, session, args.repeat, args.page_size, with_analysis)
+                proj_cpu, proj_wall = _time(projection_page, session, args.repeat, args.page_size, with_analysis)
+                print(f"{label}, page_size={args.page_size}")
+                print(f"  orm + jsonify:       cpu {orm_cpu * 1000:7.2f} ms  wall {orm_wall * 1000:7.2f} ms")
+                print(f"  projection + dumps:  cpu {proj_cpu * 1000:7.2f} ms  wall {proj_wall * 1000:7.2f} ms")
+                print(f"  cpu speedup:         {orm_cpu / proj_cpu:.1f}x")
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
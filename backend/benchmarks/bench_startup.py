@@ -0,0 +1,95 @@
+"""
+Cold-start cost of the API: each run is a fresh interpreter that times
+`import app`, create_app(), the first request (GET /health, no database)
+and the first database request (GET /properties, which opens the pool).
+Reports the median of --runs. Also checks that a worker forked after the
+parent used the database gets its own connection rather than the parent's.
+
+Run from backend/ (the database request and fork check need DATABASE_URL):
+    python -m benchmarks.bench_startup --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs in a fresh interpreter; prints one JSON line of timings in seconds
+PROBE = """
+import json, os, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+flask_app = app.create_app()
+t2 = time.perf_counter()
+client = flask_app.test_client()
+assert client.get("/health").status_code == 200
+t3 = time.perf_counter()
+timings = {"import": t1 - t0, "create_app": t2 - t1, "first_request": t3 - t2}
+timings["engine_before_db_request"] = sys.modules["db"]._engine is not None
+if os.getenv("DATABASE_URL"):
+    assert client.get("/properties?page_size=1&total=none").status_code == 200
+    timings["first_db_request"] = time.perf_counter() - t3
+print(json.dumps(timings))
+"""
+
+FORK_CHECK = """
+import os
+from sqlalchemy import text
+from db import SessionLocal
+
+def backend_pid():
+    session = SessionLocal()
+    try:
+        return session.execute(text("select pg_backend_pid()")).scalar()
+    finally:
+        session.close()
+
+parent = backend_pid()
+read, write = os.pipe()
+child = os.fork()
+if child == 0:
+    os.write(write, str(backend_pid()).encode())
+    os._exit(0)
+os.waitpid(child, 0)
+forked = int(os.read(read, 32))
+print(parent, forked, backend_pid())
+"""
+
+
+def _run(code):
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND, capture_output=True, text=True, check=True,
+    )
+    return out.stdout.strip().splitlines()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [json.loads(_run(PROBE)) for _ in range(args.runs)]
+    for name in ("import", "create_app", "first_request", "first_db_request"):
+        values = [r[name] for r in runs if name in r]
+        if values:
+            print(f"{name:<17} median {statistics.median(values) * 1000:8.1f} ms  "
+                  f"max {max(values) * 1000:8.1f} ms")
+    if any(r["engine_before_db_request"] for r in runs):
+        print("FAIL: the engine was created before the first database request")
+        raise SystemExit(1)
+
+    if os.getenv("DATABASE_URL") and hasattr(os, "fork"):
+        parent, forked, parent_again = map(int, _run(FORK_CHECK).split())
+        print(f"fork check:       parent backend {parent}, forked worker backend {forked}, "
+              f"parent after fork {parent_again}")
+        if forked == parent or parent_again != parent:
+            print("FAIL: forked worker shared the parent's connection")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
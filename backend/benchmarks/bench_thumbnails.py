@@ -0,0 +1,60 @@
+"""
+Variant derivation throughput on the house_drawing.jpg fixture: images per
+second in one process, then through the thumbnails ProcessPoolExecutor,
+reported per core. Also lists the variant sizes one image produces.
+Needs no database or S3; importing thumbnails still needs DATABASE_URL set.
+
+Run from backend/:
+    python -m benchmarks.bench_thumbnails --images 200 --workers 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+from imaging import derive_variants
+from thumbnails import THUMBNAIL_FORMATS, THUMBNAIL_QUALITY, THUMBNAIL_WEBP_METHOD, THUMBNAIL_WIDTHS
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "house_drawing.jpg")
+
+
+def _derive(data):
+    return derive_variants(data, THUMBNAIL_WIDTHS, THUMBNAIL_FORMATS, THUMBNAIL_QUALITY, THUMBNAIL_WEBP_METHOD)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--fixture", default=FIXTURE)
+    args = parser.parse_args()
+
+    with open(args.fixture, "rb") as f:
+        data = f.read()
+
+    width, height, variants = _derive(data)
+    print(f"fixture:   {os.path.basename(args.fixture)} {width}x{height}, {len(data):,} bytes")
+    for v_width, v_height, fmt, out in variants:
+        print(f"  {fmt:<5} {v_width:>5}x{v_height:<5} {len(out):>9,} bytes")
+
+    t0 = time.perf_counter()
+    for _ in range(args.images):
+        _derive(data)
+    serial = args.images / (time.perf_counter() - t0)
+    print(f"serial:    {serial:6.1f} images/s (1 core)")
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+        # warm up the workers so process start-up isn't timed
+        list(pool.map(_derive, [data] * args.workers))
+        t0 = time.perf_counter()
+        list(pool.map(_derive, [data] * args.images))
+        pooled = args.images / (time.perf_counter() - t0)
+    cores = min(args.workers, os.cpu_count() or 1)
+    print(f"pool:      {pooled:6.1f} images/s with {args.workers} workers on {os.cpu_count()} cores "
+          f"({pooled / cores:.1f} images/s/core)")
+
+
+if __name__ == "__main__":
+    main()
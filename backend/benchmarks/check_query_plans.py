@@ -0,0 +1,170 @@
+"""
+Query-plan regression check for the property list/detail queries.
+
+Seeds synthetic rows (listing_source='bench-plans'), builds the same
+queries the routes build for every combination of the supported filters
+and sorts, and runs EXPLAIN on each. A case fails when its plan contains
+- a Seq Scan on properties, property_photos or analysis_results, or
+- a Sort over more than --sort-rows-limit estimated input rows
+  (a top-N sort of a handful of index matches is fine).
+
+Exits 1 when any case fails, so it can gate CI. Needs DATABASE_URL.
+
+Run from backend/:
+    python -m benchmarks.check_query_plans --rows 200000
+"""
+import argparse
+import itertools
+import json
+import sys
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+from sqlalchemy import func
+
+from benchmarks.synthetic import delete_properties, load_photos, load_properties, load_scores
+from db import SessionLocal
+from models import AnalysisResult, Property, PropertyPhoto
+from routes.properties import LIST_SORTS, _apply_cursor, _apply_filters, _encode_cursor, _order_by, _parse_filters
+
+BENCH_SOURCE = "bench-plans"
+CHECKED_TABLES = {"properties", "property_photos", "analysis_results"}
+FILTER_KEYS = ["q", "min_price", "max_price", "min_beds", "min_score"]
+
+
+def _case_filters(keys):
+    # Representative, selective values. max_price alone is a "cheap homes"
+    # query; combined with min_price it becomes a narrow window.
+    args = {}
+    if "q" in keys:
+        args["q"] = "rochester"
+    if "min_price" in keys:
+        args["min_price"] = 850000
+    if "max_price" in keys:
+        args["max_price"] = 860000 if "min_price" in keys else 150000
+    if "min_beds" in keys:
+        args["min_beds"] = 6
+    if "min_score" in keys:
+        args["min_score"] = 95
+    return _parse_filters(args)
+
+
+def build_cases(session):
+    cases = []
+    # a cursor from the middle of each ordering, as the route would issue it
+    cursors = {
+        "newest": _encode_cursor(
+            SimpleNamespace(id=2**31 - 1, created_at=datetime.now(timezone.utc)), "newest"
+        ),
+        "score_desc": _encode_cursor(SimpleNamespace(id=2**31 - 1, score_total=Decimal("50")), "score_desc"),
+    }
+
+    for n in range(len(FILTER_KEYS) + 1):
+        for keys in itertools.combinations(FILTER_KEYS, n):
+            label = "+".join(keys) or "no filters"
+            filters = _case_filters(keys)
+            base = _apply_filters(session.query(Property), filters)
+
+            for sort in LIST_SORTS:
+                ordered = base.order_by(*_order_by(sort))
+                cases.append((f"page 1 sort={sort} [{label}]", ordered.limit(21)))
+                cases.append((
+                    f"cursor page sort={sort} [{label}]",
+                    _apply_cursor(ordered, sort, cursors[sort]).limit(21),
+                ))
+            # an unfiltered count reads the whole table by definition;
+            # GET /properties serves it from the count cache or reltuples
+            if keys:
+                cases.append((f"count [{label}]", base.with_entities(func.count(Property.id))))
+
+    cases.append((
+        "detail photos",
+        session.query(PropertyPhoto)
+        .filter(PropertyPhoto.property_id == 1)
+        .order_by(PropertyPhoto.sort_order),
+    ))
+    cases.append((
+        "detail analysis",
+        session.query(AnalysisResult).filter(AnalysisResult.property_id == 1),
+    ))
+    return cases
+
+
+def explain(session, query):
+    compiled = query.statement.compile(dialect=session.bind.dialect)
+    plan = session.connection().exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def _walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def plan_problems(plan, sort_rows_limit):
+    problems = []
+    for node in _walk(plan):
+        node_type = node["Node Type"]
+        if node_type == "Seq Scan" and node.get("Relation Name") in CHECKED_TABLES:
+            problems.append(f"Seq Scan on {node['Relation Name']}")
+        if node_type in ("Sort", "Incremental Sort"):
+            input_rows = max((c["Plan Rows"] for c in node.get("Plans", [])), default=0)
+            if input_rows > sort_rows_limit:
+                problems.append(f"{node_type} over ~{input_rows:,} rows")
+    return problems
+
+
+def _summary(plan):
+    nodes = []
+    for node in _walk(plan):
+        name = node["Node Type"]
+        if node.get("Index Name"):
+            name += f" ({node['Index Name']})"
+        nodes.append(name)
+    return " > ".join(nodes)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--sort-rows-limit", type=int, default=1000)
+    parser.add_argument("--verbose", action="store_true", help="print the plan shape of every case")
+    parser.add_argument("--cleanup", action="store_true", help="delete the seeded rows afterwards")
+    args = parser.parse_args()
+
+    print(f"seeding up to {args.rows:,} rows...")
+    load_properties(args.rows, BENCH_SOURCE)
+    load_photos(BENCH_SOURCE)
+    load_scores(BENCH_SOURCE)
+
+    session = SessionLocal()
+    failures = 0
+    try:
+        for name, query in build_cases(session):
+            plan = explain(session, query)
+            problems = plan_problems(plan, args.sort_rows_limit)
+            if problems:
+                failures += 1
+                print(f"FAIL  {name}: {', '.join(problems)}")
+                print(f"      {_summary(plan)}")
+            else:
+                print(f"ok    {name}")
+                if args.verbose:
+                    print(f"      {_summary(plan)}")
+    finally:
+        session.close()
+        if args.cleanup:
+            delete_properties(BENCH_SOURCE)
+
+    print(f"\n{failures} failing case(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+API load suite: latency percentiles and throughput per endpoint at several
+data sizes, as JSON that can be diffed across commits.
+
+For each --sizes entry (ascending; data is topped up, never regenerated)
+it loads synthetic properties tagged listing_source='bench-load' with
+photos and analyses (benchmarks.synthetic), then drives each scenario with
+--concurrency closed-loop clients for --duration seconds against the API
+running in a child process (or an existing server with --url). Each
+scenario starts with one untimed request (reported as cold_ms), and the
+first --warmup seconds are not recorded. Latency percentiles and
+throughput cover 2xx responses only; everything else is counted in
+non_2xx (and statuses), so fast rejections cannot pass for fast requests.
+
+scrape_run is paced at --scrape-rate runs/s with fewer clients than the
+scrape queue has slots (SCRAPE_WORKERS + SCRAPE_QUEUE_DEPTH), so it
+measures enqueuing a run rather than the 429 from a full queue. The suite
+waits for the queued runs to finish before moving on.
+
+Needs only DATABASE_URL and a migrated local Postgres: the API runs with
+create_app() on werkzeug's threaded server, and scrape runs use the mock
+source. Scrape runs insert mock listings, so that scenario runs last.
+
+Run from backend/:
+    python -m benchmarks.load --sizes 10000,100000,1000000 --concurrency 8 --out load.json
+    python -m benchmarks.load --sizes 10000 --duration 5 --scenarios detail,list_newest
+    python -m benchmarks.load --cleanup
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import httpx
+from sqlalchemy import text
+
+BENCH_SOURCE = "bench-load"
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEARCH_TERMS = ["newark", "maple st", "forest ave", "scranton", "fixer", "cash-flow rental"]
+
+
+# ---- scenarios: (rng, ctx) -> (method, path, json body or None) ----
+
+def list_newest(rng, ctx):
+    return "GET", "/properties?page_size=20", None
+
+
+def list_filtered(rng, ctx):
+    low = rng.randrange(100_000, 600_000, 50_000)
+    return "GET", (
+        f"/properties?page_size=20&total_mode=estimate&min_price={low}"
+        f"&max_price={low + 200_000}&min_beds={rng.randint(1, 4)}"
+    ), None
+
+
+def list_search(rng, ctx):
+    return "GET", f"/properties?page_size=20&q={rng.choice(SEARCH_TERMS)}", None
+
+
+def list_score(rng, ctx):
+    return "GET", "/properties?page_size=20&sort=score_desc&include=analysis&total_mode=none", None
+
+
+def list_deep_page(rng, ctx):
+    # OFFSET pagination near the end of the bench rows
+    page = max(1, int(ctx["size"] / 20 * rng.uniform(0.5, 1.0)))
+    return "GET", f"/properties?page_size=20&total_mode=none&page={page}", None
+
+
+def detail(rng, ctx):
+    return "GET", f"/properties/{rng.choice(ctx['ids'])}", None
+
+
+def analyze(rng, ctx):
+    return "POST", f"/properties/{rng.choice(ctx['ids'])}/analyze?force=true", None
+
+
+def scrape_run(rng, ctx):
+    return "POST", "/scrape/run", {
+        "query": f"load {rng.randrange(1_000_000)}", "max_results": 20, "sources": ["mock"],
+    }
+
+
+SCENARIOS = {
+    "list_newest": list_newest,
+    "list_filtered": list_filtered,
+    "list_search": list_search,
+    "list_score": list_score,
+    "list_deep_page": list_deep_page,
+    "detail": detail,
+    "analyze": analyze,
+    "scrape_run": scrape_run,
+}
+
+
+# ---- measurement ----
+
+def percentile(sorted_values, p):
+    # nearest rank
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def drive(base_url, scenario, ctx, concurrency, duration, warmup, seed, rate=None):
+    build = SCENARIOS[scenario]
+    # one request first, on its own: lazily built state (comps index, market
+    # stats) would otherwise stall every worker's first request
+    method, path, body = build(random.Random(f"{seed}-{scenario}-cold"), ctx)
+    t0 = time.perf_counter()
+    httpx.request(method, base_url + path, json=body, timeout=300)
+    cold_ms = (time.perf_counter() - t0) * 1000
+
+    started = time.perf_counter()
+    record_from = started + warmup
+    deadline = record_from + duration
+    latencies, statuses, transport_errors = [], {}, 0
+    lock = threading.Lock()
+    # with a rate, each client sends one request every `interval` seconds
+    interval = concurrency / rate if rate else 0.0
+
+    def worker(n):
+        nonlocal transport_errors
+        rng = random.Random(f"{seed}-{scenario}-{n}")
+        local, local_statuses, local_errors = [], {}, 0
+        next_at = started + interval * n / concurrency
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            while True:
+                if interval:
+                    time.sleep(max(0.0, next_at - time.perf_counter()))
+                    next_at += interval
+                t0 = time.perf_counter()
+                if t0 >= deadline:
+                    break
+                method, path, body = build(rng, ctx)
+                try:
+                    status = client.request(method, path, json=body).status_code
+                except httpx.HTTPError:
+                    status = None
+                t1 = time.perf_counter()
+                if t0 < record_from:
+                    continue
+                if status is None:
+                    local_errors += 1
+                    continue
+                local_statuses[status] = local_statuses.get(status, 0) + 1
+                if 200 <= status < 300:
+                    local.append((t1 - t0) * 1000)
+        with lock:
+            latencies.extend(local)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+            transport_errors += local_errors
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    completed = len(latencies)
+    return {
+        "scenario": scenario,
+        "requests": completed,
+        "throughput_rps": round(completed / duration, 2),
+        "concurrency": concurrency,
+        "rate": rate,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "non_2xx": sum(v for k, v in statuses.items() if not 200 <= k < 300),
+        "errors": transport_errors + sum(v for k, v in statuses.items() if k >= 500),
+        "cold_ms": _round(cold_ms),
+        "latency_ms": {
+            "p50": _round(percentile(latencies, 50)),
+            "p95": _round(percentile(latencies, 95)),
+            "p99": _round(percentile(latencies, 99)),
+            "max": _round(latencies[-1] if latencies else None),
+            "mean": _round(sum(latencies) / completed if completed else None),
+        },
+    }
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+# ---- data and server ----
+
+def prepare(size, seed, verbose):
+    from benchmarks.synthetic import load_photos, load_properties, load_scores
+    from db import engine
+
+    t0 = time.perf_counter()
+    load_properties(size, BENCH_SOURCE, verbose=verbose)
+    load_photos(BENCH_SOURCE)
+    load_scores(BENCH_SOURCE)
+    load_seconds = time.perf_counter() - t0
+    with engine.connect() as conn:
+        conn.execute(text("SELECT setseed(:s)"), {"s": (seed % 1000) / 1000})
+        ids = [pid for (pid,) in conn.execute(text(
+            "SELECT id FROM properties WHERE listing_source = :s ORDER BY random() LIMIT 2000"
+        ), {"s": BENCH_SOURCE})]
+        total = conn.execute(text("SELECT count(*) FROM properties")).scalar()
+    return {"size": size, "ids": ids, "total_rows": total, "load_seconds": round(load_seconds, 1)}
+
+
+SERVER = """
+import logging, sys
+logging.getLogger("werkzeug").setLevel(logging.ERROR)
+from werkzeug.serving import run_simple
+from app import create_app
+run_simple("127.0.0.1", int(sys.argv[1]), create_app(), threaded=True)
+"""
+
+
+def start_server(port):
+    proc = subprocess.Popen([sys.executable, "-c", SERVER, str(port)], cwd=BACKEND)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(base_url + "/health", timeout=1).status_code == 200:
+                return proc, base_url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise SystemExit("API did not start")
+
+
+def scrape_capacity():
+    # same env as the API child process
+    from scrape_jobs import SCRAPE_QUEUE_DEPTH, SCRAPE_WORKERS
+    return SCRAPE_WORKERS + SCRAPE_QUEUE_DEPTH
+
+
+def wait_for_scrape_runs(base_url, since, timeout=300):
+    """Wait until no scrape run started after `since` is queued or running."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        items = httpx.get(base_url + "/scrape/runs", timeout=30).json()["items"]
+        # older runs may be stuck from a killed server; they are not ours to wait for
+        if not any(
+            item["status"] in ("queued", "running") and datetime.fromisoformat(item["started_at"]) >= since
+            for item in items
+        ):
+            return True
+        time.sleep(1)
+    return False
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds recorded per scenario")
+    parser.add_argument("--warmup", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scrape-rate", type=float, default=1.0, help="scrape_run requests per second")
+    parser.add_argument("--url", help="drive an already running API instead of starting one")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--cleanup", action="store_true", help="delete the bench-load rows and exit")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        from benchmarks.synthetic import delete_properties
+        print(f"deleted {delete_properties(BENCH_SOURCE):,} rows")
+        return
+
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"unknown scenarios: {', '.join(unknown)} (available: {', '.join(SCENARIOS)})")
+    # scrape runs add rows; keep them from skewing the other scenarios
+    scenarios.sort(key=lambda s: s == "scrape_run")
+
+    proc, base_url = (None, args.url) if args.url else start_server(args.port)
+    report = {
+        "commit": _commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "concurrency": args.concurrency, "duration": args.duration, "warmup": args.warmup,
+            "seed": args.seed, "scrape_rate": args.scrape_rate, "url": base_url if args.url else None,
+        },
+        "results": [],
+    }
+    try:
+        for size in sizes:
+            print(f"size {size:,}: loading", file=sys.stderr)
+            ctx = prepare(size, args.seed, verbose=False)
+            for scenario in scenarios:
+                concurrency, rate = args.concurrency, None
+                if scenario == "scrape_run":
+                    # stay under the queue's slots so runs are enqueued, not rejected
+                    concurrency = max(1, min(concurrency, scrape_capacity() // 2))
+                    rate = args.scrape_rate
+                since = datetime.now(timezone.utc)
+                result = drive(base_url, scenario, ctx, concurrency, args.duration, args.warmup, args.seed, rate)
+                if scenario == "scrape_run" and not wait_for_scrape_runs(base_url, since):
+                    print("  scrape runs still queued after 300s", file=sys.stderr)
+                result.update(size=size, total_rows=ctx["total_rows"])
+                report["results"].append(result)
+                lat = result["latency_ms"]
+                print(
+                    f"  {scenario:<15} {result['throughput_rps']:8.1f} req/s  p50 {lat['p50']} ms  "
+                    f"p95 {lat['p95']} ms  p99 {lat['p99']} ms  non-2xx {result['non_2xx']}  errors {result['errors']}",
+                    file=sys.stderr,
+                )
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    body = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(body + "\n")
+    else:
+        print(body)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Server-side synthetic property loader shared by the benchmarks.
+
+Rows are generated with generate_series inside Postgres and tagged with a
+listing_source so each benchmark can top up or delete its own data.
+"""
+import time
+
+from sqlalchemy import text
+
+from db import engine
+
+INSERT_BATCH = 100_000
+
+INSERT_SQL = text("""
+    INSERT INTO properties (
+        listing_source, listing_url, address, city, state, zip,
+        price, beds, baths, sqft, description, created_at
+    )
+    SELECT
+        :source,
+        'https://bench.example.com/' || :source || '/' || g,
+        (g % 9999 + 1) || ' '
+            || (ARRAY['Main','Oak','Pine','Maple','Cedar','Elm','Forest','Bay','Market','Park'])[g % 10 + 1] || ' '
+            || (ARRAY['St','Ave','Rd','Ln','Dr'])[g % 5 + 1],
+        (ARRAY['Newark','Staten Island','Scranton','Buffalo','Rochester','Trenton','Paterson','Albany'])[g % 8 + 1],
+        (ARRAY['NJ','NY','PA','NY','NY','NJ','NJ','NY'])[g % 8 + 1],
+        lpad(((g * 7919) % 99999)::text, 5, '0'),
+        100000 + (g * 37) % 800000,
+        1 + g % 6,
+        1 + (g % 3) * 0.5,
+        600 + (g * 13) % 3400,
+        (ARRAY['Fixer-upper with upside.','Move-in ready.','Needs TLC.','Cash-flow rental.','Two-unit with basement.'])[g % 5 + 1]
+            || ' Ref ' || substr(md5(g::text), 1, 10),
+        now() - make_interval(secs => g)
+    FROM generate_series(:start, :stop) AS g
+    ON CONFLICT (listing_url) DO NOTHING
+""")
+
+
+def count_properties(source: str) -> int:
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT count(*) FROM properties WHERE listing_source = :s"), {"s": source}
+        ).scalar()
+
+
+def load_properties(rows: int, source: str, verbose: bool = True):
+    """Top up properties tagged `source` until there are `rows` of them, then ANALYZE."""
+    start = count_properties(source) + 1
+    while start <= rows:
+        stop = min(rows, start + INSERT_BATCH - 1)
+        t0 = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(INSERT_SQL, {"source": source, "start": start, "stop": stop})
+        if verbose:
+            print(f"  loaded {stop:,} rows ({time.perf_counter() - t0:.1f}s for batch)")
+        start = stop + 1
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE properties"))
+
+
+PHOTOS_SQL = text("""
+    INSERT INTO property_photos (property_id, photo_url, sort_order)
+    SELECT p.id, 'https://picsum.photos/seed/brrrr-' || p.id || '-' || n || '/800/600', n
+    FROM properties p
+    CROSS JOIN generate_series(1, :per_property) AS n
+    WHERE p.listing_source = :source
+      AND NOT EXISTS (SELECT 1 FROM property_photos ph WHERE ph.property_id = p.id)
+""")
+
+
+def load_photos(source: str, per_property: int = 3):
+    """Give every property tagged `source` that has no photos `per_property` of them."""
+    with engine.begin() as conn:
+        conn.execute(PHOTOS_SQL, {"source": source, "per_property": per_property})
+        conn.execute(text("ANALYZE property_photos"))
+
+
+SCORES_SQL = text("""
+    WITH scored AS (
+        INSERT INTO analysis_results (property_id, score_total, score_breakdown, reasons)
+        SELECT p.id, ((p.id::bigint * 7919) % 10000) / 100.0, '{}'::jsonb, '[]'::jsonb
+        FROM properties p
+        WHERE p.listing_source = :source
+          AND NOT EXISTS (SELECT 1 FROM analysis_results a WHERE a.property_id = p.id)
+        RETURNING property_id, score_total
+    )
+    UPDATE properties p
+    SET score_total = scored.score_total
+    FROM scored
+    WHERE p.id = scored.property_id
+""")
+
+
+def load_scores(source: str):
+    """Give every property tagged `source` without an analysis a synthetic one (and its score copy)."""
+    with engine.begin() as conn:
+        conn.execute(SCORES_SQL, {"source": source})
+    # the UPDATE leaves a dead tuple per row; vacuum so plans reflect a settled table
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE analysis_results"))
+        conn.execute(text("VACUUM ANALYZE properties"))
+
+
+def delete_properties(source: str) -> int:
+    # property_photos / analysis_results go with them (ON DELETE CASCADE)
+    with engine.begin() as conn:
+        return conn.execute(
+            text("DELETE FROM properties WHERE listing_source = :s"), {"s": source}
+        ).rowcount
@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Small thread-safe in-process cache with per-entry expiry and an LRU size bound."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    """
+    Shared cache in Redis for values that must agree across worker processes.
+
+    Values are bytes. Pass `client` to use any object with the redis-py
+    get/set/delete/scan_iter API (e.g. a fakeredis instance in tests).
+    """
+
+    def __init__(self, ttl_seconds: float, url: str = None, prefix: str = "brrrr:", client=None):
+        if client is None:
+            import redis  # optional dependency, only needed for this backend
+
+            client = redis.Redis.from_url(url or "redis://localhost:6379/0")
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self._client = client
+
+    def get(self, key, default=None):
+        value = self._client.get(self.prefix + key)
+        return default if value is None else value
+
+    def set(self, key, value):
+        self._client.set(self.prefix + key, value, ex=max(1, int(self.ttl_seconds)))
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def delete_many(self, keys):
+        keys = [self.prefix + k for k in keys]
+        for start in range(0, len(keys), 1000):
+            self._client.delete(*keys[start:start + 1000])
+
+    def clear(self):
+        for key in self._client.scan_iter(match=self.prefix + "*"):
+            self._client.delete(key)
+
+
+def make_cache(backend: str, ttl_seconds: float, max_entries: int = 1024, url: str = None, prefix: str = "brrrr:"):
+    if backend == "memory":
+        return TTLCache(ttl_seconds=ttl_seconds, max_entries=max_entries)
+    if backend == "redis":
+        return RedisCache(ttl_seconds=ttl_seconds, url=url, prefix=prefix)
+    raise ValueError(f"Unknown cache backend {backend!r} (expected 'memory' or 'redis')")
+
+
+# Exact GET /properties totals keyed by normalized filters.
+# Cleared whenever ingest inserts rows; the TTL bounds staleness across processes.
+property_count_cache = TTLCache(
+    ttl_seconds=float(os.getenv("PROPERTY_COUNT_TTL", "30")),
+    max_entries=int(os.getenv("PROPERTY_COUNT_CACHE_SIZE", "1024")),
+)
+
+# Serialized GET /properties/<id> payloads, keyed "property:<id>" and stamped
+# with the property/analysis updated_at they were built from.
+property_detail_cache = make_cache(
+    os.getenv("DETAIL_CACHE_BACKEND", "memory"),
+    ttl_seconds=float(os.getenv("DETAIL_CACHE_TTL", "300")),
+    max_entries=int(os.getenv("DETAIL_CACHE_SIZE", "10000")),
+    url=os.getenv("DETAIL_CACHE_URL"),
+    prefix="brrrr:detail:",
+)
@@ -0,0 +1,538 @@
+"""
+In-memory comparable-property index.
+
+Listings with a price and sqft are embedded as 4-d points (sqft, beds,
+baths, log price, each divided by its standard deviation) and partitioned
+by zip. Each partition is a KD-tree with bucket leaves, stored implicitly:
+every partition's points live in one contiguous slice of shared NumPy
+arrays, sorted into tree order, and a node only needs its split dimension
+and value. No per-row Python objects, so a few million listings take tens
+of MB.
+
+Rows added after the build go to a small per-zip tail that queries scan
+directly; once the tails grow past COMPS_REBUILD_FRACTION of the index it
+is rebuilt from the arrays (no database round trip). Every process keeps
+its own index, so each one catches up with listings inserted elsewhere
+(other workers, generate_data.py) by scanning properties past the highest
+id it has seen: before scoring, and at most every COMPS_REFRESH_SECONDS
+for plain comps queries.
+
+Web processes load the index in a background thread started by their
+first request; until it is ready, comps queries and analyses answer 503
+rather than scoring without comps.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from array import array
+
+import numpy as np
+from sqlalchemy import text
+
+from api_errors import ApiError
+from db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+COMPS_DEFAULT_K = 10
+COMPS_MAX_K = 50
+COMPS_LEAF_SIZE = int(os.getenv("COMPS_LEAF_SIZE", "32"))
+COMPS_REBUILD_FRACTION = float(os.getenv("COMPS_REBUILD_FRACTION", "0.1"))
+# fewer comps than this and the scorer falls back to the formula ARV
+COMPS_MIN_FOR_ARV = int(os.getenv("COMPS_MIN_FOR_ARV", "3"))
+COMPS_REFRESH_SECONDS = float(os.getenv("COMPS_REFRESH_SECONDS", "10"))
+# ids are allocated at insert but become visible at commit, out of order:
+# each catch-up rescans this many ids below the high-water mark
+COMPS_LOOKBACK_IDS = int(os.getenv("COMPS_LOOKBACK_IDS", "2000"))
+COMPS_LOAD_BATCH = 50_000
+# the initial search radius comes from the 2**_SEED_LEVELS leaves around the query
+_SEED_LEVELS = 3
+
+_LOAD_SQL = """
+SELECT id, zip, sqft, beds, baths, price
+FROM properties
+WHERE price > 0 AND sqft > 0
+ORDER BY zip, id
+"""
+
+_CATCH_UP_SQL = """
+SELECT id, zip, sqft, beds, baths, price
+FROM properties
+WHERE id > :after AND price > 0 AND sqft > 0
+ORDER BY id
+"""
+
+_SCALES_SQL = """
+SELECT stddev_samp(sqft), stddev_samp(beds), stddev_samp(baths), stddev_samp(ln(price)),
+       avg(beds), avg(baths)
+FROM properties
+WHERE price > 0 AND sqft > 0
+"""
+
+
+# ---- static KD-tree over one partition ----
+
+def _tree_depth(n: int, leaf_size: int) -> int:
+    return max(0, math.ceil(math.log2(n / leaf_size))) if n > leaf_size else 0
+
+
+def _build_tree(points, leaf_size):
+    """
+    Returns (order, split_dim, split_val). `order` permutes the partition
+    into tree order; node i has children 2i+1 / 2i+2 and splits its range at
+    the midpoint, so ranges are implied and never stored. Nodes at index
+    >= len(split_dim) are leaves of at most leaf_size points.
+    """
+    n = len(points)
+    n_nodes = 2 ** _tree_depth(n, leaf_size) - 1
+    order = np.arange(n)
+    split_dim = np.zeros(n_nodes, dtype=np.int8)
+    split_val = np.zeros(n_nodes, dtype=np.float32)
+
+    stack = [(0, 0, n)]
+    while stack:
+        node, lo, hi = stack.pop()
+        if node >= n_nodes:
+            continue
+        idx = order[lo:hi]
+        sub = points[idx]
+        dim = int(np.argmax(sub.max(axis=0) - sub.min(axis=0)))
+        mid = (lo + hi) // 2
+        order[lo:hi] = idx[np.argpartition(sub[:, dim], mid - lo)]
+        split_dim[node] = dim
+        split_val[node] = points[order[mid], dim]
+        stack.append((2 * node + 1, lo, mid))
+        stack.append((2 * node + 2, mid, hi))
+
+    return order, split_dim, split_val
+
+
+class _Snapshot:
+    """Immutable arrays of one build. Partition rows are contiguous."""
+
+    __slots__ = ("ids", "points", "ppsf", "split_dim", "split_val", "partitions")
+
+    def __init__(self, ids, points, ppsf, split_dim, split_val, partitions):
+        self.ids = ids
+        self.points = points
+        self.ppsf = ppsf
+        self.split_dim = split_dim
+        self.split_val = split_val
+        # zip -> (row_start, row_end, node_start, node_count)
+        self.partitions = partitions
+
+    @classmethod
+    def build(cls, ids, points, ppsf, zip_bounds, leaf_size):
+        """zip_bounds: [(zip, start, end)] over rows already grouped by zip."""
+        out_ids = np.empty_like(ids)
+        out_points = np.empty_like(points)
+        out_ppsf = np.empty_like(ppsf)
+        dims, vals = [], []
+        partitions = {}
+        node_start = 0
+
+        for zip_code, start, end in zip_bounds:
+            order, split_dim, split_val = _build_tree(points[start:end], leaf_size)
+            order += start
+            out_ids[start:end] = ids[order]
+            out_points[start:end] = points[order]
+            out_ppsf[start:end] = ppsf[order]
+            if len(split_dim):
+                dims.append(split_dim)
+                vals.append(split_val)
+            partitions[zip_code] = (start, end, node_start, len(split_dim))
+            node_start += len(split_dim)
+
+        # The tree walk reads one split at a time from Python: array.array
+        # is as compact as NumPy but indexes to plain ints/floats, several
+        # times faster than NumPy scalar access.
+        split_dims = array("b", np.concatenate(dims).tobytes() if dims else b"")
+        split_vals = array("f", np.concatenate(vals).tobytes() if vals else b"")
+        return cls(out_ids, out_points, out_ppsf, split_dims, split_vals, partitions)
+
+    def nbytes(self):
+        arrays = sum(a.nbytes for a in (self.ids, self.points, self.ppsf))
+        return arrays + len(self.split_dim) * self.split_dim.itemsize + len(self.split_val) * self.split_val.itemsize
+
+    def _distances(self, lo, hi, point, exclude_id):
+        positions = np.arange(lo, hi)
+        dist = ((self.points[lo:hi] - point) ** 2).sum(axis=1)
+        if exclude_id is not None:
+            keep = self.ids[lo:hi] != exclude_id
+            positions, dist = positions[keep], dist[keep]
+        return dist, positions
+
+    def query(self, zip_code, point, k, exclude_id=None):
+        """(squared distances, row positions) of the k nearest rows in the zip."""
+        part = self.partitions.get(zip_code)
+        if part is None:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        start, end, node_start, n_nodes = part
+        q = point.tolist()
+
+        if n_nodes == 0:
+            dist, positions = self._distances(start, end, point, exclude_id)
+        else:
+            # 1) descend towards the query's leaf; the k-th distance within
+            # the subtree a few levels above it bounds the search
+            path = [(start, end)]
+            node, lo, hi = 0, start, end
+            while node < n_nodes:
+                mid = (lo + hi) // 2
+                if q[self.split_dim[node_start + node]] < self.split_val[node_start + node]:
+                    node, hi = 2 * node + 1, mid
+                else:
+                    node, lo = 2 * node + 2, mid
+                path.append((lo, hi))
+            lo, hi = path[max(0, len(path) - 1 - _SEED_LEVELS)]
+            dist, _ = self._distances(lo, hi, point, exclude_id)
+            radius = float(np.partition(dist, k - 1)[k - 1]) if len(dist) >= k else math.inf
+
+            # 2) every leaf whose box may hold something closer, in plain
+            # Python. bound is the squared distance to the node's box, kept
+            # incrementally from per-dimension offsets (Arya & Mount).
+            ranges = []
+            stack = [(0, start, end, 0.0, (0.0, 0.0, 0.0, 0.0))]
+            while stack:
+                node, lo, hi, bound, offsets = stack.pop()
+                if bound > radius:
+                    continue
+                if node >= n_nodes:
+                    ranges.append((lo, hi))
+                    continue
+                mid = (lo + hi) // 2
+                dim = self.split_dim[node_start + node]
+                diff = q[dim] - self.split_val[node_start + node]
+                far_offsets = offsets[:dim] + (diff,) + offsets[dim + 1:]
+                far_bound = bound - offsets[dim] * offsets[dim] + diff * diff
+                if diff < 0:
+                    stack.append((2 * node + 2, mid, hi, far_bound, far_offsets))
+                    stack.append((2 * node + 1, lo, mid, bound, offsets))
+                else:
+                    stack.append((2 * node + 1, lo, mid, far_bound, far_offsets))
+                    stack.append((2 * node + 2, mid, hi, bound, offsets))
+
+            # 3) one vectorized pass over the candidate rows
+            positions = np.concatenate([np.arange(lo, hi) for lo, hi in ranges])
+            dist = ((self.points[positions] - point) ** 2).sum(axis=1)
+            if exclude_id is not None:
+                keep = self.ids[positions] != exclude_id
+                positions, dist = positions[keep], dist[keep]
+
+        if len(dist) > k:
+            keep = np.argpartition(dist, k - 1)[:k]
+            dist, positions = dist[keep], positions[keep]
+        return dist, positions
+
+
+# ---- index ----
+
+class CompsIndex:
+    def __init__(self, leaf_size: int = COMPS_LEAF_SIZE, refresh_seconds: float = COMPS_REFRESH_SECONDS):
+        self.leaf_size = leaf_size
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._scales = None  # divisors for (sqft, beds, baths, ln price)
+        self._fill = None  # beds/baths used when missing
+        self._tail = {}  # zip -> [(id, point, ppsf)]
+        self._tail_size = 0
+        self._pending = {}  # tail being merged by a rebuild, still searched
+        self._rebuild_lock = threading.Lock()
+        self._high_water = 0  # largest indexed property id
+        self._recent = set()  # indexed ids within COMPS_LOOKBACK_IDS of it
+        self._checked_at = 0.0
+        self._catch_up_lock = threading.Lock()
+        self._loader = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    # ---- building ----
+
+    def _features(self, sqft, beds, baths, price):
+        raw = np.column_stack((
+            sqft,
+            np.where(np.isnan(beds), self._fill[0], beds),
+            np.where(np.isnan(baths), self._fill[1], baths),
+            np.log(price),
+        ))
+        return (raw / self._scales).astype(np.float32)
+
+    def build_from_arrays(self, ids, zip_bounds, sqft, beds, baths, price, scales, fill):
+        """Arrays are row-aligned and grouped by zip as described by zip_bounds."""
+        self._scales = np.where(np.asarray(scales, dtype=np.float64) > 0, scales, 1.0)
+        self._fill = fill
+        points = self._features(sqft, beds, baths, price)
+        ppsf = (price / sqft).astype(np.float32)
+        ids = np.asarray(ids, dtype=np.int64)
+        snapshot = _Snapshot.build(ids, points, ppsf, zip_bounds, self.leaf_size)
+        high_water = int(ids.max()) if len(ids) else 0
+        with self._catch_up_lock:
+            with self._lock:
+                self._snapshot = snapshot
+                self._tail, self._pending = {}, {}
+                self._tail_size = 0
+            self._high_water = high_water
+            self._recent = set(ids[ids > high_water - COMPS_LOOKBACK_IDS].tolist())
+            self._checked_at = time.monotonic()
+
+    def load(self, session):
+        """Build from the properties table, streamed in batches (no ORM objects)."""
+        scales_row = session.execute(text(_SCALES_SQL)).one()
+        scales = [float(v) if v is not None else 1.0 for v in scales_row[:4]]
+        fill = (float(scales_row[4] or 0), float(scales_row[5] or 0))
+
+        id_parts, num_parts, zip_bounds = [], [], []
+        current_zip, zip_start, n = None, 0, 0
+        result = session.execute(text(_LOAD_SQL), execution_options={"yield_per": COMPS_LOAD_BATCH})
+        for rows in result.partitions():
+            for offset, row in enumerate(rows):
+                if row.zip != current_zip:
+                    if current_zip is not None:
+                        zip_bounds.append((current_zip, zip_start, n + offset))
+                    current_zip, zip_start = row.zip, n + offset
+            id_parts.append(np.fromiter((r.id for r in rows), dtype=np.int64, count=len(rows)))
+            num_parts.append(np.array(
+                [(r.sqft, r.beds, r.baths, r.price) for r in rows], dtype=np.float64
+            ).reshape(len(rows), 4))
+            n += len(rows)
+        if current_zip is not None:
+            zip_bounds.append((current_zip, zip_start, n))
+
+        ids = np.concatenate(id_parts) if id_parts else np.zeros(0, dtype=np.int64)
+        nums = np.concatenate(num_parts) if num_parts else np.zeros((0, 4))
+        self.build_from_arrays(ids, zip_bounds, nums[:, 0], nums[:, 1], nums[:, 2], nums[:, 3], scales, fill)
+        logger.info("comps index: %s listings in %s zips, %.1f MB", n, len(zip_bounds), self.nbytes() / 1e6)
+
+    def ensure_loaded(self):
+        if self._snapshot is not None:
+            return
+        with _load_lock:
+            if self._snapshot is None:
+                session = SessionLocal()
+                try:
+                    self.load(session)
+                finally:
+                    session.close()
+
+    def start_loading(self):
+        """ensure_loaded in a background thread, unless loaded or already loading."""
+        if self._snapshot is not None or self._loader is not None:
+            return
+        with self._lock:
+            if self._loader is not None:
+                return
+            self._loader = threading.Thread(target=self._background_load, name="comps-index-load", daemon=True)
+        self._loader.start()
+
+    def _background_load(self):
+        try:
+            self.ensure_loaded()
+        except Exception:
+            logger.exception("comps index load failed; the next request retries")
+        finally:
+            self._loader = None
+
+    def _require_loaded(self):
+        if self._snapshot is None:
+            self.start_loading()
+            raise ApiError(
+                code="COMPS_INDEX_LOADING",
+                message="The comps index is still loading, retry shortly",
+                status=503,
+            )
+
+    def nbytes(self):
+        return self._snapshot.nbytes() if self._snapshot is not None else 0
+
+    # ---- incremental inserts ----
+
+    def add(self, rows):
+        """rows: objects with id, zip, sqft, beds, baths, price. Ignored until the index is loaded."""
+        if self._snapshot is None:
+            return
+        rows = [r for r in rows if r.price and r.sqft]
+        if not rows:
+            return
+
+        def col(name):
+            return np.array([np.nan if getattr(r, name) is None else float(getattr(r, name)) for r in rows])
+
+        sqft, price = col("sqft"), col("price")
+        points = self._features(sqft, col("beds"), col("baths"), price)
+        ppsf = (price / sqft).astype(np.float32)
+
+        with self._lock:
+            for r, point, p in zip(rows, points, ppsf):
+                self._tail.setdefault(r.zip, []).append((r.id, point, p))
+            self._tail_size += len(rows)
+            rebuild = self._tail_size > COMPS_REBUILD_FRACTION * max(len(self._snapshot.ids), 1)
+        if rebuild:
+            self._rebuild()
+
+    def catch_up(self, session) -> int:
+        """
+        Add listings committed since the last check, by any process. Ids
+        within COMPS_LOOKBACK_IDS of the high-water mark are rescanned, since
+        a lower id can commit after a higher one; those already indexed are
+        skipped. Returns the number of rows added.
+        """
+        if self._snapshot is None:
+            return 0
+        with self._catch_up_lock:
+            rows = session.execute(
+                text(_CATCH_UP_SQL), {"after": self._high_water - COMPS_LOOKBACK_IDS}
+            ).all()
+            self._checked_at = time.monotonic()
+            new = [r for r in rows if r.id not in self._recent]
+            if not new:
+                return 0
+            self._high_water = max(self._high_water, rows[-1].id)
+            self._recent.update(r.id for r in new)
+            if len(self._recent) > 2 * COMPS_LOOKBACK_IDS:
+                floor = self._high_water - COMPS_LOOKBACK_IDS
+                self._recent = {i for i in self._recent if i > floor}
+            self.add(new)
+        return len(new)
+
+    def refresh(self, session):
+        """Before scoring: the index must be loaded and include every committed listing."""
+        self._require_loaded()
+        self.catch_up(session)
+
+    def _maybe_catch_up(self):
+        # plain comps queries check at most every refresh_seconds, and never
+        # wait for a check another thread is running
+        if time.monotonic() - self._checked_at < self.refresh_seconds:
+            return
+        if self._catch_up_lock.locked():
+            return
+        session = SessionLocal()
+        try:
+            self.catch_up(session)
+        except Exception:
+            logger.exception("comps index catch-up failed")
+        finally:
+            session.close()
+
+    def _rebuild(self):
+        # Merge the tails into fresh arrays; until the swap, queries keep
+        # using the old snapshot and also search the tail being merged.
+        with self._rebuild_lock:
+            with self._lock:
+                snapshot, tail = self._snapshot, self._tail
+                self._pending = tail
+                self._tail, self._tail_size = {}, 0
+            rebuilt = self._merge_tail(snapshot, tail)
+            with self._lock:
+                self._snapshot = rebuilt
+                self._pending = {}
+
+    def _merge_tail(self, snapshot, tail):
+
+        ids, points, ppsf, zip_bounds = [], [], [], []
+        n = 0
+        for zip_code in sorted(set(snapshot.partitions) | set(tail)):
+            start, end, _, _ = snapshot.partitions.get(zip_code, (0, 0, 0, 0))
+            extra = tail.get(zip_code, [])
+            ids.append(snapshot.ids[start:end])
+            points.append(snapshot.points[start:end])
+            ppsf.append(snapshot.ppsf[start:end])
+            if extra:
+                ids.append(np.array([e[0] for e in extra], dtype=np.int64))
+                points.append(np.array([e[1] for e in extra], dtype=np.float32))
+                ppsf.append(np.array([e[2] for e in extra], dtype=np.float32))
+            size = end - start + len(extra)
+            zip_bounds.append((zip_code, n, n + size))
+            n += size
+
+        return _Snapshot.build(
+            np.concatenate(ids), np.concatenate(points), np.concatenate(ppsf), zip_bounds, self.leaf_size
+        )
+
+    # ---- queries ----
+
+    def nearest(self, zip_code, sqft, beds, baths, price, k=COMPS_DEFAULT_K, exclude_id=None):
+        """[(property_id, distance, price_per_sqft)] of the k most similar listings in the zip."""
+        self._require_loaded()
+        self._maybe_catch_up()
+        if not price or not sqft:
+            return []
+        scales = self._scales
+        point = np.array([
+            float(sqft) / scales[0],
+            (self._fill[0] if beds is None else float(beds)) / scales[1],
+            (self._fill[1] if baths is None else float(baths)) / scales[2],
+            math.log(float(price)) / scales[3],
+        ], dtype=np.float32)
+
+        with self._lock:
+            snapshot = self._snapshot
+            extra = list(self._pending.get(zip_code, ())) + list(self._tail.get(zip_code, ()))
+
+        dist, pos = snapshot.query(zip_code, point, k, exclude_id)
+        found = list(zip(snapshot.ids[pos].tolist(), dist.tolist(), snapshot.ppsf[pos].tolist()))
+        for pid, p, ppsf in extra:
+            if pid != exclude_id:
+                found.append((pid, float(((p - point) ** 2).sum()), float(ppsf)))
+
+        found.sort(key=lambda f: (f[1], f[0]))
+        return [(pid, math.sqrt(d), ppsf) for pid, d, ppsf in found[:k]]
+
+    def arv_estimate(self, property_id, zip_code, sqft, beds, baths, price, k=COMPS_DEFAULT_K):
+        """Median comp $/sqft times the subject's sqft; None with too few comps."""
+        comps = self.nearest(zip_code, sqft, beds, baths, price, k=k, exclude_id=property_id)
+        if len(comps) < COMPS_MIN_FOR_ARV:
+            return None
+        return float(np.median([c[2] for c in comps])) * float(sqft)
+
+
+_load_lock = threading.Lock()
+
+comps_index = CompsIndex()
+
+
+def init_app(app):
+    # each process starts loading on its first request, of any kind
+    app.before_request(comps_index.start_loading)
+
+
+def mark_comps_stale(session, property_ids) -> int:
+    """
+    New listings are comps for the rest of their zip, so the comps ARV of
+    those properties may have moved. Drop the scoring version of analyses
+    in the zips of the given (new) properties that can be comps, as
+    market_stats does when a median moves, so the next re-analysis run
+    rescores them. The caller commits. Returns the number of analyses marked.
+    """
+    if not property_ids:
+        return 0
+    zips = session.execute(
+        text("""
+            SELECT DISTINCT zip FROM properties
+            WHERE id = ANY(:ids) AND price IS NOT NULL AND sqft IS NOT NULL
+        """),
+        {"ids": list(property_ids)},
+    ).scalars().all()
+    return mark_zips_stale(session, zips)
+
+
+def mark_zips_stale(session, zips) -> int:
+    """mark_comps_stale for whole zips, e.g. after a bulk load."""
+    if not zips:
+        return 0
+    return session.execute(
+        text("""
+            UPDATE analysis_results AS a
+            SET scoring_version = NULL, updated_at = a.updated_at
+            FROM properties AS p
+            WHERE a.property_id = p.id
+              AND a.scoring_version IS NOT NULL
+              AND p.zip = ANY(:zips)
+        """),
+        {"zips": list(zips)},
+    ).rowcount
@@ -1,4 +1,10 @@
+from sqlalchemy import text
+
 from db import engine
 from models import Base
 
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+# gin_trgm_ops on properties.search_document needs the extension first
+with engine.begin() as conn:
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+Base.metadata.create_all(bind=engine)
@@ -1,26 +1,195 @@
+"""
+Engine and sessions, created on first use.
+
+Importing this module touches neither the database nor DATABASE_URL, so the
+app, CLIs and tests import cheaply and only pay for a connection pool when
+they open a session. The engine is per process: a worker forked from a
+parent that already had one (gunicorn --preload, multiprocessing fork)
+builds its own pool instead of sharing the parent's sockets.
+
+Request handlers use get_session(): one Session per request, closed by the
+teardown hook init_app() installs. Background jobs and CLIs open their own
+with SessionLocal().
+
+The pool is sized by DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT and
+instrumented (pool_status(), served on /metrics/db): time spent waiting for
+a connection, checkouts that found the pool exhausted, overflow connections,
+timeouts and failed pre-pings. A slow request with near-zero wait is a slow
+query; one with high wait and starved checkouts is a pool that is too small
+or held too long.
+"""
 import os
+import threading
+import time
+
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from flask import g
+from sqlalchemy import create_engine, event, exc
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import QueuePool
 
 class Base(DeclarativeBase):
     pass
 
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
 
-if not DATABASE_URL:
-    raise RuntimeError("DATABASE_URL is not set")
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-)
+class PoolStats:
+    """Connection pool counters for this process."""
+
+    FIELDS = (
+        "checkouts", "starved_checkouts", "wait_seconds_total", "wait_seconds_max",
+        "timeouts", "connects", "overflow_connects", "pre_ping_failures", "invalidations",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            for name in self.FIELDS:
+                setattr(self, name, 0)
+
+    def record_checkout(self, waited: float, starved: bool, timed_out: bool):
+        with self._lock:
+            self.checkouts += 1
+            self.starved_checkouts += starved
+            self.timeouts += timed_out
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def incr(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: getattr(self, name) for name in self.FIELDS}
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times every checkout; recreate() (dispose) keeps the class."""
+
+    def _do_get(self):
+        # racy read, but only used to label the checkout
+        starved = self._pool.empty() and self._overflow >= self._max_overflow
+        t0 = time.perf_counter()
+        try:
+            entry = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.record_checkout(time.perf_counter() - t0, starved, True)
+            raise
+        pool_stats.record_checkout(time.perf_counter() - t0, starved, False)
+        return entry
+
+
+def _instrument(engine):
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        pool_stats.incr("connects")
+        # connections past pool_size are overflow; they are closed on checkin
+        if engine.pool.overflow() > 0:
+            pool_stats.incr("overflow_connects")
 
-SessionLocal = sessionmaker(
-    bind=engine,
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        pool_stats.incr("invalidations")
+        # a failed pool_pre_ping invalidates with InvalidatePoolError
+        if isinstance(exception, exc.InvalidatePoolError):
+            pool_stats.incr("pre_ping_failures")
+
+
+_engine = None
+_engine_pid = None
+_lock = threading.Lock()
+
+_sessionmaker = sessionmaker(
     autoflush=False,
     autocommit=False,
-)
\ No newline at end of file
+)
+
+
+def get_engine():
+    global _engine, _engine_pid
+    pid = os.getpid()
+    if _engine is not None and _engine_pid == pid:
+        return _engine
+    with _lock:
+        if _engine is None:
+            database_url = os.getenv("DATABASE_URL")
+            if not database_url:
+                raise RuntimeError("DATABASE_URL is not set")
+            _engine = create_engine(
+                database_url,
+                pool_pre_ping=True,
+                poolclass=InstrumentedQueuePool,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+            )
+            _instrument(_engine)
+        elif _engine_pid != pid:
+            # forked: start an empty pool, leaving the parent's connections
+            # open for the parent
+            _engine.dispose(close=False)
+            pool_stats.reset()
+        _engine_pid = pid
+        return _engine
+
+
+def SessionLocal(**kw):
+    """A new Session on this process's engine."""
+    return _sessionmaker(bind=get_engine(), **kw)
+
+
+def get_session():
+    """The current request's Session, opened on first use."""
+    if "db_session" not in g:
+        g.db_session = SessionLocal()
+    return g.db_session
+
+
+def close_session(error=None):
+    # close() rolls back whatever the handler left uncommitted
+    session = g.pop("db_session", None)
+    if session is not None:
+        session.close()
+
+
+def init_app(app):
+    app.teardown_appcontext(close_session)
+
+
+def pool_status() -> dict:
+    """Pool configuration, current occupancy and counters for this process."""
+    status = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "checked_out": 0,
+        "checked_in": 0,
+        "overflow": 0,
+    }
+    if _engine is not None and _engine_pid == os.getpid():
+        pool = _engine.pool
+        status["checked_out"] = pool.checkedout()
+        status["checked_in"] = pool.checkedin()
+        status["overflow"] = max(pool.overflow(), 0)
+    status.update(pool_stats.snapshot())
+    return status
+
+
+def __getattr__(name):
+    # `from db import engine` still works; the engine is created on that access
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,150 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, Numeric
+from sqlalchemy.dialects.postgresql import JSONB
+
+from serialization import (
+    ANALYSIS_LIST_COLUMNS,
+    PROPERTY_LIST_COLUMNS,
+    dumps,
+    property_rows_to_dicts,
+)
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+EXPORT_MIMETYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+# rows per server-side cursor fetch, and per Parquet row group
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+
+
+def export_columns(with_analysis: bool):
+    return PROPERTY_LIST_COLUMNS + (ANALYSIS_LIST_COLUMNS if with_analysis else ())
+
+
+def _flat_keys(with_analysis: bool):
+    # CSV/Parquet are flat: analysis fields keep their analysis_ labels
+    return [c.key for c in export_columns(with_analysis)]
+
+
+# ---- NDJSON: same item shape as GET /properties ----
+
+def ndjson_chunks(batches, with_analysis: bool):
+    for rows in batches:
+        yield b"".join(dumps(item) for item in property_rows_to_dicts(rows, with_analysis))
+
+
+# ---- CSV ----
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+
+def csv_chunks(batches, with_analysis: bool):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(_flat_keys(with_analysis))
+
+    for rows in batches:
+        writer.writerows([_csv_value(v) for v in row] for row in rows)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+# ---- Parquet ----
+
+def load_pyarrow():
+    """Import pyarrow, or return None when it isn't installed."""
+    try:
+        import pyarrow  # optional dependency, only needed for format=parquet
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return None
+    return pyarrow
+
+
+class _StreamSink(io.RawIOBase):
+    """Write-only file that hands its bytes back out instead of keeping them."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        # the Parquet writer records absolute offsets in the footer
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_field(pa, column):
+    sql_type = column.type
+    if isinstance(sql_type, Integer):
+        return pa.field(column.key, pa.int64()), None
+    if isinstance(sql_type, Numeric):
+        # float64, like the JSON API
+        return pa.field(column.key, pa.float64()), lambda v: float(v) if v is not None else None
+    if isinstance(sql_type, DateTime):
+        return pa.field(column.key, pa.timestamp("us", tz="UTC")), None
+    if isinstance(sql_type, JSONB):
+        return pa.field(column.key, pa.string()), lambda v: json.dumps(v, separators=(",", ":")) if v is not None else None
+    return pa.field(column.key, pa.string()), None
+
+
+def parquet_chunks(batches, with_analysis: bool):
+    pa = load_pyarrow()
+    fields, converters = zip(*(_arrow_field(pa, c) for c in export_columns(with_analysis)))
+    schema = pa.schema(fields)
+
+    sink = _StreamSink()
+    writer = pa.parquet.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        # one row group per fetched batch, flushed to the client right away
+        for rows in batches:
+            arrays = []
+            for i, (field, convert) in enumerate(zip(fields, converters)):
+                values = [row[i] for row in rows]
+                if convert is not None:
+                    values = [convert(v) for v in values]
+                arrays.append(pa.array(values, type=field.type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+EXPORT_WRITERS = {
+    "ndjson": ndjson_chunks,
+    "csv": csv_chunks,
+    "parquet": parquet_chunks,
+}
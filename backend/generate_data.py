@@ -0,0 +1,624 @@
+"""
+Synthetic data at production scale, written with COPY.
+
+Generates properties, photos, analysis results and scrape runs in batches
+and streams each batch into Postgres with COPY ... FROM STDIN: no ORM
+objects, no per-row INSERT. The fields come from weighted distributions.
+- cities: each has a weight, zips and a median price (prices are lognormal
+  around it)
+- description phrases: Zipf-skewed, so a few keywords ("fixer", "rental")
+  are common and most are rare, like real listings
+- missing-field rates for price, beds, baths, sqft and description
+Analyses are scored with scoring.compute_analysis_batch from the listing
+fields alone, so they are written with scoring_version NULL. After the
+load, market stats are refreshed for the generated areas, analyses
+already in those zips are marked stale (they have new comps), and
+`python -m reanalysis` rescores all of them against the medians and the
+comps ARV. Each scrape run also adds its listings, taken from
+run_mock_scrape, with scraped_at set to the run's finish time.
+
+Rows are tagged with --source (listing_source; scrape run queries start
+with "<source>:"), so repeated runs top up to --properties and --delete
+removes exactly what was generated. The same --seed and starting row
+count give the same rows (timestamps are relative to now).
+
+Secondary indexes on properties (trigram GIN/GiST above all) and the
+per-row foreign key checks on photos and analyses cost more than the COPY
+itself. --defer-indexes drops them for the load and recreates them once
+at the end. The tables are unindexed and unchecked in between, so do not
+use it against a database that is serving traffic.
+
+Run from backend/:
+    python generate_data.py --properties 1000000 --defer-indexes
+    python generate_data.py --properties 100000 --missing price=0.1,sqft=0.3 --keyword-skew 1.5
+    python generate_data.py --properties 50000 --config distributions.json
+    python generate_data.py --delete
+"""
+import argparse
+import hashlib
+import io
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import text
+
+try:
+    import orjson
+except ImportError:  # optional speedup, as in serialization.py
+    orjson = None
+
+BATCH_SIZE = 100_000
+COPY_READ_SIZE = 1 << 20
+
+DEFAULTS = {
+    # city, state, zips (Zipf-skewed within the city), share of listings, median price
+    "cities": [
+        {"city": "Newark", "state": "NJ", "zips": ["07102", "07103", "07104", "07105", "07106", "07107", "07108"], "weight": 14, "median_price": 390000},
+        {"city": "Staten Island", "state": "NY", "zips": ["10301", "10302", "10303", "10304", "10305", "10306", "10310", "10312", "10314"], "weight": 10, "median_price": 560000},
+        {"city": "Scranton", "state": "PA", "zips": ["18503", "18504", "18505", "18508", "18509", "18510"], "weight": 8, "median_price": 240000},
+        {"city": "Buffalo", "state": "NY", "zips": ["14201", "14206", "14207", "14210", "14211", "14213", "14215", "14216"], "weight": 12, "median_price": 220000},
+        {"city": "Rochester", "state": "NY", "zips": ["14605", "14606", "14607", "14609", "14611", "14613", "14619", "14621"], "weight": 9, "median_price": 210000},
+        {"city": "Trenton", "state": "NJ", "zips": ["08608", "08609", "08610", "08611", "08618", "08629", "08638"], "weight": 6, "median_price": 260000},
+        {"city": "Paterson", "state": "NJ", "zips": ["07501", "07502", "07503", "07504", "07505", "07513", "07514", "07522"], "weight": 7, "median_price": 430000},
+        {"city": "Albany", "state": "NY", "zips": ["12202", "12203", "12204", "12206", "12208", "12209", "12210"], "weight": 5, "median_price": 250000},
+        {"city": "Allentown", "state": "PA", "zips": ["18101", "18102", "18103", "18104", "18109"], "weight": 5, "median_price": 280000},
+        {"city": "Syracuse", "state": "NY", "zips": ["13203", "13204", "13205", "13206", "13207", "13208", "13210"], "weight": 6, "median_price": 190000},
+        {"city": "Camden", "state": "NJ", "zips": ["08102", "08103", "08104", "08105"], "weight": 3, "median_price": 150000},
+        {"city": "Reading", "state": "PA", "zips": ["19601", "19602", "19604", "19606", "19611"], "weight": 3, "median_price": 200000},
+    ],
+    # most common first; drawn with weight 1 / rank ** keyword_skew
+    "phrases": [
+        "Great rental opportunity.", "Needs TLC.", "Fixer-upper with upside.", "Cash-flow rental.",
+        "Move-in ready.", "Two-unit with separate entrances.", "Full basement.", "Close to transit.",
+        "Updated kitchen.", "Investor special.", "Needs full rehab.", "New roof.", "Off-street parking.",
+        "Hardwood floors throughout.", "Sold as-is.", "Large backyard.", "Walk to downtown.",
+        "Tenant occupied.", "Estate sale.", "Corner lot.", "Finished attic.", "Brick construction.",
+        "Detached garage.", "Motivated seller.", "Cash buyers only.", "Near schools and parks.",
+        "Porch and deck.", "Separate utilities.", "Legal three-family.", "Vacant, easy to show.",
+    ],
+    "keyword_skew": 1.1,
+    "phrases_per_description": [1, 4],
+    "streets": ["Main", "Oak", "Pine", "Maple", "Cedar", "Elm", "Forest", "Bay", "Market", "Park",
+                "Washington", "Lincoln", "Lake", "Hill", "Church", "Spring", "Franklin", "Union"],
+    "street_types": ["St", "Ave", "Rd", "Ln", "Dr", "Pl", "Ct"],
+    "price_sigma": 0.45,
+    "missing": {"price": 0.03, "beds": 0.05, "baths": 0.08, "sqft": 0.12, "description": 0.1},
+    # weights for 0, 1, 2, ... photos per property
+    "photo_counts": [4, 6, 10, 16, 20, 16, 12, 8, 5, 3],
+    "analyzed_rate": 0.8,
+    # listings per generated scrape run, from run_mock_scrape
+    "run_size": 50,
+    "run_statuses": {"succeeded": 90, "succeeded_with_errors": 7, "failed": 3},
+    "days": 365,
+}
+
+
+# ---- COPY plumbing ----
+
+class GeneratorFile(io.RawIOBase):
+    """Read-only file over an iterator of bytes chunks, for copy_expert."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buf = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buf:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buf = memoryview(chunk)
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+
+def _escape(value: str) -> str:
+    # COPY text format: backslash, tab and newlines are special
+    if "\\" in value or "\t" in value or "\n" in value or "\r" in value:
+        value = value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return value
+
+
+def _text(values) -> list:
+    """A column as COPY text fields."""
+    values = list(values)
+    fields = ["" if v is None else v if type(v) is str else str(v) for v in values]
+    # one scan of the whole column instead of four per value
+    blob = "".join(fields)
+    if "\\" in blob or "\t" in blob or "\n" in blob or "\r" in blob:
+        fields = [_escape(f) for f in fields]
+    if None in values:
+        fields = ["\\N" if v is None else f for v, f in zip(values, fields)]
+    return fields
+
+
+def _timestamps(epochs) -> list:
+    # numpy formats a whole column at once; str(datetime) per row is much slower
+    stamps = np.datetime_as_string((np.asarray(epochs) * 1e6).astype("datetime64[us]"))
+    return [f"{t}+00" for t in stamps.tolist()]
+
+
+def _chunks(lines, lines_per_chunk=10_000):
+    for i in range(0, len(lines), lines_per_chunk):
+        yield ("\n".join(lines[i:i + lines_per_chunk]) + "\n").encode("utf-8")
+
+
+def copy_columns(cursor, table: str, columns: dict) -> None:
+    """COPY {column name: list of text fields} into table."""
+    lines = list(map("\t".join, zip(*columns.values())))
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    cursor.copy_expert(sql, GeneratorFile(_chunks(lines)), size=COPY_READ_SIZE)
+
+
+# ---- generation ----
+
+def _json(value) -> str:
+    if orjson is not None:
+        return orjson.dumps(value).decode("utf-8")
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _zipf(n: int, skew: float) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+
+def _fingerprint(price, beds, baths, sqft, zip_code, city, state, description) -> str:
+    # same expression as the properties.scoring_fingerprint generated column;
+    # price and baths as Postgres prints their numeric scale 2, e.g. "2.50"
+    baths = "" if baths is None else "%.2f" % baths
+    return hashlib.md5(
+        f"{price or ''}|{'' if beds is None else beds}|{baths}|{'' if sqft is None else sqft}"
+        f"|{zip_code}|{city}|{state}|{description or ''}".encode("utf-8")
+    ).hexdigest()
+
+
+class Generator:
+    def __init__(self, config: dict, source: str, seed: int):
+        self.config = config
+        self.source = source
+        self.seed = seed
+        cities = config["cities"]
+        self.city_p = np.array([c["weight"] for c in cities], dtype=np.float64)
+        self.city_p /= self.city_p.sum()
+        self.zip_p = [_zipf(len(c["zips"]), 1.0) for c in cities]
+        self.phrase_p = _zipf(len(config["phrases"]), config["keyword_skew"])
+        photo_p = np.array(config["photo_counts"], dtype=np.float64)
+        self.photo_p = photo_p / photo_p.sum()
+        statuses = config["run_statuses"]
+        self.statuses = list(statuses)
+        self.status_p = np.array(list(statuses.values()), dtype=np.float64)
+        self.status_p /= self.status_p.sum()
+        self.now = datetime.now(timezone.utc)
+
+    def _rng(self, *key) -> np.random.Generator:
+        return np.random.default_rng([self.seed, *key])
+
+    def properties(self, start: int, n: int) -> dict:
+        """Columns for synthetic properties start .. start + n - 1 (Python lists, None where missing)."""
+        cfg = self.config
+        rng = self._rng(1, start)
+        cities = cfg["cities"]
+
+        city_ix = rng.choice(len(cities), size=n, p=self.city_p)
+        zip_draw = rng.random(n)
+        medians = np.array([c["median_price"] for c in cities], dtype=np.float64)[city_ix]
+        prices = np.round(np.exp(np.log(medians) + rng.normal(0.0, cfg["price_sigma"], n)) / 1000) * 1000
+        prices = np.maximum(prices, 25_000)
+        beds = np.clip(np.round(rng.normal(3.0, 1.1, n)), 1, 8).astype(np.int64)
+        baths = np.clip(np.round((beds * 0.5 + rng.normal(0.25, 0.5, n)) * 2) / 2, 1.0, 5.0)
+        sqft = np.round((450 + beds * 330) * rng.lognormal(0.0, 0.2, n)).astype(np.int64)
+        house = rng.integers(1, 9999, n)
+        street = rng.integers(0, len(cfg["streets"]), n)
+        street_type = rng.integers(0, len(cfg["street_types"]), n)
+        lo, hi = cfg["phrases_per_description"]
+        phrase_counts = rng.integers(lo, hi + 1, n)
+        phrase_ix = rng.choice(len(cfg["phrases"]), size=(n, hi), p=self.phrase_p)
+        age = rng.random(n) * cfg["days"] * 86400
+        missing = {field: rng.random(n) < rate for field, rate in cfg["missing"].items()}
+
+        def masked(values, field):
+            mask = missing.get(field)
+            values = values.tolist()
+            if mask is None:
+                return values
+            return [None if m else v for v, m in zip(values, mask.tolist())]
+
+        zip_ix = np.zeros(n, dtype=np.int64)
+        for c, p in enumerate(self.zip_p):
+            in_city = city_ix == c
+            zip_ix[in_city] = np.minimum(np.searchsorted(np.cumsum(p), zip_draw[in_city]), len(p) - 1)
+        phrases = cfg["phrases"]
+        streets, street_types = cfg["streets"], cfg["street_types"]
+        cols = {"city": [], "state": [], "zip": [], "address": [], "description": []}
+        for c, z, h, s, st, k, row in zip(
+            city_ix.tolist(), zip_ix.tolist(), house.tolist(), street.tolist(),
+            street_type.tolist(), phrase_counts.tolist(), phrase_ix.tolist(),
+        ):
+            city = cities[c]
+            cols["city"].append(city["city"])
+            cols["state"].append(city["state"])
+            cols["zip"].append(city["zips"][z])
+            cols["address"].append(f"{h} {streets[s]} {street_types[st]}")
+            # dict.fromkeys: no phrase twice in one description
+            cols["description"].append(" ".join(dict.fromkeys(phrases[p] for p in row[:k])))
+
+        created = self.now.timestamp() - age
+        return {
+            "listing_url": [f"https://synthetic.example.com/{self.source}/{start + i}" for i in range(n)],
+            "address": cols["address"],
+            "city": cols["city"],
+            "state": cols["state"],
+            "zip": cols["zip"],
+            "price": masked(prices.astype(np.int64), "price"),
+            "beds": masked(beds, "beds"),
+            "baths": masked(baths, "baths"),
+            "sqft": masked(sqft, "sqft"),
+            "description": [None if m else d for d, m in zip(
+                cols["description"], missing.get("description", np.zeros(n, dtype=bool)).tolist()
+            )],
+            "scraped_at": created,
+            "created_at": created,
+        }
+
+    def scrape_runs(self, start: int, n: int) -> tuple:
+        """(runs, listings): scrape_runs rows and the properties they found, via run_mock_scrape."""
+        from scraper.mock_scraper import run_mock_scrape
+
+        cfg = self.config
+        rng = self._rng(2, start)
+        phrases, cities = self.config["phrases"], self.config["cities"]
+        city_ix = rng.choice(len(cities), size=n, p=self.city_p)
+        phrase_ix = rng.choice(len(phrases), size=n, p=self.phrase_p)
+        status_ix = rng.choice(len(self.statuses), size=n, p=self.status_p)
+        age = rng.random(n) * cfg["days"] * 86400
+        duration = rng.lognormal(3.0, 0.6, n)
+
+        runs, listings = [], []
+        for i, (c, p, s, a, d) in enumerate(zip(
+            city_ix.tolist(), phrase_ix.tolist(), status_ix.tolist(), age.tolist(), duration.tolist(),
+        )):
+            run_no = start + i
+            query = f"{self.source}: {cities[c]['city']} {phrases[p].rstrip('.').lower()} #{run_no}"
+            status = self.statuses[s]
+            started_at = self.now - timedelta(seconds=a)
+            finished_epoch = started_at.timestamp() + d
+            finished_at = started_at + timedelta(seconds=d)
+            found = 0 if status == "failed" else cfg["run_size"]
+            errors = 0 if status == "succeeded" else int(rng.integers(1, 5))
+            for j, listing in enumerate(run_mock_scrape(query, found)):
+                listings.append({
+                    **listing,
+                    "listing_source": self.source,
+                    # mock urls are an 8-hex-digit hash; make them unique across runs
+                    "listing_url": f"{listing['listing_url']}?{self.source}={run_no}-{j}",
+                    "scraped_at": finished_epoch,
+                    "created_at": finished_epoch,
+                })
+            runs.append({
+                "query": query,
+                "status": status,
+                "started_at": started_at,
+                "finished_at": finished_at,
+                "properties_found": found,
+                "inserted_count": found,
+                "skipped_count": 0,
+                "error_count": errors,
+                "error_samples": _json([{"error": "synthetic fetch error"}] * min(errors, 3)) if errors else None,
+                "max_results": cfg["run_size"],
+                "sources": _json(["mock"]),
+            })
+        return runs, listings
+
+
+# ---- loading ----
+
+RUN_COLUMNS = (
+    "query", "status", "started_at", "finished_at", "properties_found", "inserted_count",
+    "skipped_count", "error_count", "error_samples", "max_results", "sources",
+)
+
+
+def _reserve_ids(cursor, n: int) -> int:
+    """First of n consecutive properties ids; the caller holds a lock that keeps other inserts out."""
+    cursor.execute(
+        "SELECT setval(pg_get_serial_sequence('properties', 'id'), nextval(pg_get_serial_sequence('properties', 'id')) + %s - 1)",
+        (n,),
+    )
+    return cursor.fetchone()[0] - n + 1
+
+
+def write_properties(cursor, gen: Generator, cols: dict) -> dict:
+    """COPY one batch of property columns, with photos and analyses; returns row counts."""
+    from scoring import compute_analysis_batch, needs_rehab
+
+    n = len(cols["listing_url"])
+    first_id = _reserve_ids(cursor, n)
+    ids = np.arange(first_id, first_id + n)
+    id_text = ids.astype(str).tolist()
+    rng = gen._rng(3, first_id)
+
+    prices = [None if p is None else f"{p:.2f}" for p in cols["price"]]
+    created = _timestamps(cols["created_at"])
+    analyzed = rng.random(n) < gen.config["analyzed_rate"]
+    results = compute_analysis_batch(
+        cols["price"], cols["beds"], cols["sqft"], [needs_rehab(d) for d in cols["description"]],
+    )
+    scores = [f"{r[0]:.2f}" if a else "\\N" for r, a in zip(results, analyzed.tolist())]
+
+    copy_columns(cursor, "properties", {
+        "id": id_text,
+        "listing_source": [_escape(gen.source)] * n,
+        "listing_url": _text(cols["listing_url"]),
+        "address": _text(cols["address"]),
+        "city": _text(cols["city"]),
+        "state": _text(cols["state"]),
+        "zip": _text(cols["zip"]),
+        "price": _text(prices),
+        "beds": _text(cols["beds"]),
+        "baths": _text(cols["baths"]),
+        "sqft": _text(cols["sqft"]),
+        "description": _text(cols["description"]),
+        "score_total": scores,
+        "scraped_at": _timestamps(cols["scraped_at"]),
+        "created_at": created,
+        "updated_at": created,
+    })
+
+    per_property = rng.choice(len(gen.photo_p), size=n, p=gen.photo_p)
+    photo_ids = np.repeat(ids, per_property)
+    # 1-based position within each property's photos
+    sort_order = np.arange(len(photo_ids)) - np.repeat(np.cumsum(per_property) - per_property, per_property) + 1
+    copy_columns(cursor, "property_photos", {
+        "property_id": photo_ids.astype(str).tolist(),
+        "photo_url": [
+            f"https://picsum.photos/seed/brrrr-{pid}-{k}/800/600"
+            for pid, k in zip(photo_ids.tolist(), sort_order.tolist())
+        ],
+        "sort_order": sort_order.astype(str).tolist(),
+        "width": ["800"] * len(photo_ids),
+        "height": ["600"] * len(photo_ids),
+    })
+
+    rows = np.flatnonzero(analyzed).tolist()
+    if rows:
+        analyzed_created = [created[i] for i in rows]
+        copy_columns(cursor, "analysis_results", {
+            "property_id": [id_text[i] for i in rows],
+            "score_total": [scores[i] for i in rows],
+            "score_breakdown": [_escape(_json(results[i][1])) for i in rows],
+            "reasons": [_escape(_json(results[i][2])) for i in rows],
+            "input_fingerprint": [
+                _fingerprint(
+                    prices[i], cols["beds"][i], cols["baths"][i], cols["sqft"][i],
+                    cols["zip"][i], cols["city"][i], cols["state"][i], cols["description"][i],
+                )
+                for i in rows
+            ],
+            # no market median or comps ARV went into these; stale until reanalysis
+            "scoring_version": ["\\N"] * len(rows),
+            "analyzed_at": analyzed_created,
+            "created_at": analyzed_created,
+            "updated_at": analyzed_created,
+        })
+    return {"properties": n, "photos": len(photo_ids), "analyses": len(rows)}
+
+
+def write_scrape_runs(cursor, gen: Generator, start: int, n: int) -> dict:
+    runs, listings = gen.scrape_runs(start, n)
+    copy_columns(cursor, "scrape_runs", {c: _text(run[c] for run in runs) for c in RUN_COLUMNS})
+    counts = {"scrape_runs": len(runs), "properties": 0, "photos": 0, "analyses": 0}
+    if listings:
+        cols = {k: [row[k] for row in listings] for k in listings[0]}
+        for k in ("price", "baths"):
+            cols[k] = [None if v is None else float(v) for v in cols[k]]
+        for k, v in write_properties(cursor, gen, cols).items():
+            counts[k] += v
+    return counts
+
+
+def _deferrable(cursor, tables):
+    """[(drop statement, recreate statement)] for secondary indexes and foreign keys on tables."""
+    # every index except those backing a primary key / unique constraint
+    cursor.execute("""
+        SELECT 'DROP INDEX ' || i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        WHERE i.indrelid = ANY(%s::regclass[])
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+    """, (list(tables),))
+    indexes = cursor.fetchall()
+    # re-adding a foreign key checks it in one join instead of a trigger per row
+    cursor.execute("""
+        SELECT format('ALTER TABLE %%s DROP CONSTRAINT %%I', conrelid::regclass, conname),
+               format('ALTER TABLE %%s ADD CONSTRAINT %%I %%s', conrelid::regclass, conname, pg_get_constraintdef(oid))
+        FROM pg_constraint
+        WHERE contype = 'f' AND conrelid = ANY(%s::regclass[])
+    """, (list(tables),))
+    return indexes + cursor.fetchall()
+
+
+def generate(properties: int, scrape_runs: int, config: dict, source: str, seed: int,
+             defer_indexes: bool = False, verbose: bool = True) -> dict:
+    """Top up `source` to `properties` generated properties and `scrape_runs` runs."""
+    from db import engine
+
+    gen = Generator(config, source, seed)
+    totals = {"properties": 0, "photos": 0, "analyses": 0, "scrape_runs": 0}
+    started = time.perf_counter()
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(
+            "SELECT count(*) FROM properties WHERE listing_source = %s AND listing_url LIKE %s",
+            (source, f"https://synthetic.example.com/{source}/%"),
+        )
+        have = cursor.fetchone()[0]
+        cursor.execute("SELECT count(*) FROM scrape_runs WHERE query LIKE %s", (f"{source}: %",))
+        have_runs = cursor.fetchone()[0]
+        raw.commit()
+
+        dropped = []
+        if defer_indexes and (properties > have or scrape_runs > have_runs):
+            dropped = _deferrable(cursor, ("properties", "property_photos", "analysis_results"))
+            for drop, _ in dropped:
+                cursor.execute(drop)
+            raw.commit()
+            if verbose:
+                print(f"dropped {len(dropped)} secondary indexes and foreign keys")
+
+        try:
+            start = have
+            while start < properties:
+                n = min(BATCH_SIZE, properties - start)
+                t0 = time.perf_counter()
+                # no other inserts while ids are reserved and copied
+                cursor.execute("LOCK TABLE properties IN EXCLUSIVE MODE")
+                counts = write_properties(cursor, gen, gen.properties(start, n))
+                raw.commit()
+                for k, v in counts.items():
+                    totals[k] += v
+                start += n
+                if verbose:
+                    print(f"  properties {start:,}/{properties:,} ({time.perf_counter() - t0:.1f}s for batch)")
+
+            if scrape_runs > have_runs:
+                t0 = time.perf_counter()
+                cursor.execute("LOCK TABLE properties IN EXCLUSIVE MODE")
+                counts = write_scrape_runs(cursor, gen, have_runs, scrape_runs - have_runs)
+                raw.commit()
+                for k, v in counts.items():
+                    totals[k] += v
+                if verbose:
+                    print(f"  scrape runs {scrape_runs:,} ({time.perf_counter() - t0:.1f}s)")
+        finally:
+            raw.rollback()
+            if dropped:
+                t0 = time.perf_counter()
+                cursor.execute("SET maintenance_work_mem = '512MB'")
+                for _, create in dropped:
+                    cursor.execute(create)
+                raw.commit()
+                if verbose:
+                    print(f"rebuilt {len(dropped)} indexes and foreign keys ({time.perf_counter() - t0:.1f}s)")
+
+        if totals["properties"] or totals["scrape_runs"]:
+            for table in ("properties", "property_photos", "analysis_results", "scrape_runs"):
+                cursor.execute(f"ANALYZE {table}")
+            raw.commit()
+    finally:
+        raw.close()
+
+    if totals["properties"]:
+        t0 = time.perf_counter()
+        changed = refresh_source_areas(source)
+        if verbose:
+            print(f"refreshed market stats, {changed} areas changed ({time.perf_counter() - t0:.1f}s)")
+
+    totals["seconds"] = round(time.perf_counter() - started, 1)
+    return totals
+
+
+def _source_areas(conn, source: str):
+    return conn.execute(
+        text("SELECT DISTINCT zip, city, state FROM properties WHERE listing_source = :s"), {"s": source}
+    ).all()
+
+
+def refresh_source_areas(source: str, areas=None) -> int:
+    """
+    Refresh market stats for the zips and cities `source` has rows in (or
+    `areas`), and mark the analyses in those zips stale: their comps changed.
+    """
+    from comps import mark_zips_stale
+    from db import SessionLocal
+    from market_stats import refresh_market_stats
+
+    session = SessionLocal()
+    try:
+        if areas is None:
+            areas = _source_areas(session, source)
+        changed = refresh_market_stats(
+            session,
+            zips={z for z, _, _ in areas},
+            cities={(c, st) for _, c, st in areas},
+        )
+        mark_zips_stale(session, {z for z, _, _ in areas})
+        session.commit()
+        return changed
+    finally:
+        session.close()
+
+
+def delete(source: str) -> dict:
+    from db import engine
+
+    with engine.begin() as conn:
+        areas = _source_areas(conn, source)
+        # photos and analyses go with the properties (ON DELETE CASCADE)
+        properties = conn.execute(
+            text("DELETE FROM properties WHERE listing_source = :s"), {"s": source}
+        ).rowcount
+        runs = conn.execute(
+            text("DELETE FROM scrape_runs WHERE query LIKE :q"), {"q": f"{source}: %"}
+        ).rowcount
+    # the medians of those areas no longer include the deleted rows
+    refresh_source_areas(source, areas)
+    return {"properties": properties, "scrape_runs": runs}
+
+
+# ---- CLI ----
+
+def _parse_rates(value: str) -> dict:
+    rates = {}
+    for part in value.split(","):
+        field, _, rate = part.partition("=")
+        if field.strip() not in DEFAULTS["missing"]:
+            raise argparse.ArgumentTypeError(f"unknown field {field!r} (one of {', '.join(DEFAULTS['missing'])})")
+        rates[field.strip()] = float(rate)
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic listings with COPY.")
+    parser.add_argument("--properties", type=int, default=1_000_000, help="generated properties to top up to")
+    parser.add_argument("--scrape-runs", type=int, help="scrape runs to top up to (default properties / 5000)")
+    parser.add_argument("--source", default="synthetic", help="listing_source tag")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--config", help="JSON file overriding DEFAULTS keys (cities, phrases, missing, ...)")
+    parser.add_argument("--missing", type=_parse_rates, help="e.g. price=0.05,sqft=0.2")
+    parser.add_argument("--keyword-skew", type=float, help="Zipf exponent for description phrases")
+    parser.add_argument("--analyzed-rate", type=float, help="share of properties with an analysis")
+    parser.add_argument("--defer-indexes", action="store_true", help="drop secondary indexes during the load")
+    parser.add_argument("--delete", action="store_true", help="delete everything tagged --source and exit")
+    args = parser.parse_args()
+
+    if args.delete:
+        print(delete(args.source))
+        return
+
+    config = dict(DEFAULTS)
+    if args.config:
+        with open(args.config) as f:
+            config.update(json.load(f))
+    if args.missing:
+        config["missing"] = {**config["missing"], **args.missing}
+    if args.keyword_skew is not None:
+        config["keyword_skew"] = args.keyword_skew
+    if args.analyzed_rate is not None:
+        config["analyzed_rate"] = args.analyzed_rate
+    scrape_runs = args.scrape_runs if args.scrape_runs is not None else args.properties // 5000
+
+    totals = generate(args.properties, scrape_runs, config, args.source, args.seed, args.defer_indexes)
+    print(", ".join(f"{k} {v:,}" if isinstance(v, int) else f"{k} {v}" for k, v in totals.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Image resizing for photo variants. Runs inside ProcessPoolExecutor workers
+(see thumbnails.py), so it imports nothing but Pillow.
+"""
+import io
+
+from PIL import Image, ImageOps
+
+# Pillow format names
+FORMATS = {
+    "webp": "WEBP",
+    "jpeg": "JPEG",
+}
+# EXIF orientations that swap width and height
+_TRANSPOSED = {5, 6, 7, 8}
+
+
+def derive_variants(data: bytes, widths, formats, quality: int = 80, webp_method: int = 2):
+    """
+    Decode one image and encode it at each width narrower than the original,
+    in each format. Returns (width, height, [(width, height, format, bytes)])
+    with sizes as displayed (EXIF orientation applied). Never upscales.
+
+    webp_method trades encode time for size: 2 is about twice as fast as
+    Pillow's default of 4 for files a few percent larger.
+    """
+    with Image.open(io.BytesIO(data)) as im:
+        stored_w, stored_h = im.size
+        transposed = im.getexif().get(0x0112) in _TRANSPOSED
+        width, height = (stored_h, stored_w) if transposed else (stored_w, stored_h)
+
+        targets = sorted({w for w in widths if w < width}, reverse=True)
+        if not targets:
+            return width, height, []
+        sizes = [(w, max(1, round(height * w / width))) for w in targets]
+
+        # JPEG can decode at 1/2, 1/4 or 1/8 scale directly; ask for the
+        # smallest scale that still covers the largest variant
+        largest = sizes[0]
+        im.draft("RGB", (largest[1], largest[0]) if transposed else largest)
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if "transparency" in im.info else "RGB")
+
+        variants = []
+        resized = im
+        for size in sizes:
+            # each width is resampled from the next larger one rather than the
+            # original; the steps are small enough that quality holds
+            resized = resized.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+            for fmt in formats:
+                pil_format = FORMATS[fmt]
+                frame = resized.convert("RGB") if pil_format == "JPEG" and resized.mode != "RGB" else resized
+                out = io.BytesIO()
+                if pil_format == "JPEG":
+                    frame.save(out, pil_format, quality=quality, optimize=True, progressive=True)
+                else:
+                    frame.save(out, pil_format, quality=quality, method=webp_method)
+                variants.append((size[0], size[1], fmt, out.getvalue()))
+        return width, height, variants
@@ -0,0 +1,82 @@
+import os
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import Property
+
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "500"))
+MAX_ERROR_SAMPLES = 10
+
+# item keys that are not Property columns; handed back for new rows instead
+PHOTO_URLS_KEY = "photo_urls"
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _insert_chunk(session, chunk):
+    # Same column set for every row of the multi-VALUES statement
+    columns = sorted({k for item in chunk for k in item} - {PHOTO_URLS_KEY})
+    rows = [{c: item.get(c) for c in columns} for item in chunk]
+
+    stmt = (
+        pg_insert(Property)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=[Property.listing_url])
+        .returning(Property.id, Property.listing_url)
+    )
+    return session.execute(stmt).all()
+
+
+def ingest_properties(session, items, chunk_size=None):
+    """
+    Insert scraped items with one INSERT ... ON CONFLICT (listing_url) DO NOTHING
+    RETURNING id per chunk. Each chunk runs in its own SAVEPOINT so a bad row
+    only discards its own chunk. The caller owns the outer transaction.
+
+    Returns a dict with inserted/skipped/error counts, the inserted ids,
+    {property_id: photo_urls} for inserted items that carried photos, and up
+    to MAX_ERROR_SAMPLES error samples.
+    """
+    chunk_size = chunk_size or INGEST_CHUNK_SIZE
+    items = list(items)
+
+    inserted_ids = []
+    inserted_photos = {}
+    skipped = 0
+    errors = 0
+    error_samples = []
+
+    for chunk in _chunks(items, chunk_size):
+        try:
+            with session.begin_nested():
+                inserted = _insert_chunk(session, chunk)
+        except Exception as e:
+            errors += len(chunk)
+            if len(error_samples) < MAX_ERROR_SAMPLES:
+                error_samples.append({
+                    "listing_url": chunk[0].get("listing_url"),
+                    "rows": len(chunk),
+                    # DBAPI error text, without the rendered SQL and parameters
+                    "error": str(getattr(e, "orig", None) or e),
+                })
+            continue
+
+        inserted_ids.extend(row.id for row in inserted)
+        skipped += len(chunk) - len(inserted)
+
+        photos = {item["listing_url"]: item[PHOTO_URLS_KEY] for item in chunk if item.get(PHOTO_URLS_KEY)}
+        for row in inserted:
+            if row.listing_url in photos:
+                inserted_photos[row.id] = photos[row.listing_url]
+
+    return {
+        "inserted_count": len(inserted_ids),
+        "skipped_count": skipped,
+        "error_count": errors,
+        "inserted_ids": inserted_ids,
+        "inserted_photos": inserted_photos,
+        "error_samples": error_samples,
+    }
@@ -0,0 +1,238 @@
+"""
+Per-area market statistics (zip and city/state) for market-relative scoring.
+
+market_stats rows are recomputed with percentile aggregates in Postgres,
+either for every area (python -m market_stats) or only for the areas a set
+of new properties landed in (refresh_for_properties, called after ingest).
+The scorer never queries them per property: MarketStatsCache keeps the whole
+table as dicts in memory and answers lookups in O(1).
+"""
+import argparse
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+from db import SessionLocal
+
+MARKET_STATS_TTL = float(os.getenv("MARKET_STATS_TTL", "300"))
+# below this many listings with price and sqft a zip falls back to its city
+MARKET_MIN_LISTINGS = int(os.getenv("MARKET_MIN_LISTINGS", "5"))
+# a refresh only marks an area's analyses stale when its median $/sqft moved
+# by more than this fraction from the baseline (the median when they were
+# last marked); every new listing nudges the median slightly
+MARKET_STALE_TOLERANCE = float(os.getenv("MARKET_STALE_TOLERANCE", "0.01"))
+
+# group-by columns and the area_key built from them
+_SCOPES = {
+    "zip": (("zip",), "zip"),
+    "city": (("city", "state"), "city || ', ' || state"),
+}
+
+# One statement per scope. baseline_price_per_sqft only follows the median
+# once it has moved by more than the tolerance, so small moves cannot add up
+# unnoticed. The old CTE is read from the snapshot taken before the upsert,
+# so the result lists the areas whose baseline moved (or that are new).
+_REFRESH_SQL = """
+WITH old AS (
+    SELECT area_key, baseline_price_per_sqft
+    FROM market_stats
+    WHERE scope = :scope {old_filter}
+),
+fresh AS (
+    SELECT
+        {columns},
+        {key} AS area_key,
+        count(*) AS listing_count,
+        count(price / nullif(sqft, 0)) AS priced_sqft_count,
+        percentile_cont(ARRAY[0.25, 0.5, 0.75]) WITHIN GROUP (ORDER BY price / nullif(sqft, 0)) AS ppsf,
+        percentile_cont(0.5) WITHIN GROUP (ORDER BY price) AS median_price,
+        -- scoring.compute_analysis's rent estimate
+        percentile_cont(0.5) WITHIN GROUP (ORDER BY CASE
+            WHEN coalesce(beds, 0) <> 0 OR coalesce(sqft, 0) <> 0
+            THEN greatest(1200, coalesce(beds, 0) * 650 + coalesce(sqft, 0) * 0.40)
+        END) AS median_rent_estimate
+    FROM properties
+    {area_filter}
+    GROUP BY {columns}
+),
+up AS (
+    INSERT INTO market_stats (
+        scope, area_key, listing_count, priced_sqft_count,
+        p25_price_per_sqft, median_price_per_sqft, p75_price_per_sqft,
+        median_price, median_rent_estimate, baseline_price_per_sqft, refreshed_at
+    )
+    SELECT :scope, area_key, listing_count, priced_sqft_count,
+           ppsf[1], ppsf[2], ppsf[3], median_price, median_rent_estimate, ppsf[2], now()
+    FROM fresh
+    ON CONFLICT (scope, area_key) DO UPDATE SET
+        listing_count = excluded.listing_count,
+        priced_sqft_count = excluded.priced_sqft_count,
+        p25_price_per_sqft = excluded.p25_price_per_sqft,
+        median_price_per_sqft = excluded.median_price_per_sqft,
+        p75_price_per_sqft = excluded.p75_price_per_sqft,
+        median_price = excluded.median_price,
+        median_rent_estimate = excluded.median_rent_estimate,
+        baseline_price_per_sqft = CASE
+            WHEN market_stats.baseline_price_per_sqft IS NULL
+              OR excluded.median_price_per_sqft IS NULL
+              OR abs(excluded.median_price_per_sqft - market_stats.baseline_price_per_sqft)
+                 > :tolerance * market_stats.baseline_price_per_sqft
+            THEN excluded.median_price_per_sqft
+            ELSE market_stats.baseline_price_per_sqft
+        END,
+        refreshed_at = excluded.refreshed_at
+    RETURNING area_key, baseline_price_per_sqft
+)
+SELECT {columns}
+FROM fresh
+JOIN up USING (area_key)
+LEFT JOIN old USING (area_key)
+WHERE old.baseline_price_per_sqft IS DISTINCT FROM up.baseline_price_per_sqft
+"""
+
+
+def _areas_in(columns, areas, prefix=""):
+    # (zip) / (city, state) IN a set of tuples, passed as one array per column
+    # so the lookup can use ix_properties_zip / ix_properties_city_state
+    params = {f"a{i}": [area[i] for area in areas] for i in range(len(columns))}
+    arrays = ", ".join(f"CAST(:a{i} AS text[])" for i in range(len(columns)))
+    cols = ", ".join(prefix + c for c in columns)
+    return f"({cols}) IN (SELECT * FROM unnest({arrays}))", params
+
+
+def _refresh_scope(session, scope, areas=None):
+    columns, key = _SCOPES[scope]
+    params = {"scope": scope, "tolerance": MARKET_STALE_TOLERANCE}
+    if areas is None:
+        old_filter = area_filter = ""
+    else:
+        if not areas:
+            return []
+        condition, area_params = _areas_in(columns, areas)
+        params.update(area_params)
+        arrays = ", ".join(f"CAST(:a{i} AS text[])" for i in range(len(columns)))
+        old_filter = f"AND area_key IN (SELECT {key} FROM unnest({arrays}) AS t({', '.join(columns)}))"
+        area_filter = f"WHERE {condition}"
+
+    sql = _REFRESH_SQL.format(
+        columns=", ".join(columns), key=key, old_filter=old_filter, area_filter=area_filter
+    )
+    return [tuple(row) for row in session.execute(text(sql), params)]
+
+
+def _mark_stale(session, scope, areas):
+    # Results in these areas were scored against a different median; drop
+    # their version so the next re-analysis run rescores them. updated_at is
+    # pinned, the stored result itself is still what the API shows.
+    if not areas:
+        return
+    condition, params = _areas_in(_SCOPES[scope][0], areas, prefix="p.")
+    session.execute(
+        text(f"""
+            UPDATE analysis_results AS a
+            SET scoring_version = NULL, updated_at = a.updated_at
+            FROM properties AS p
+            WHERE a.property_id = p.id AND {condition}
+        """),
+        params,
+    )
+
+
+def refresh_market_stats(session, zips=None, cities=None):
+    """
+    Recompute stats for the given zips and (city, state) pairs, or for every
+    area when both are None. Analyses in areas whose median $/sqft moved by
+    more than MARKET_STALE_TOLERANCE since they were last marked are marked
+    stale. The caller commits.
+
+    Returns the number of such areas.
+    """
+    full = zips is None and cities is None
+    changed_zips = _refresh_scope(session, "zip", None if full else {(z,) for z in zips or ()})
+    changed_cities = _refresh_scope(session, "city", None if full else set(cities or ()))
+    _mark_stale(session, "zip", changed_zips)
+    _mark_stale(session, "city", changed_cities)
+    return len(changed_zips) + len(changed_cities)
+
+
+def refresh_for_properties(session, property_ids):
+    """Incremental refresh: only the areas the given (new) properties are in."""
+    if not property_ids:
+        return 0
+    areas = session.execute(
+        text("SELECT DISTINCT zip, city, state FROM properties WHERE id = ANY(:ids)"),
+        {"ids": list(property_ids)},
+    ).all()
+    return refresh_market_stats(
+        session,
+        zips={z for z, _, _ in areas},
+        cities={(c, st) for _, c, st in areas},
+    )
+
+
+class MarketStatsCache:
+    """
+    The market_stats table as two dicts (zip -> stats, "city, state" -> stats),
+    reloaded in one query when older than ttl_seconds or after invalidate().
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._areas = {"zip": {}, "city": {}}
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _load(self):
+        session = SessionLocal()
+        try:
+            rows = session.execute(text(
+                "SELECT scope, area_key, priced_sqft_count, median_price_per_sqft FROM market_stats"
+            )).all()
+        finally:
+            session.close()
+
+        areas = {"zip": {}, "city": {}}
+        for scope, key, count, median in rows:
+            if scope in areas and median is not None:
+                areas[scope][key] = (count, float(median))
+        return areas
+
+    def _snapshot(self):
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds:
+                self._areas = self._load()
+                self._loaded_at = time.monotonic()
+            return self._areas
+
+    def median_price_per_sqft(self, zip_code, city, state):
+        """Zip median, or the city median when the zip has too few listings. None if unknown."""
+        areas = self._snapshot()
+        stats = areas["zip"].get(zip_code)
+        if stats is None or stats[0] < MARKET_MIN_LISTINGS:
+            stats = areas["city"].get(f"{city}, {state}")
+        return stats[1] if stats is not None else None
+
+
+market_stats_cache = MarketStatsCache(MARKET_STATS_TTL)
+
+
+def main():
+    argparse.ArgumentParser(description="Recompute market stats for every zip and city.").parse_args()
+    session = SessionLocal()
+    try:
+        changed = refresh_market_stats(session)
+        session.commit()
+    finally:
+        session.close()
+    market_stats_cache.invalidate()
+    print(f"market stats refreshed, {changed} area median(s) changed")
+
+
+if __name__ == "__main__":
+    main()
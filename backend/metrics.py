@@ -0,0 +1,252 @@
+"""
+Request latency and SQL accounting, exposed in Prometheus text format.
+
+Every request is timed and labelled with its blueprint and URL rule (the
+pattern, not the concrete path, so /properties/<int:property_id> is one
+series). SQL statements are counted and timed through engine events while a
+request is active on the thread. Statement counts per request go into their
+own histogram, which is what shows an N+1 regression: the route's count
+distribution moves right while its latency may barely change on a warm
+database.
+
+SLOW_REQUEST_MS turns on a warning log for requests over that many
+milliseconds, listing the statements they ran (up to
+SLOW_REQUEST_MAX_STATEMENTS, each cut to SLOW_REQUEST_STATEMENT_CHARS).
+
+Counters live in the worker process; with several workers, scrape each one
+(or sum them upstream). Streamed responses (/properties/export) are timed to
+the first byte and their SQL runs after the request is over, so it is not
+counted.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", "50"))
+SLOW_REQUEST_STATEMENT_CHARS = int(os.getenv("SLOW_REQUEST_STATEMENT_CHARS", "500"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets, labelnames=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        # labels -> [per-bucket counts (non-cumulative, last is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = 'le="%s"' % (bound if bound == "+Inf" else _number(float(bound)))
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(float(total))}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+ROUTE_LABELS = ("blueprint", "route", "method")
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "Request latency by route.", LATENCY_BUCKETS, ROUTE_LABELS,
+)
+request_statements = Histogram(
+    "http_request_sql_statements", "SQL statements executed per request.", STATEMENT_BUCKETS, ROUTE_LABELS,
+)
+request_sql_seconds = Histogram(
+    "http_request_sql_duration_seconds", "Time spent in SQL per request.", LATENCY_BUCKETS, ROUTE_LABELS,
+)
+requests_total = Counter(
+    "http_requests_total", "Requests by route and status.", ROUTE_LABELS + ("status",),
+)
+slow_requests_total = Counter(
+    "http_slow_requests_total", "Requests over SLOW_REQUEST_MS.", ROUTE_LABELS,
+)
+
+REQUEST_METRICS = (request_latency, request_statements, request_sql_seconds, requests_total, slow_requests_total)
+
+
+# ---- per-request SQL accounting ----
+
+class RequestStats:
+    __slots__ = ("started", "statements", "sql_seconds", "log")
+
+    def __init__(self, keep_statements: bool):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.sql_seconds = 0.0
+        # (seconds, statement) for the slow log; None when it is off
+        self.log = [] if keep_statements else None
+
+
+_current = ContextVar("request_stats", default=None)
+
+
+# The start time lives on the per-statement execution context, so a statement
+# that raises leaves nothing behind on the connection
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current.get() is not None:
+        context.metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = getattr(context, "metrics_started", None)
+    if stats is None or started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats.statements += 1
+    stats.sql_seconds += elapsed
+    if stats.log is not None and len(stats.log) < SLOW_REQUEST_MAX_STATEMENTS:
+        stats.log.append((elapsed, statement))
+
+
+def _route_labels():
+    rule = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+    return (request.blueprint or "app", rule, request.method)
+
+
+def _log_slow(labels, status, elapsed, stats):
+    lines = [
+        f"slow request {labels[2]} {request.full_path.rstrip('?')} ({labels[1]}) -> {status}: "
+        f"{elapsed * 1000:.1f} ms, {stats.statements} statements, {stats.sql_seconds * 1000:.1f} ms in SQL"
+    ]
+    for seconds, statement in stats.log:
+        text = " ".join(statement.split())
+        if len(text) > SLOW_REQUEST_STATEMENT_CHARS:
+            text = text[:SLOW_REQUEST_STATEMENT_CHARS] + "..."
+        lines.append(f"  {seconds * 1000:8.1f} ms  {text}")
+    if stats.statements > len(stats.log):
+        lines.append(f"  ... {stats.statements - len(stats.log)} more")
+    logger.warning("\n".join(lines))
+
+
+def _start_request():
+    _current.set(RequestStats(keep_statements=SLOW_REQUEST_MS > 0))
+
+
+def _finish_request(response):
+    stats = _current.get()
+    if stats is None:
+        return response
+    elapsed = time.perf_counter() - stats.started
+    labels = _route_labels()
+    request_latency.observe(labels, elapsed)
+    request_statements.observe(labels, stats.statements)
+    request_sql_seconds.observe(labels, stats.sql_seconds)
+    requests_total.inc(labels + (str(response.status_code),))
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        slow_requests_total.inc(labels)
+        _log_slow(labels, response.status_code, elapsed, stats)
+    return response
+
+
+def _clear_request(error=None):
+    _current.set(None)
+
+
+def init_app(app):
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_clear_request)
+
+
+# ---- exposition ----
+
+def _pool_metrics():
+    from db import pool_status
+
+    status = pool_status()
+    gauges = {
+        "db_pool_size": ("Configured pool size.", status["pool_size"]),
+        "db_pool_checked_out": ("Connections checked out now.", status["checked_out"]),
+        "db_pool_checked_in": ("Idle connections in the pool.", status["checked_in"]),
+        "db_pool_overflow": ("Overflow connections open now.", status["overflow"]),
+    }
+    counters = {
+        "db_pool_checkouts_total": ("Connection checkouts.", status["checkouts"]),
+        "db_pool_starved_checkouts_total": ("Checkouts that found the pool exhausted.", status["starved_checkouts"]),
+        "db_pool_wait_seconds_total": ("Time spent waiting for a connection.", status["wait_seconds_total"]),
+        "db_pool_timeouts_total": ("Checkouts that timed out.", status["timeouts"]),
+        "db_pool_overflow_connects_total": ("Connections opened past pool_size.", status["overflow_connects"]),
+        "db_pool_pre_ping_failures_total": ("Pooled connections found dead by pre-ping.", status["pre_ping_failures"]),
+    }
+    for kind, metrics in (("gauge", gauges), ("counter", counters)):
+        for name, (help, value) in metrics.items():
+            yield f"# HELP {name} {help}"
+            yield f"# TYPE {name} {kind}"
+            yield f"{name} {_number(value)}"
+
+
+def render() -> str:
+    lines = []
+    for metric in REQUEST_METRICS:
+        lines.extend(metric.render())
+    lines.extend(_pool_metrics())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,39 @@
+"""add scoring fingerprint and version
+
+Revision ID: 0e9b345cb002
+Revises: 7bc378e9228a
+Create Date: 2026-10-18 13:02:41.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0e9b345cb002'
+down_revision: Union[str, Sequence[str], None] = '7bc378e9228a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SCORING_FINGERPRINT_SQL = (
+    "md5(coalesce(price::text, '') || '|' || coalesce(beds::text, '') || '|' "
+    "|| coalesce(sqft::text, '') || '|' || coalesce(description, ''))"
+)
+
+
+def upgrade():
+    op.add_column(
+        "properties",
+        sa.Column("scoring_fingerprint", sa.String(32), sa.Computed(SCORING_FINGERPRINT_SQL, persisted=True), nullable=True),
+    )
+    # existing analyses have neither, so the first re-analysis run rescores everything once
+    op.add_column("analysis_results", sa.Column("input_fingerprint", sa.String(32), nullable=True))
+    op.add_column("analysis_results", sa.Column("scoring_version", sa.Integer(), nullable=True))
+
+def downgrade():
+    op.drop_column("analysis_results", "scoring_version")
+    op.drop_column("analysis_results", "input_fingerprint")
+    op.drop_column("properties", "scoring_fingerprint")
@@ -0,0 +1,33 @@
+"""market_stats stale baseline and rent estimate
+
+Revision ID: 1bf9448d2d0f
+Revises: d09746206c29
+Create Date: 2026-10-18 21:52:36.802417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1bf9448d2d0f'
+down_revision: Union[str, Sequence[str], None] = 'd09746206c29'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.add_column("market_stats", sa.Column("baseline_price_per_sqft", sa.Numeric(12, 2), nullable=True))
+    # analyses were last marked against the current medians
+    op.execute("UPDATE market_stats SET baseline_price_per_sqft = median_price_per_sqft")
+
+    op.drop_column("market_stats", "median_price_per_bed")
+    op.add_column("market_stats", sa.Column("median_rent_estimate", sa.Numeric(12, 2), nullable=True))
+    # populate with `python -m market_stats`
+
+def downgrade():
+    op.drop_column("market_stats", "median_rent_estimate")
+    op.add_column("market_stats", sa.Column("median_price_per_bed", sa.Numeric(12, 2), nullable=True))
+    op.drop_column("market_stats", "baseline_price_per_sqft")
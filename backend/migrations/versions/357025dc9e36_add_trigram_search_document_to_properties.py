@@ -0,0 +1,51 @@
+"""add trigram search_document to properties
+
+Revision ID: 357025dc9e36
+Revises: b71972b4c315
+Create Date: 2026-10-18 11:21:07.640913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '357025dc9e36'
+down_revision: Union[str, Sequence[str], None] = 'b71972b4c315'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_DOCUMENT_SQL = (
+    "lower(address || ' ' || city || ' ' || state || ' ' || zip || ' ' || coalesce(description, ''))"
+)
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column(
+        "properties",
+        sa.Column("search_document", sa.Text(), sa.Computed(SEARCH_DOCUMENT_SQL, persisted=True), nullable=True),
+    )
+    op.create_index(
+        "ix_properties_search_document_trgm",
+        "properties",
+        ["search_document"],
+        postgresql_using="gin",
+        postgresql_ops={"search_document": "gin_trgm_ops"},
+    )
+    # GIN serves the LIKE filter; GiST serves ORDER BY search_document <->> q LIMIT k (KNN)
+    op.create_index(
+        "ix_properties_search_document_trgm_gist",
+        "properties",
+        ["search_document"],
+        postgresql_using="gist",
+        postgresql_ops={"search_document": "gist_trgm_ops"},
+    )
+
+def downgrade():
+    op.drop_index("ix_properties_search_document_trgm_gist", table_name="properties")
+    op.drop_index("ix_properties_search_document_trgm", table_name="properties")
+    op.drop_column("properties", "search_document")
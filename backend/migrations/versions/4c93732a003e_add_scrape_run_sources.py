@@ -0,0 +1,27 @@
+"""add scrape_runs.sources
+
+Revision ID: 4c93732a003e
+Revises: fb7797fc6c5b
+Create Date: 2026-10-18 15:02:37.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c93732a003e'
+down_revision: Union[str, Sequence[str], None] = 'fb7797fc6c5b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.add_column("scrape_runs", sa.Column("sources", postgresql.JSONB(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("scrape_runs", "sources")
@@ -0,0 +1,37 @@
+"""add property_photos.content_hash
+
+Revision ID: 4e0f56be0ecc
+Revises: 6136003c4e90
+Create Date: 2026-10-18 17:12:40.661873
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e0f56be0ecc'
+down_revision: Union[str, Sequence[str], None] = '6136003c4e90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.add_column("property_photos", sa.Column("content_hash", sa.String(64), nullable=True))
+    # dedupe lookups across listings
+    op.create_index("ix_property_photos_content_hash", "property_photos", ["content_hash"])
+    # same image twice on one listing is one row; NULL hashes (linked photos) never conflict
+    op.create_index(
+        "ux_property_photos_property_id_content_hash",
+        "property_photos",
+        ["property_id", "content_hash"],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index("ux_property_photos_property_id_content_hash", table_name="property_photos")
+    op.drop_index("ix_property_photos_content_hash", table_name="property_photos")
+    op.drop_column("property_photos", "content_hash")
@@ -0,0 +1,28 @@
+"""add scrape_runs cache hit/miss counts
+
+Revision ID: 6136003c4e90
+Revises: d68da1e13658
+Create Date: 2026-10-18 16:31:54.207731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6136003c4e90'
+down_revision: Union[str, Sequence[str], None] = 'd68da1e13658'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.add_column("scrape_runs", sa.Column("cache_hits", sa.Integer(), server_default="0", nullable=False))
+    op.add_column("scrape_runs", sa.Column("cache_misses", sa.Integer(), server_default="0", nullable=False))
+
+
+def downgrade():
+    op.drop_column("scrape_runs", "cache_misses")
+    op.drop_column("scrape_runs", "cache_hits")
@@ -0,0 +1,33 @@
+"""add property_photos width, height, variants
+
+Revision ID: 6753c22bf869
+Revises: 4e0f56be0ecc
+Create Date: 2026-10-18 18:05:23.114902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6753c22bf869'
+down_revision: Union[str, Sequence[str], None] = '4e0f56be0ecc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.add_column("property_photos", sa.Column("width", sa.Integer(), nullable=True))
+    op.add_column("property_photos", sa.Column("height", sa.Integer(), nullable=True))
+    op.add_column("property_photos", sa.Column("variants", postgresql.JSONB(), nullable=True))
+
+    # derive variants for photos stored before this with `python -m thumbnails`
+
+
+def downgrade():
+    op.drop_column("property_photos", "variants")
+    op.drop_column("property_photos", "height")
+    op.drop_column("property_photos", "width")
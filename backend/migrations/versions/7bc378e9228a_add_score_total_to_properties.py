@@ -0,0 +1,42 @@
+"""add score_total to properties
+
+Revision ID: 7bc378e9228a
+Revises: c4c64d97dc1c
+Create Date: 2026-10-18 12:14:55.071386
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7bc378e9228a'
+down_revision: Union[str, Sequence[str], None] = 'c4c64d97dc1c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.add_column("properties", sa.Column("score_total", sa.Numeric(5, 2), nullable=True))
+
+    # backfill from existing analyses
+    op.execute(
+        """
+        UPDATE properties AS p
+        SET score_total = a.score_total
+        FROM analysis_results AS a
+        WHERE a.property_id = p.id
+        """
+    )
+
+    op.create_index(
+        "ix_properties_score_total_id",
+        "properties",
+        [sa.text("score_total DESC NULLS LAST"), sa.text("id DESC")],
+    )
+
+def downgrade():
+    op.drop_index("ix_properties_score_total_id", table_name="properties")
+    op.drop_column("properties", "score_total")
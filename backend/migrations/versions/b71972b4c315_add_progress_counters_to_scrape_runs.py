@@ -0,0 +1,27 @@
+"""add progress counters to scrape_runs
+
+Revision ID: b71972b4c315
+Revises: 0f081bfc2c93
+Create Date: 2026-10-18 11:02:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71972b4c315'
+down_revision: Union[str, Sequence[str], None] = '0f081bfc2c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.add_column("scrape_runs", sa.Column("inserted_count", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("scrape_runs", sa.Column("skipped_count", sa.Integer(), nullable=False, server_default="0"))
+
+def downgrade():
+    op.drop_column("scrape_runs", "skipped_count")
+    op.drop_column("scrape_runs", "inserted_count")
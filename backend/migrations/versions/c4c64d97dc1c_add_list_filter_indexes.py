@@ -0,0 +1,53 @@
+"""add list filter indexes
+
+Revision ID: c4c64d97dc1c
+Revises: 357025dc9e36
+Create Date: 2026-10-18 11:48:12.902551
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4c64d97dc1c'
+down_revision: Union[str, Sequence[str], None] = '357025dc9e36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # GET /properties order (page mode) and keyset seek (cursor mode)
+    op.create_index(
+        "ix_properties_created_at_id",
+        "properties",
+        [sa.text("created_at DESC"), sa.text("id DESC")],
+    )
+    # min_price / max_price ranges; unpriced listings never match a price filter
+    op.create_index(
+        "ix_properties_price",
+        "properties",
+        ["price"],
+        postgresql_where=sa.text("price IS NOT NULL"),
+    )
+    # min_beds, alone or combined with a price range
+    op.create_index(
+        "ix_properties_beds_price",
+        "properties",
+        ["beds", "price"],
+        postgresql_where=sa.text("beds IS NOT NULL"),
+    )
+    # photos are always loaded per property, in sort_order
+    op.create_index(
+        "ix_property_photos_property_id_sort_order",
+        "property_photos",
+        ["property_id", "sort_order"],
+    )
+
+def downgrade():
+    op.drop_index("ix_property_photos_property_id_sort_order", table_name="property_photos")
+    op.drop_index("ix_properties_beds_price", table_name="properties")
+    op.drop_index("ix_properties_price", table_name="properties")
+    op.drop_index("ix_properties_created_at_id", table_name="properties")
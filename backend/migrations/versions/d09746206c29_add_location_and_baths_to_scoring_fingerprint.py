@@ -0,0 +1,50 @@
+"""add location and baths to scoring fingerprint
+
+Revision ID: d09746206c29
+Revises: 6753c22bf869
+Create Date: 2026-10-18 21:14:07.385120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd09746206c29'
+down_revision: Union[str, Sequence[str], None] = '6753c22bf869'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# zip/city/state pick the market median and the comps partition, baths is a comps feature
+SCORING_FINGERPRINT_SQL = (
+    "md5(coalesce(price::text, '') || '|' || coalesce(beds::text, '') || '|' "
+    "|| coalesce(baths::text, '') || '|' || coalesce(sqft::text, '') || '|' "
+    "|| zip || '|' || city || '|' || state || '|' || coalesce(description, ''))"
+)
+
+PREVIOUS_SCORING_FINGERPRINT_SQL = (
+    "md5(coalesce(price::text, '') || '|' || coalesce(beds::text, '') || '|' "
+    "|| coalesce(sqft::text, '') || '|' || coalesce(description, ''))"
+)
+
+
+def _replace_fingerprint(expression):
+    # a generated column's expression can only be changed in place from
+    # Postgres 17 on; dropping and re-adding it works everywhere
+    op.drop_column("properties", "scoring_fingerprint")
+    op.add_column(
+        "properties",
+        sa.Column("scoring_fingerprint", sa.String(32), sa.Computed(expression, persisted=True), nullable=True),
+    )
+
+
+def upgrade():
+    # every stored input_fingerprint now differs, so the next re-analysis run rescores everything once
+    _replace_fingerprint(SCORING_FINGERPRINT_SQL)
+
+
+def downgrade():
+    _replace_fingerprint(PREVIOUS_SCORING_FINGERPRINT_SQL)
@@ -0,0 +1,27 @@
+"""add scrape_runs.checkpoint
+
+Revision ID: d68da1e13658
+Revises: 4c93732a003e
+Create Date: 2026-10-18 15:48:12.903117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd68da1e13658'
+down_revision: Union[str, Sequence[str], None] = '4c93732a003e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.add_column("scrape_runs", sa.Column("checkpoint", postgresql.JSONB(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("scrape_runs", "checkpoint")
@@ -0,0 +1,48 @@
+"""add market_stats
+
+Revision ID: fb7797fc6c5b
+Revises: 0e9b345cb002
+Create Date: 2026-10-18 13:41:09.274415
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fb7797fc6c5b'
+down_revision: Union[str, Sequence[str], None] = '0e9b345cb002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table(
+        "market_stats",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("scope", sa.String(10), nullable=False),
+        sa.Column("area_key", sa.String(200), nullable=False),
+        sa.Column("listing_count", sa.Integer(), nullable=False),
+        sa.Column("priced_sqft_count", sa.Integer(), nullable=False),
+        sa.Column("p25_price_per_sqft", sa.Numeric(12, 2), nullable=True),
+        sa.Column("median_price_per_sqft", sa.Numeric(12, 2), nullable=True),
+        sa.Column("p75_price_per_sqft", sa.Numeric(12, 2), nullable=True),
+        sa.Column("median_price", sa.Numeric(12, 2), nullable=True),
+        sa.Column("median_price_per_bed", sa.Numeric(12, 2), nullable=True),
+        sa.Column("refreshed_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ux_market_stats_scope_area_key", "market_stats", ["scope", "area_key"], unique=True)
+
+    # incremental refreshes aggregate only the zips/cities a scrape touched
+    op.create_index("ix_properties_zip", "properties", ["zip"])
+    op.create_index("ix_properties_city_state", "properties", ["city", "state"])
+
+    # populate with `python -m market_stats`, then rescore with `python -m reanalysis`
+
+def downgrade():
+    op.drop_index("ix_properties_city_state", table_name="properties")
+    op.drop_index("ix_properties_zip", table_name="properties")
+    op.drop_index("ux_market_stats_scope_area_key", table_name="market_stats")
+    op.drop_table("market_stats")
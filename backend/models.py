@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, Numeric, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, String, Text, Numeric, DateTime, ForeignKey, Computed, Index, func
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from db import Base
 
 
@@ -35,6 +35,10 @@ class Property(Base):
 
     description = Column(Text, nullable=True)
 
+    # Copy of analysis_results.score_total, written by the analyze endpoints.
+    # Lives here so sort=score_desc / min_score are served by one index.
+    score_total = Column(Numeric(5, 2), nullable=True)
+
     scraped_at = Column(DateTime(timezone=True), nullable=True)
 
     created_at = Column(
@@ -49,6 +53,52 @@ class Property(Base):
         nullable=False,
     )
 
+    # Lowercased address fields + description, maintained by Postgres.
+    # Backs the q filter (GIN) and ranked /properties/search (GiST KNN) via pg_trgm.
+    search_document = deferred(Column(
+        Text,
+        Computed(
+            "lower(address || ' ' || city || ' ' || state || ' ' || zip || ' ' || coalesce(description, ''))",
+            persisted=True,
+        ),
+    ))
+
+    # Hash of the scoring inputs (price, beds, baths, sqft, location,
+    # description), maintained by Postgres. analysis_results.input_fingerprint
+    # records the value a result was computed from, so the re-analysis job can
+    # skip unchanged properties.
+    scoring_fingerprint = Column(
+        String(32),
+        Computed(
+            "md5(coalesce(price::text, '') || '|' || coalesce(beds::text, '') || '|' "
+            "|| coalesce(baths::text, '') || '|' || coalesce(sqft::text, '') || '|' "
+            "|| zip || '|' || city || '|' || state || '|' || coalesce(description, ''))",
+            persisted=True,
+        ),
+    )
+
+    __table_args__ = (
+        Index("ix_properties_created_at_id", created_at.desc(), id.desc()),
+        Index("ix_properties_price", "price", postgresql_where=price.isnot(None)),
+        Index("ix_properties_beds_price", "beds", "price", postgresql_where=beds.isnot(None)),
+        Index("ix_properties_score_total_id", score_total.desc().nulls_last(), id.desc()),
+        # per-area market stats refresh (market_stats.py)
+        Index("ix_properties_zip", "zip"),
+        Index("ix_properties_city_state", "city", "state"),
+        Index(
+            "ix_properties_search_document_trgm",
+            "search_document",
+            postgresql_using="gin",
+            postgresql_ops={"search_document": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_properties_search_document_trgm_gist",
+            "search_document",
+            postgresql_using="gist",
+            postgresql_ops={"search_document": "gist_trgm_ops"},
+        ),
+    )
+
     # Relationships
     photos = relationship(
         "PropertyPhoto",
@@ -77,6 +127,7 @@ class Property(Base):
             "baths": float(self.baths) if self.baths is not None else None,
             "sqft": self.sqft,
             "description": self.description,
+            "score_total": float(self.score_total) if self.score_total is not None else None,
             "scraped_at": self.scraped_at.isoformat() if self.scraped_at else None,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
@@ -113,15 +164,41 @@ class PropertyPhoto(Base):
     photo_url = Column(String(1000), nullable=False)
     sort_order = Column(Integer, nullable=False)
 
+    # sha256 of the stored image (photos.py); NULL for photos we only link to
+    content_hash = Column(String(64), nullable=True)
+
+    # original size and resized copies (thumbnails.py); variants is NULL until derived
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    variants = Column(JSONB, nullable=True)
+
+    __table_args__ = (
+        Index("ix_property_photos_property_id_sort_order", "property_id", "sort_order"),
+        Index("ix_property_photos_content_hash", "content_hash"),
+        Index("ux_property_photos_property_id_content_hash", "property_id", "content_hash", unique=True),
+    )
+
     # Relationship
     property = relationship("Property", back_populates="photos")
 
+    def srcset(self):
+        """{"webp": "url 320w, ...", "jpeg": ...}, or None before variants exist."""
+        if not self.variants:
+            return None
+        by_format = {}
+        for v in sorted(self.variants, key=lambda v: v["width"]):
+            by_format.setdefault(v["format"], []).append(f"{v['url']} {v['width']}w")
+        return {fmt: ", ".join(candidates) for fmt, candidates in by_format.items()}
+
     def to_dict(self):
         return {
             "id": self.id,
             "property_id": self.property_id,
             "photo_url": self.photo_url,
             "sort_order": self.sort_order,
+            "width": self.width,
+            "height": self.height,
+            "srcset": self.srcset(),
         }
     
     def to_detail_dict(self, analysis=None):
@@ -157,6 +234,10 @@ class AnalysisResult(Base):
     score_breakdown = Column(JSONB, nullable=False)
     reasons = Column(JSONB, nullable=True)
 
+    # Inputs and heuristic version this row was computed from (see reanalysis.py)
+    input_fingerprint = Column(String(32), nullable=True)
+    scoring_version = Column(Integer, nullable=True)
+
     analyzed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -202,16 +283,79 @@ class ScrapeRun(Base):
     finished_at = Column(DateTime(timezone=True), nullable=True)
 
     properties_found = Column(Integer, nullable=False, default=0)
+    inserted_count = Column(Integer, nullable=False, default=0, server_default="0")
+    skipped_count = Column(Integer, nullable=False, default=0, server_default="0")
     error_count = Column(Integer, nullable=False, default=0)
 
     error_samples = Column(JSONB, nullable=True)
 
     max_results = Column(Integer, nullable=False, default=50)
 
+    # adapter names from scraper.registry; NULL on runs from before sources existed
+    sources = Column(JSONB, nullable=True)
+
+    # source name -> {"page", "page_size", "done"} for the last page whose
+    # items are committed; resume continues from here
+    checkpoint = Column(JSONB, nullable=True)
+
+    # pages the fetch cache answered (304 or identical body) vs fetched and parsed
+    cache_hits = Column(Integer, nullable=False, default=0, server_default="0")
+    cache_misses = Column(Integer, nullable=False, default=0, server_default="0")
+
 #
 #
 #
 # ScrapeRun
 #
 #
-#
\ No newline at end of file
+#
+
+
+
+#
+#
+#
+# MarketStat
+#
+#
+#
+class MarketStat(Base):
+    """Per-area price statistics, refreshed by market_stats.py. One row per zip and per city/state."""
+    __tablename__ = "market_stats"
+
+    id = Column(Integer, primary_key=True)
+
+    scope = Column(String(10), nullable=False)  # "zip" or "city"
+    area_key = Column(String(200), nullable=False)  # zip, or "city, state"
+
+    listing_count = Column(Integer, nullable=False)  # inventory
+    priced_sqft_count = Column(Integer, nullable=False)  # listings with price and sqft
+
+    p25_price_per_sqft = Column(Numeric(12, 2), nullable=True)
+    median_price_per_sqft = Column(Numeric(12, 2), nullable=True)
+    p75_price_per_sqft = Column(Numeric(12, 2), nullable=True)
+    median_price = Column(Numeric(12, 2), nullable=True)
+    # median monthly rent by the scorer's estimate (beds and sqft); there is no rent data
+    median_rent_estimate = Column(Numeric(12, 2), nullable=True)
+    # median_price_per_sqft when the area's analyses were last marked stale
+    baseline_price_per_sqft = Column(Numeric(12, 2), nullable=True)
+
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ux_market_stats_scope_area_key", "scope", "area_key", unique=True),
+    )
+
+    def to_dict(self):
+        return {
+            "scope": self.scope,
+            "area_key": self.area_key,
+            "listing_count": self.listing_count,
+            "priced_sqft_count": self.priced_sqft_count,
+            "p25_price_per_sqft": float(self.p25_price_per_sqft) if self.p25_price_per_sqft is not None else None,
+            "median_price_per_sqft": float(self.median_price_per_sqft) if self.median_price_per_sqft is not None else None,
+            "p75_price_per_sqft": float(self.p75_price_per_sqft) if self.p75_price_per_sqft is not None else None,
+            "median_price": float(self.median_price) if self.median_price is not None else None,
+            "median_rent_estimate": float(self.median_rent_estimate) if self.median_rent_estimate is not None else None,
+            "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
+        }
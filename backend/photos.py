@@ -0,0 +1,475 @@
+"""
+Listing photo pipeline: download, dedupe by content hash, upload, record.
+
+Photos are downloaded on the scraper's shared loop (so listing hosts get the
+same per-host limits and retries as page fetches) and hashed with sha256.
+Each distinct hash is stored once, at photos/<aa>/<sha256>.<ext>, so the same
+image on many listings (agent logos, stock exteriors) costs one object.
+Hashes already recorded in property_photos are not uploaded again. New
+objects go through one s3transfer TransferManager: a shared thread pool with
+multipart transfers above PHOTO_MULTIPART_THRESHOLD and an optional
+process-wide byte-rate cap. PropertyPhoto rows are written with one
+multi-row INSERT per chunk, with resized variants for srcset derived from
+the new originals on the way (thumbnails.py).
+
+Work is done PHOTO_BATCH_SIZE downloads at a time, so memory is bounded by
+the batch, not by the number of listings. Rows that still point at the
+photo's original host (seed data, generated listings) are brought into the
+store the same way by adopt_external_photos, run from `python -m thumbnails`.
+
+Off unless PHOTO_BUCKET is set. For local runs, point S3_ENDPOINT_URL at
+`python -m s3_stub` (or any S3-compatible server).
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import threading
+from posixpath import splitext
+from urllib.parse import urlsplit
+
+from sqlalchemy import bindparam, delete, func, null, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import Property, PropertyPhoto
+from thumbnails import derive_and_store, save_variants
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+PHOTO_BUCKET = os.getenv("PHOTO_BUCKET")
+PHOTO_KEY_PREFIX = os.getenv("PHOTO_KEY_PREFIX", "photos/")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+# where stored objects are served from; defaults to the bucket's S3 URL
+PHOTO_PUBLIC_BASE_URL = os.getenv("PHOTO_PUBLIC_BASE_URL")
+
+PHOTO_UPLOAD_WORKERS = int(os.getenv("PHOTO_UPLOAD_WORKERS", "8"))
+PHOTO_MAX_RETRIES = int(os.getenv("PHOTO_MAX_RETRIES", "3"))
+# bytes/second across all uploads in the process; 0 means uncapped
+PHOTO_MAX_BYTES_PER_SEC = int(os.getenv("PHOTO_MAX_BYTES_PER_SEC", "0"))
+PHOTO_MULTIPART_THRESHOLD = int(os.getenv("PHOTO_MULTIPART_THRESHOLD", str(8 * MB)))
+PHOTO_MULTIPART_CHUNKSIZE = int(os.getenv("PHOTO_MULTIPART_CHUNKSIZE", str(8 * MB)))
+
+PHOTO_BATCH_SIZE = int(os.getenv("PHOTO_BATCH_SIZE", "64"))
+PHOTO_MAX_BYTES = int(os.getenv("PHOTO_MAX_BYTES", str(25 * MB)))
+PHOTO_MAX_PER_PROPERTY = int(os.getenv("PHOTO_MAX_PER_PROPERTY", "40"))
+PHOTO_ROWS_CHUNK_SIZE = 1000
+MAX_ERROR_SAMPLES = 10
+
+EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/gif": "gif",
+    "image/avif": "avif",
+}
+
+
+class PhotoStore:
+    """
+    Content-addressed photo storage in one bucket. The boto3 client and the
+    TransferManager are created on first upload and shared by every thread
+    of the process; a forked child creates its own.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: str = None,
+        workers: int = PHOTO_UPLOAD_WORKERS,
+        max_retries: int = PHOTO_MAX_RETRIES,
+        max_bytes_per_sec: int = PHOTO_MAX_BYTES_PER_SEC,
+        multipart_threshold: int = PHOTO_MULTIPART_THRESHOLD,
+        multipart_chunksize: int = PHOTO_MULTIPART_CHUNKSIZE,
+        key_prefix: str = PHOTO_KEY_PREFIX,
+        public_base_url: str = PHOTO_PUBLIC_BASE_URL,
+    ):
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.workers = workers
+        self.max_retries = max_retries
+        self.max_bytes_per_sec = max_bytes_per_sec
+        self.multipart_threshold = multipart_threshold
+        self.multipart_chunksize = multipart_chunksize
+        self.key_prefix = key_prefix
+        self.public_base_url = public_base_url
+        self._manager = None
+        self._manager_pid = None
+        self._lock = threading.Lock()
+
+    def _get_manager(self):
+        with self._lock:
+            if self._manager is not None and self._manager_pid != os.getpid():
+                # forked: the parent's transfer threads and connections
+                # don't exist in this process
+                self._manager = None
+            if self._manager is None:
+                import boto3
+                from botocore.config import Config
+                from s3transfer.manager import TransferConfig, TransferManager
+
+                options = {
+                    # one connection per transfer thread
+                    "max_pool_connections": self.workers,
+                    "retries": {"max_attempts": self.max_retries + 1, "mode": "standard"},
+                }
+                if self.endpoint_url:
+                    # S3-compatible stand-ins: path-style URLs, plain (not aws-chunked) bodies
+                    options["s3"] = {"addressing_style": "path"}
+                    options["request_checksum_calculation"] = "when_required"
+                client = boto3.client("s3", endpoint_url=self.endpoint_url, config=Config(**options))
+                self._manager = TransferManager(client, TransferConfig(
+                    multipart_threshold=self.multipart_threshold,
+                    multipart_chunksize=self.multipart_chunksize,
+                    max_request_concurrency=self.workers,
+                    max_bandwidth=self.max_bytes_per_sec or None,
+                ))
+                self._manager_pid = os.getpid()
+            return self._manager
+
+    def key_for(self, content_hash: str, extension: str) -> str:
+        return f"{self.key_prefix}{content_hash[:2]}/{content_hash}.{extension}"
+
+    def url_for(self, key: str) -> str:
+        if self.public_base_url:
+            return f"{self.public_base_url.rstrip('/')}/{key}"
+        if self.endpoint_url:
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket}/{key}"
+        return f"https://{self.bucket}.s3.amazonaws.com/{key}"
+
+    def variant_key(self, content_hash: str, width: int, extension: str) -> str:
+        # next to the original: photos/<aa>/<sha256>-<width>w.<ext>
+        return f"{self.key_prefix}{content_hash[:2]}/{content_hash}-{width}w.{extension}"
+
+    def upload_objects(self, objects: dict):
+        """
+        Upload {key: (data, content_type)} concurrently.
+        Returns ({key: url}, {key: error}).
+        """
+        if not objects:
+            return {}, {}
+        manager = self._get_manager()
+        futures = {}
+        for key, (data, content_type) in objects.items():
+            extra_args = {"ContentType": content_type} if content_type else None
+            futures[key] = manager.upload(io.BytesIO(data), self.bucket, key, extra_args=extra_args)
+
+        stored, failed = {}, {}
+        for key, future in futures.items():
+            try:
+                future.result()
+                stored[key] = self.url_for(key)
+            except Exception as e:
+                failed[key] = e
+        return stored, failed
+
+    def upload_many(self, blobs: dict):
+        """
+        Upload originals {content_hash: (data, content_type, extension)}.
+        Returns ({content_hash: url}, {content_hash: error}).
+        """
+        keys = {self.key_for(h, extension): h for h, (_, _, extension) in blobs.items()}
+        stored, failed = self.upload_objects({
+            key: blobs[h][:2] for key, h in keys.items()
+        })
+        return (
+            {keys[key]: url for key, url in stored.items()},
+            {keys[key]: error for key, error in failed.items()},
+        )
+
+    def download(self, key: str) -> bytes:
+        manager = self._get_manager()
+        out = io.BytesIO()
+        manager.download(self.bucket, key, out).result()
+        return out.getvalue()
+
+    def shutdown(self):
+        with self._lock:
+            if self._manager is not None:
+                self._manager.shutdown()
+                self._manager = None
+
+
+photo_store = PhotoStore(PHOTO_BUCKET, endpoint_url=S3_ENDPOINT_URL) if PHOTO_BUCKET else None
+
+
+# ---- download ----
+
+def _extension(url: str, content_type: str) -> str:
+    if content_type in EXTENSIONS:
+        return EXTENSIONS[content_type]
+    ext = splitext(urlsplit(url).path)[1].lower().lstrip(".")
+    if ext == "jpeg":
+        return "jpg"
+    return ext if ext in EXTENSIONS.values() else "bin"
+
+
+async def _download(http, url: str):
+    response = await http.get(url)
+    response.raise_for_status()
+    data = response.content
+    if len(data) > PHOTO_MAX_BYTES:
+        raise ValueError(f"photo is {len(data):,} bytes, limit {PHOTO_MAX_BYTES:,}")
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if content_type and not content_type.startswith("image/"):
+        raise ValueError(f"not an image: {content_type}")
+    return data, content_type or None
+
+
+async def download_photos(http, urls):
+    """{url: (data, content_type) or the exception it failed with}"""
+    results = await asyncio.gather(*(_download(http, url) for url in urls), return_exceptions=True)
+    return dict(zip(urls, results))
+
+
+def _run_downloads(urls):
+    from scraper.runner import run_async
+
+    return run_async(lambda http: download_photos(http, urls))
+
+
+# ---- pipeline ----
+
+def _known_photos(session, hashes):
+    """
+    {content_hash: (url, info)} for hashes some property_photos row already
+    has, preferring a row whose variants are derived.
+    """
+    if not hashes:
+        return {}
+    rows = (
+        session.query(
+            PropertyPhoto.content_hash, PropertyPhoto.photo_url,
+            PropertyPhoto.width, PropertyPhoto.height, PropertyPhoto.variants,
+        )
+        .filter(PropertyPhoto.content_hash.in_(list(hashes)))
+        .distinct(PropertyPhoto.content_hash)
+        .order_by(PropertyPhoto.content_hash, PropertyPhoto.variants.is_(None))
+        .all()
+    )
+    return {
+        r.content_hash: (r.photo_url, {"width": r.width, "height": r.height, "variants": r.variants})
+        for r in rows
+    }
+
+
+def touch_properties(session, property_ids):
+    # photos are part of the detail payload, which is versioned by properties.updated_at
+    if not property_ids:
+        return
+    session.execute(
+        update(Property)
+        .where(Property.id.in_(list(property_ids)))
+        .values(updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _insert_photo_rows(session, rows):
+    for start in range(0, len(rows), PHOTO_ROWS_CHUNK_SIZE):
+        stmt = (
+            pg_insert(PropertyPhoto)
+            .values(rows[start:start + PHOTO_ROWS_CHUNK_SIZE])
+            .on_conflict_do_nothing(index_elements=[PropertyPhoto.property_id, PropertyPhoto.content_hash])
+        )
+        session.execute(stmt)
+
+
+def ingest_photos(session, photos_by_property: dict, store: PhotoStore = None, download=None):
+    """
+    Store photos for {property_id: [photo_url, ...]} and add their
+    PropertyPhoto rows (sort_order = position in the list). The caller
+    commits. Failed downloads/uploads are counted and skipped; the listing
+    keeps whichever photos made it.
+
+    `download(urls) -> {url: (data, content_type) | Exception}` defaults to
+    the scraper's shared client.
+    """
+    store = store or photo_store
+    stats = {
+        "photos": 0, "downloaded": 0, "download_errors": 0,
+        "distinct": 0, "uploaded": 0, "upload_errors": 0, "uploaded_bytes": 0,
+        "reused": 0, "derived": 0, "rows": 0, "error_samples": [],
+    }
+    if store is None or not photos_by_property:
+        return stats
+    download = download or _run_downloads
+
+    wanted = {
+        property_id: list(dict.fromkeys(urls))[:PHOTO_MAX_PER_PROPERTY]
+        for property_id, urls in photos_by_property.items()
+    }
+    urls = list(dict.fromkeys(url for urls in wanted.values() for url in urls))
+    stats["photos"] = sum(len(u) for u in wanted.values())
+
+    hash_by_url = {}
+    url_by_hash = {}
+    info_by_hash = {}
+
+    def sample(kind, key, error):
+        if len(stats["error_samples"]) < MAX_ERROR_SAMPLES:
+            stats["error_samples"].append({kind: key, "error": str(error) or type(error).__name__})
+
+    for start in range(0, len(urls), PHOTO_BATCH_SIZE):
+        batch = urls[start:start + PHOTO_BATCH_SIZE]
+        blobs = {}
+        for url, result in download(batch).items():
+            if isinstance(result, BaseException):
+                stats["download_errors"] += 1
+                sample("photo_url", url, result)
+                continue
+            data, content_type = result
+            stats["downloaded"] += 1
+            content_hash = hashlib.sha256(data).hexdigest()
+            hash_by_url[url] = content_hash
+            blobs.setdefault(content_hash, (data, content_type, _extension(url, content_type)))
+
+        new_hashes = [h for h in blobs if h not in url_by_hash]
+        known = _known_photos(session, new_hashes)
+        for content_hash, (url, info) in known.items():
+            url_by_hash[content_hash] = url
+            info_by_hash[content_hash] = info
+        stats["reused"] += len(known)
+
+        to_upload = {h: blobs[h] for h in new_hashes if h not in known}
+        stored, failed = store.upload_many(to_upload)
+        url_by_hash.update(stored)
+        stats["uploaded"] += len(stored)
+        stats["uploaded_bytes"] += sum(len(to_upload[h][0]) for h in stored)
+        stats["upload_errors"] += len(failed)
+        for content_hash, error in failed.items():
+            sample("content_hash", content_hash, error)
+
+        # variants while the originals are still in memory: for new uploads,
+        # and for known photos whose variants are still pending
+        pending = [h for h, (_, info) in known.items() if info["variants"] is None]
+        derived = derive_and_store(store, {h: blobs[h][0] for h in [*stored, *pending]})
+        info_by_hash.update(derived)
+        save_variants(session, {h: derived[h] for h in pending if h in derived})
+        stats["derived"] += len(derived)
+
+    rows = []
+    for property_id, property_urls in wanted.items():
+        for sort_order, url in enumerate(property_urls, start=1):
+            content_hash = hash_by_url.get(url)
+            if content_hash in url_by_hash:
+                info = info_by_hash.get(content_hash) or {}
+                rows.append({
+                    "property_id": property_id,
+                    "photo_url": url_by_hash[content_hash],
+                    "sort_order": sort_order,
+                    "content_hash": content_hash,
+                    "width": info.get("width"),
+                    "height": info.get("height"),
+                    # SQL NULL (pending), not JSON null
+                    "variants": info["variants"] if info.get("variants") is not None else null(),
+                })
+    _insert_photo_rows(session, rows)
+    touch_properties(session, {row["property_id"] for row in rows})
+
+    stats["distinct"] = len(set(hash_by_url.values()))
+    stats["rows"] = len(rows)
+    return stats
+
+
+def adopt_external_photos(session, store: PhotoStore = None, batch_size: int = PHOTO_BATCH_SIZE, download=None):
+    """
+    Copy photos still served from their original host (seed data, generated
+    listings) into the store, so they get a content hash and variants like
+    ingested ones: each row is pointed at the stored copy. A row whose image
+    its property already has is deleted, as ingest_photos would not have
+    written it. Rows that fail to download stay as they are and are retried
+    by the next run. One commit per batch; returns the number of rows adopted.
+    """
+    store = store or photo_store
+    if store is None:
+        return 0
+    download = download or _run_downloads
+    photos = PropertyPhoto.__table__
+    adopted = 0
+    last_id = 0
+    while True:
+        rows = (
+            session.query(PropertyPhoto.id, PropertyPhoto.property_id, PropertyPhoto.photo_url)
+            .filter(PropertyPhoto.content_hash.is_(None))
+            .filter(PropertyPhoto.id > last_id)
+            .order_by(PropertyPhoto.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return adopted
+        last_id = rows[-1].id
+
+        hash_by_url = {}
+        blobs = {}
+        for url, result in download(list(dict.fromkeys(r.photo_url for r in rows))).items():
+            if isinstance(result, BaseException):
+                logger.warning("photo %s: cannot fetch: %s", url, result)
+                continue
+            data, content_type = result
+            content_hash = hashlib.sha256(data).hexdigest()
+            hash_by_url[url] = content_hash
+            blobs.setdefault(content_hash, (data, content_type, _extension(url, content_type)))
+
+        known = _known_photos(session, list(blobs))
+        stored, failed = store.upload_many({h: blob for h, blob in blobs.items() if h not in known})
+        for content_hash, error in failed.items():
+            logger.warning("photo %s: upload failed: %s", content_hash, error)
+        pending = [h for h, (_, info) in known.items() if info["variants"] is None]
+        derived = derive_and_store(store, {h: blobs[h][0] for h in [*stored, *pending]})
+        save_variants(session, {h: derived[h] for h in pending if h in derived})
+
+        url_by_hash = {h: url for h, (url, _) in known.items()}
+        url_by_hash.update(stored)
+        info_by_hash = {h: info for h, (_, info) in known.items()}
+        info_by_hash.update(derived)
+
+        taken = set(
+            session.query(PropertyPhoto.property_id, PropertyPhoto.content_hash)
+            .filter(PropertyPhoto.property_id.in_({r.property_id for r in rows}))
+            .filter(PropertyPhoto.content_hash.isnot(None))
+            .all()
+        )
+        updates, duplicates = [], []
+        for r in rows:
+            content_hash = hash_by_url.get(r.photo_url)
+            info = info_by_hash.get(content_hash)
+            # not stored, or variants still pending: retried by the next run
+            if content_hash not in url_by_hash or info is None or info["variants"] is None:
+                continue
+            if (r.property_id, content_hash) in taken:
+                duplicates.append(r.id)
+                continue
+            taken.add((r.property_id, content_hash))
+            updates.append({
+                "b_id": r.id,
+                "b_photo_url": url_by_hash[content_hash],
+                "b_content_hash": content_hash,
+                "b_width": info["width"],
+                "b_height": info["height"],
+                "b_variants": info["variants"],
+            })
+
+        if updates:
+            session.connection().execute(
+                update(photos)
+                .where(photos.c.id == bindparam("b_id"))
+                .values(
+                    photo_url=bindparam("b_photo_url"),
+                    content_hash=bindparam("b_content_hash"),
+                    width=bindparam("b_width"),
+                    height=bindparam("b_height"),
+                    variants=bindparam("b_variants", type_=photos.c.variants.type),
+                ),
+                updates,
+            )
+        if duplicates:
+            session.execute(delete(photos).where(photos.c.id.in_(duplicates)))
+        changed = {u["b_id"] for u in updates} | set(duplicates)
+        touch_properties(session, {r.property_id for r in rows if r.id in changed})
+        session.commit()
+        adopted += len(updates)
+        logger.info("photos: %s external photos adopted so far", adopted)
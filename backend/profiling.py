@@ -0,0 +1,259 @@
+"""
+On-demand profiling of single requests.
+
+Off unless PROFILE_TOKEN is set; then nothing is registered on the app and
+requests pay nothing. With a token, a request is profiled when it carries
+`X-Profile: <token>`, or at random with probability PROFILE_SAMPLE_RATE.
+The token is only read from the header: a query parameter would end up in
+access logs and in the slow-request and error logs, which print the path.
+
+Two profilers:
+- "sample" (default): a helper thread samples the request thread's stack
+  every PROFILE_INTERVAL_MS and the capture is a collapsed-stack file
+  (`frame;frame;frame count` lines), ready for flamegraph.pl or speedscope.
+  Time blocked in the database shows up under the driver's execute frame.
+- "cprofile" (`X-Profile-Mode: cprofile`): deterministic, every call; the
+  capture is a .pstats file for `python -m pstats` or snakeviz. Much
+  heavier, for when sampling misses short calls.
+
+Captures go to PROFILE_DIR with a JSON sidecar (route, status, timing and
+the error, if the request raised). The directory is pruned oldest-first to
+PROFILE_MAX_FILES captures and PROFILE_MAX_BYTES. /admin/profiles lists
+and serves them to callers with the token.
+"""
+import cProfile
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from flask import g, request
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "brrrr-radar-profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+PROFILE_MAX_BYTES = int(os.getenv("PROFILE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+PROFILE_MODES = ("sample", "cprofile")
+EXTENSIONS = {"sample": "collapsed", "cprofile": "pstats"}
+CAPTURE_ID = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+
+_prune_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return bool(PROFILE_TOKEN)
+
+
+def authorized(token) -> bool:
+    return enabled() and bool(token) and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+def request_token():
+    """Token from X-Profile-Token or `Authorization: Bearer`, for the admin endpoints."""
+    token = request.headers.get("X-Profile-Token")
+    if token:
+        return token
+    scheme, _, value = (request.headers.get("Authorization") or "").partition(" ")
+    return value if scheme.lower() == "bearer" else None
+
+
+# ---- profilers ----
+
+class StackSampler:
+    """Samples one thread's stack from a helper thread into collapsed stacks."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def output(self) -> bytes:
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common()).encode("utf-8")
+
+
+class CallProfiler:
+    def __init__(self):
+        self.samples = None
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def output(self) -> bytes:
+        # pstats only reads from files; write to a temp one and take the bytes
+        with tempfile.NamedTemporaryFile(suffix=".pstats") as f:
+            self._profile.dump_stats(f.name)
+            return f.read()
+
+
+# ---- request hooks ----
+
+def _trigger():
+    token = request.headers.get("X-Profile")
+    if token is not None:
+        return "request" if authorized(token) else None
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        return "sample"
+    return None
+
+
+def _start_profile():
+    trigger = _trigger()
+    if trigger is None:
+        return
+    mode = (request.headers.get("X-Profile-Mode") or "sample").lower()
+    if trigger == "sample" or mode not in PROFILE_MODES:
+        mode = "sample"
+    profiler = (
+        StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+        if mode == "sample" else CallProfiler()
+    )
+    g.profile = {
+        "mode": mode,
+        "trigger": trigger,
+        "profiler": profiler,
+        "started_at": datetime.now(timezone.utc),
+        "started": time.perf_counter(),
+    }
+    profiler.start()
+
+
+def _finish_profile(response):
+    profile = g.pop("profile", None)
+    if profile is None:
+        return response
+    profile["profiler"].stop()
+    elapsed = time.perf_counter() - profile["started"]
+
+    meta = {
+        "method": request.method,
+        "path": request.full_path.rstrip("?"),
+        "route": request.url_rule.rule if request.url_rule is not None else None,
+        "status": response.status_code,
+        "duration_ms": round(elapsed * 1000, 2),
+        "mode": profile["mode"],
+        "trigger": profile["trigger"],
+        "samples": profile["profiler"].samples,
+        "started_at": profile["started_at"].isoformat(),
+        "error": g.get("request_error"),
+    }
+    capture_id = store_capture(meta, profile["profiler"].output())
+    response.headers["X-Profile-Id"] = capture_id
+    return response
+
+
+def init_app(app):
+    if not enabled():
+        return
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+
+
+# ---- storage ----
+
+def store_capture(meta: dict, data: bytes) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    capture_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    filename = f"{capture_id}.{EXTENSIONS[meta['mode']]}"
+    meta = {"id": capture_id, "file": filename, "bytes": len(data), **meta}
+    for name, body in ((filename, data), (f"{capture_id}.json", json.dumps(meta).encode("utf-8"))):
+        tmp = os.path.join(PROFILE_DIR, f".{name}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, os.path.join(PROFILE_DIR, name))
+    _prune()
+    return capture_id
+
+
+def _captures():
+    """[(mtime, capture_id, bytes on disk)], newest first."""
+    try:
+        names = os.listdir(PROFILE_DIR)
+    except FileNotFoundError:
+        return []
+    sizes = {}
+    for name in names:
+        if name.startswith("."):
+            continue
+        capture_id = name.partition(".")[0]
+        try:
+            st = os.stat(os.path.join(PROFILE_DIR, name))
+        except FileNotFoundError:
+            continue
+        mtime, size = sizes.get(capture_id, (0, 0))
+        sizes[capture_id] = (max(mtime, st.st_mtime), size + st.st_size)
+    return sorted(((m, cid, size) for cid, (m, size) in sizes.items()), reverse=True)
+
+
+def _prune():
+    with _prune_lock:
+        captures = _captures()
+        total = sum(size for _, _, size in captures)
+        while captures and (len(captures) > PROFILE_MAX_FILES or total > PROFILE_MAX_BYTES):
+            _, capture_id, size = captures.pop()
+            for name in os.listdir(PROFILE_DIR):
+                if name.partition(".")[0] == capture_id:
+                    try:
+                        os.remove(os.path.join(PROFILE_DIR, name))
+                    except FileNotFoundError:
+                        pass
+            total -= size
+
+
+def list_captures(limit: int = 50):
+    items = []
+    for _, capture_id, _ in _captures()[:limit]:
+        try:
+            with open(os.path.join(PROFILE_DIR, f"{capture_id}.json"), encoding="utf-8") as f:
+                items.append(json.load(f))
+        except (FileNotFoundError, ValueError):
+            continue
+    return items
+
+
+def capture_path(capture_id: str):
+    """Path of a capture's profile file, or None."""
+    if not CAPTURE_ID.match(capture_id):
+        return None
+    for mode in PROFILE_MODES:
+        path = os.path.join(PROFILE_DIR, f"{capture_id}.{EXTENSIONS[mode]}")
+        if os.path.exists(path):
+            return path
+    return None
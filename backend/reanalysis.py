@@ -0,0 +1,215 @@
+"""
+Incremental (re-)analysis.
+
+A property needs scoring when it has no analysis row, when its scoring
+inputs changed since the row was written (properties.scoring_fingerprint
+vs analysis_results.input_fingerprint), or when the row was produced by an
+older SCORING_VERSION. Everything else is left alone. Refreshing market
+stats (market_stats.py) marks the affected areas stale as well.
+
+Run the job from backend/ after a scrape or a heuristic change:
+    python -m reanalysis
+"""
+import argparse
+import logging
+import os
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy import bindparam, func, or_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from comps import comps_index
+from db import SessionLocal
+from market_stats import market_stats_cache
+from models import AnalysisResult, Property
+from scoring import SCORING_VERSION, compute_analysis_batch, needs_rehab
+
+logger = logging.getLogger(__name__)
+
+REANALYZE_CHUNK_SIZE = int(os.getenv("REANALYZE_CHUNK_SIZE", "5000"))
+
+
+def needs_analysis():
+    return or_(
+        AnalysisResult.id.is_(None),
+        AnalysisResult.input_fingerprint.is_distinct_from(Property.scoring_fingerprint),
+        AnalysisResult.scoring_version.is_distinct_from(SCORING_VERSION),
+    )
+
+
+def analysis_query(session, force: bool = False):
+    """
+    Scoring inputs plus the current result for each property. Callers add
+    their own filters; with force=False only stale properties are returned.
+    """
+    query = session.query(
+        Property.id,
+        Property.price,
+        Property.beds,
+        Property.baths,
+        Property.sqft,
+        Property.description,
+        Property.zip,
+        Property.city,
+        Property.state,
+        Property.scoring_fingerprint,
+        AnalysisResult.score_total.label("current_score_total"),
+        AnalysisResult.score_breakdown.label("current_score_breakdown"),
+        AnalysisResult.reasons.label("current_reasons"),
+    ).outerjoin(AnalysisResult, AnalysisResult.property_id == Property.id)
+    if not force:
+        query = query.filter(needs_analysis())
+    return query
+
+
+def _sync_property_scores(session, scores):
+    # properties.score_total mirrors analysis_results.score_total so list
+    # sort/filter by score is a single indexed query. Core executemany with
+    # updated_at pinned: a rescore is not a change to the listing itself.
+    if not scores:
+        return
+    properties = Property.__table__
+    stmt = (
+        update(properties)
+        .where(properties.c.id == bindparam("b_id"))
+        .values(score_total=bindparam("b_score"), updated_at=properties.c.updated_at)
+    )
+    session.connection().execute(stmt, [{"b_id": pid, "b_score": score} for pid, score in scores])
+
+
+def _upsert_analysis_rows(session, rows):
+    # One INSERT ... ON CONFLICT for the whole batch instead of lookup + write per property
+    if not rows:
+        return
+    stmt = pg_insert(AnalysisResult)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[AnalysisResult.property_id],
+        set_={
+            "score_total": stmt.excluded.score_total,
+            "score_breakdown": stmt.excluded.score_breakdown,
+            "reasons": stmt.excluded.reasons,
+            "input_fingerprint": stmt.excluded.input_fingerprint,
+            "scoring_version": stmt.excluded.scoring_version,
+            "analyzed_at": func.now(),
+            "updated_at": func.now(),
+        },
+    )
+    session.execute(stmt, rows)
+    _sync_property_scores(session, [(r["property_id"], r["score_total"]) for r in rows])
+
+
+def _mark_current(session, rows):
+    # Same result as before: only record that it is current. updated_at is
+    # pinned so ETags and cached detail payloads stay valid.
+    if not rows:
+        return
+    results = AnalysisResult.__table__
+    stmt = (
+        update(results)
+        .where(results.c.property_id == bindparam("b_property_id"))
+        .values(
+            input_fingerprint=bindparam("b_fingerprint"),
+            scoring_version=SCORING_VERSION,
+            updated_at=results.c.updated_at,
+        )
+    )
+    session.connection().execute(
+        stmt,
+        [{"b_property_id": r["property_id"], "b_fingerprint": r["input_fingerprint"]} for r in rows],
+    )
+
+
+def analyze_rows(session, rows):
+    """
+    Score rows from analysis_query() and write only what changed.
+
+    Returns the ids whose stored result changed (inserted or rewritten).
+    Rows whose recomputed result equals the stored one only get their
+    fingerprint/version bumped.
+    """
+    # 503 while the comps index loads, rather than scoring with formula ARVs
+    comps_index.refresh(session)
+    results = compute_analysis_batch(
+        [r.price for r in rows],
+        [r.beds for r in rows],
+        [r.sqft for r in rows],
+        [needs_rehab(r.description) for r in rows],
+        [market_stats_cache.median_price_per_sqft(r.zip, r.city, r.state) for r in rows],
+        [comps_index.arv_estimate(r.id, r.zip, r.sqft, r.beds, r.baths, r.price) for r in rows],
+    )
+
+    changed = []
+    unchanged = []
+    for r, (score_total, score_breakdown, reasons) in zip(rows, results):
+        out = {
+            "property_id": r.id,
+            "score_total": Decimal(str(score_total)),
+            "score_breakdown": score_breakdown,
+            "reasons": reasons,
+            "input_fingerprint": r.scoring_fingerprint,
+            "scoring_version": SCORING_VERSION,
+        }
+        # score_total is NUMERIC(5,2): compare at the precision it is stored with
+        same = (
+            r.current_score_total is not None
+            and r.current_score_total == out["score_total"].quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+            and r.current_score_breakdown == score_breakdown
+            and r.current_reasons == reasons
+        )
+        (unchanged if same else changed).append(out)
+
+    _upsert_analysis_rows(session, changed)
+    _mark_current(session, unchanged)
+    return [out["property_id"] for out in changed]
+
+
+def reanalyze(session, query, chunk_size=None, commit=False):
+    """
+    Walk `query` (from analysis_query(), possibly filtered) in primary-key
+    chunks and analyze each one. Keyset pagination rather than one
+    long-lived cursor, so commit=True can commit chunk by chunk and an
+    interrupted run simply picks up the remaining stale rows next time.
+
+    Returns analyzed_count, updated_count and updated_ids.
+    """
+    chunk_size = chunk_size or REANALYZE_CHUNK_SIZE
+    analyzed = 0
+    updated_ids = []
+    last_id = 0
+
+    while True:
+        rows = query.filter(Property.id > last_id).order_by(Property.id).limit(chunk_size).all()
+        if not rows:
+            break
+        updated_ids.extend(analyze_rows(session, rows))
+        analyzed += len(rows)
+        last_id = rows[-1].id
+        if commit:
+            session.commit()
+            logger.info("re-analyzed %s properties (%s changed) through id %s", analyzed, len(updated_ids), last_id)
+
+    return {
+        "analyzed_count": analyzed,
+        "updated_count": len(updated_ids),
+        "updated_ids": updated_ids,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score properties whose inputs or scoring version changed.")
+    parser.add_argument("--chunk-size", type=int, default=REANALYZE_CHUNK_SIZE)
+    parser.add_argument("--force", action="store_true", help="re-score every property")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    comps_index.ensure_loaded()
+    session = SessionLocal()
+    try:
+        result = reanalyze(session, analysis_query(session, force=args.force), args.chunk_size, commit=True)
+    finally:
+        session.close()
+    print(f"analyzed {result['analyzed_count']}, changed {result['updated_count']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+from flask import Blueprint, current_app, jsonify
+
+from db import pool_status
+from metrics import render
+
+metrics_bp = Blueprint("metrics", __name__)
+
+@metrics_bp.get("/metrics/db")
+def db_metrics():
+    # per worker process: each has its own engine and pool
+    return jsonify(pool_status())
+
+@metrics_bp.get("/metrics")
+def prometheus_metrics():
+    return current_app.response_class(render(), mimetype="text/plain; version=0.0.4")
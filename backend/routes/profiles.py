@@ -0,0 +1,46 @@
+import os
+
+from flask import Blueprint, jsonify, request, send_file
+
+from api_errors import ApiError
+from profiling import authorized, capture_path, enabled, list_captures, request_token
+
+profiles_bp = Blueprint("profiles", __name__)
+
+PROFILES_MAX_LIMIT = 200
+
+
+@profiles_bp.before_request
+def require_profile_token():
+    if not enabled():
+        raise ApiError(code="NOT_FOUND", message="Profiling is not enabled", status=404)
+    if not authorized(request_token()):
+        raise ApiError(code="UNAUTHORIZED", message="A valid profile token is required", status=401)
+
+
+@profiles_bp.get("/admin/profiles")
+def get_profiles():
+    try:
+        limit = min(max(int(request.args.get("limit", 50)), 1), PROFILES_MAX_LIMIT)
+    except ValueError:
+        raise ApiError(
+            code="VALIDATION_ERROR",
+            message="'limit' must be an integer",
+            status=400,
+            details={"field": "limit"},
+        )
+    return jsonify({"items": list_captures(limit)})
+
+
+@profiles_bp.get("/admin/profiles/<capture_id>")
+def get_profile(capture_id: str):
+    path = capture_path(capture_id)
+    if path is None:
+        raise ApiError(code="NOT_FOUND", message=f"Profile {capture_id} not found", status=404)
+    collapsed = path.endswith(".collapsed")
+    return send_file(
+        path,
+        mimetype="text/plain" if collapsed else "application/octet-stream",
+        as_attachment=not collapsed,
+        download_name=os.path.basename(path),
+    )
@@ -1,22 +1,44 @@
-from flask import Blueprint, request, jsonify
-from sqlalchemy import or_
-from sqlalchemy.orm import selectinload
+import base64
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+from flask import Blueprint, current_app, request, jsonify
+from sqlalchemy import or_, func, text, tuple_
+from sqlalchemy.orm import Query, selectinload
 
 from models import Property, AnalysisResult
-from db import SessionLocal
+from db import SessionLocal, get_session
 from decimal import Decimal
 from api_errors import ApiError
+from cache import property_count_cache, property_detail_cache
+from comps import COMPS_DEFAULT_K, COMPS_MAX_K, comps_index
+from reanalysis import analysis_query, reanalyze
+from export import EXPORT_BATCH_SIZE, EXPORT_FORMATS, EXPORT_MIMETYPES, EXPORT_WRITERS, export_columns, load_pyarrow
+from serialization import ANALYSIS_LIST_COLUMNS, PROPERTY_LIST_COLUMNS, json_response, property_rows_to_dicts
 
 properties_bp = Blueprint("properties", __name__)
 
-def _get_int(name: str, default: int, *, min_value=None, max_value=None):
-    raw = request.args.get(name)
+TOTAL_MODES = ("exact", "estimate", "none")
+LIST_SORTS = ("newest", "score_desc")
+LIST_INCLUDES = ("analysis",)
+
+SEARCH_MAX_LIMIT = 50
+SEARCH_SIMILARITY_THRESHOLD = float(os.getenv("SEARCH_SIMILARITY_THRESHOLD", "0.4"))
+
+ANALYZE_BATCH_SIZE = 5000
+ANALYZE_MAX_IDS = 50000
+
+def _get_int(name: str, default: int, *, min_value=None, max_value=None, args=None):
+    args = request.args if args is None else args
+    raw = args.get(name)
     if raw is None or raw == "":
         value = default
     else:
         try:
             value = int(raw)
-        except ValueError:
+        except (TypeError, ValueError):
             raise ApiError(
                 code="VALIDATION_ERROR",
                 message=f"'{name}' must be an integer",
@@ -43,194 +65,552 @@ def _get_int(name: str, default: int, *, min_value=None, max_value=None):
     return value
 
 
-def _get_float(name: str):
-    raw = request.args.get(name)
+def _get_float(name: str, args=None):
+    args = request.args if args is None else args
+    raw = args.get(name)
     if raw is None or raw == "":
         return None
     try:
         return float(raw)
-    except ValueError:
+    except (TypeError, ValueError):
         raise ValueError(f"'{name}' must be a number")
 
-@properties_bp.get("/properties")
-def get_properties():
+def _parse_filters(args=None):
+    args = request.args if args is None else args
     try:
-        page = _get_int("page", 1, min_value=1)
-        page_size = _get_int("page_size", 20, min_value=1, max_value=100)
-
-        q = (request.args.get("q") or "").strip()
-        min_price = _get_float("min_price")
-        max_price = _get_float("max_price")
-        min_beds = _get_int("min_beds", 0, min_value=0)
+        return {
+            "q": str(args.get("q") or "").strip(),
+            "min_price": _get_float("min_price", args),
+            "max_price": _get_float("max_price", args),
+            "min_beds": _get_int("min_beds", 0, min_value=0, args=args),
+            "min_score": _get_float("min_score", args),
+        }
     except ValueError as e:
         raise ApiError(code="VALIDATION_ERROR", message=str(e), status=400)
 
-    session = SessionLocal()
+
+def _like_pattern(q: str) -> str:
+    escaped = q.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _apply_filters(query, filters):
+    q = filters["q"]
+    if q:
+        # search_document is already lowercased; LIKE on it is served by the trigram index
+        query = query.filter(Property.search_document.like(_like_pattern(q), escape="\\"))
+
+    if filters["min_price"] is not None:
+        query = query.filter(Property.price >= filters["min_price"])
+
+    if filters["max_price"] is not None:
+        query = query.filter(Property.price <= filters["max_price"])
+
+    if filters["min_beds"] > 0:
+        query = query.filter(Property.beds >= filters["min_beds"])
+
+    if filters["min_score"] is not None:
+        query = query.filter(Property.score_total >= filters["min_score"])
+
+    return query
+
+
+def _order_by(sort: str):
+    # id breaks ties so every sort is a total order (needed for cursors)
+    if sort == "score_desc":
+        return [Property.score_total.desc().nulls_last(), Property.id.desc()]
+    return [Property.created_at.desc(), Property.id.desc()]
+
+
+def _encode_cursor(prop, sort: str):
+    data = {"k": sort, "i": prop.id}
+    if sort == "score_desc":
+        data["s"] = str(prop.score_total) if prop.score_total is not None else None
+    else:
+        data["c"] = prop.created_at.isoformat()
+    raw = json.dumps(data, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: str):
     try:
-        query = session.query(Property)
-
-        if q:
-            like = f"%{q}%"
-            query = query.filter(
-                or_(
-                    Property.address.ilike(like),
-                    Property.city.ilike(like),
-                    Property.state.ilike(like),
-                    Property.zip.ilike(like),
-                )
-            )
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if data.get("k", "newest") != sort:
+            raise ValueError("cursor was issued for a different sort")
+        last_id = int(data["i"])
+        if sort == "score_desc":
+            score = data["s"]
+            return (Decimal(score) if score is not None else None), last_id
+        return datetime.fromisoformat(data["c"]), last_id
+    except (ValueError, KeyError, TypeError, ArithmeticError):
+        raise ApiError(
+            code="VALIDATION_ERROR",
+            message="'cursor' is invalid",
+            status=400,
+            details={"field": "cursor"},
+        )
+
+
+def _apply_cursor(query, sort: str, cursor: str):
+    # keyset: seek past the last row of the previous page instead of OFFSET
+    key, last_id = _decode_cursor(cursor, sort)
+    if sort != "score_desc":
+        return query.filter(tuple_(Property.created_at, Property.id) < tuple_(key, last_id))
+
+    # score_total DESC NULLS LAST: unscored rows come after every scored one
+    if key is None:
+        return query.filter(Property.score_total.is_(None), Property.id < last_id)
+    return query.filter(
+        or_(
+            tuple_(Property.score_total, Property.id) < tuple_(key, last_id),
+            Property.score_total.is_(None),
+        )
+    )
+
+
+def _has_filters(filters):
+    return bool(
+        filters["q"]
+        or filters["min_price"] is not None
+        or filters["max_price"] is not None
+        or filters["min_beds"] > 0
+        or filters["min_score"] is not None
+    )
+
+
+def _filters_key(filters):
+    # q matches the lowercased search_document, so 'Newark' and 'newark' share an entry
+    return tuple(sorted({**filters, "q": filters["q"].lower()}.items()))
 
-        if min_price is not None:
-            query = query.filter(Property.price >= min_price)
 
-        if max_price is not None:
-            query = query.filter(Property.price <= max_price)
+def _exact_total(query, filters):
+    key = _filters_key(filters)
+    total = property_count_cache.get(key)
+    if total is None:
+        # count(*) over the filtered table, not a subquery of every mapped column
+        total = query.with_entities(func.count(Property.id)).scalar()
+        property_count_cache.set(key, total)
+    return total
 
-        if min_beds > 0:
-            query = query.filter(Property.beds >= min_beds)
 
-        total = query.count()
+def _estimated_total(session, query, filters):
+    if not _has_filters(filters):
+        reltuples = session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'properties'::regclass")
+        ).scalar()
+        # -1 means the table has never been vacuumed/analyzed
+        if reltuples is not None and reltuples >= 0:
+            return int(reltuples)
 
-        items = (
-            query.order_by(Property.created_at.desc())
-                 .offset((page - 1) * page_size)
-                 .limit(page_size)
-                 .all()
+    # Planner row estimate for the filtered query, no rows are read
+    compiled = query.with_entities(Property.id).statement.compile(dialect=session.bind.dialect)
+    plan = session.connection().exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+@properties_bp.get("/properties")
+def get_properties():
+    cursor = (request.args.get("cursor") or "").strip()
+    if cursor and request.args.get("page"):
+        raise ApiError(
+            code="VALIDATION_ERROR",
+            message="Use either 'cursor' or 'page', not both",
+            status=400,
+            details={"field": "cursor"},
         )
 
-        return jsonify({
-            "items": [p.to_dict() for p in items],
-            "total": total,
-            "page": page,
-            "page_size": page_size,
-        })
-    finally:
-        session.close()
+    page = _get_int("page", 1, min_value=1)
+    page_size = _get_int("page_size", 20, min_value=1, max_value=100)
+    filters = _parse_filters()
 
-@properties_bp.get("/properties/<int:property_id>")
-def get_property(property_id: int):
-    session = SessionLocal()
-    try:
-        prop = (
-            session.query(Property)
-            .options(selectinload(Property.photos))
-            .filter(Property.id == property_id)
-            .one_or_none()
+    sort = (request.args.get("sort") or "newest").strip().lower()
+    if sort not in LIST_SORTS:
+        raise ApiError(
+            code="VALIDATION_ERROR",
+            message=f"'sort' must be one of {', '.join(LIST_SORTS)}",
+            status=400,
+            details={"field": "sort", "allowed": list(LIST_SORTS)},
         )
 
-        if prop is None:
-            return jsonify({"error": f"Property {property_id} not found"}), 404
+    include = {part.strip().lower() for part in (request.args.get("include") or "").split(",") if part.strip()}
+    if include - set(LIST_INCLUDES):
+        raise ApiError(
+            code="VALIDATION_ERROR",
+            message=f"'include' may contain {', '.join(LIST_INCLUDES)}",
+            status=400,
+            details={"field": "include", "allowed": list(LIST_INCLUDES)},
+        )
 
-        analysis = (
-            session.query(AnalysisResult)
-            .filter(AnalysisResult.property_id == property_id)
-            .one_or_none()
+    total_mode = (request.args.get("total_mode") or "exact").strip().lower()
+    if total_mode not in TOTAL_MODES:
+        raise ApiError(
+            code="VALIDATION_ERROR",
+            message=f"'total_mode' must be one of {', '.join(TOTAL_MODES)}",
+            status=400,
+            details={"field": "total_mode", "allowed": list(TOTAL_MODES)},
         )
 
-        return jsonify({
-            **prop.to_dict(),
-            "photos": [p.to_dict() for p in (prop.photos or [])],
-            "analysis": analysis.to_dict() if analysis else None,
-        })
-    
+    session = get_session()
+    # column projection: rows are plain tuples, no ORM instances to build
+    query = _apply_filters(session.query(*PROPERTY_LIST_COLUMNS), filters)
+
+    if total_mode == "exact":
+        total = _exact_total(query, filters)
+    elif total_mode == "estimate":
+        total = _estimated_total(session, query, filters)
+    else:
+        total = None
+
+    if "analysis" in include:
+        # one-to-one (unique property_id), so the join never multiplies rows
+        query = query.add_columns(*ANALYSIS_LIST_COLUMNS).outerjoin(
+            AnalysisResult, AnalysisResult.property_id == Property.id
+        )
+
+    query = query.order_by(*_order_by(sort))
+
+    if cursor:
+        query = _apply_cursor(query, sort, cursor)
+    else:
+        query = query.offset((page - 1) * page_size)
+
+    # one extra row tells us whether there is a next page
+    rows = query.limit(page_size + 1).all()
+    rows, has_more = rows[:page_size], len(rows) > page_size
+
+    items = property_rows_to_dicts(rows, with_analysis="analysis" in include)
+    next_cursor = _encode_cursor(rows[-1], sort) if has_more else None
+
+    response = {
+        "items": items,
+        "total": total,
+        "total_mode": total_mode,
+        "has_more": has_more,
+        "page_size": page_size,
+        "sort": sort,
+        "next_cursor": next_cursor,
+    }
+    if not cursor:
+        response["page"] = page
+
+    return json_response(response)
+
+@properties_bp.get("/properties/search")
+def search_properties():
+    q = (request.args.get("q") or "").strip().lower()
+    if not q:
+        raise ApiError(
+            code="VALIDATION_ERROR",
+            message="'q' is required",
+            status=400,
+            details={"field": "q"},
+        )
+    limit = _get_int("limit", 10, min_value=1, max_value=SEARCH_MAX_LIMIT)
+
+    session = get_session()
+    # transaction-local threshold for the %> operator below (pg_trgm default is 0.6)
+    session.execute(
+        text("SELECT set_config('pg_trgm.word_similarity_threshold', :t, true)"),
+        {"t": str(SEARCH_SIMILARITY_THRESHOLD)},
+    )
+
+    rank = func.word_similarity(q, Property.search_document)
+    rows = (
+        session.query(Property, rank.label("rank"))
+        # typo tolerant: word_similarity(q, search_document) above the threshold
+        .filter(Property.search_document.op("%>", is_comparison=True)(q))
+        # nearest first, walked straight off the GiST index
+        .order_by(Property.search_document.op("<->>")(q))
+        .limit(limit)
+        .all()
+    )
+
+    return jsonify({
+        "q": q,
+        "items": [{**p.to_dict(), "rank": float(r)} for p, r in rows],
+    })
+
+def _export_stream(stmt, fmt: str, with_analysis: bool):
+    # The session is opened inside the generator so it lives exactly as long
+    # as the response body; werkzeug closes the generator when the client is
+    # done or disconnects. Not the request session: the body outlives the
+    # request context that get_session() is torn down with.
+    session = SessionLocal()
+    try:
+        # yield_per streams through a server-side cursor, EXPORT_BATCH_SIZE rows at a time
+        result = session.execute(stmt, execution_options={"yield_per": EXPORT_BATCH_SIZE})
+        yield from EXPORT_WRITERS[fmt](result.partitions(), with_analysis)
     finally:
         session.close()
 
+
+@properties_bp.get("/properties/export")
+def export_properties():
+    fmt = (request.args.get("format") or "ndjson").strip().lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ApiError(
+            code="VALIDATION_ERROR",
+            message=f"'format' must be one of {', '.join(EXPORT_FORMATS)}",
+            status=400,
+            details={"field": "format", "allowed": list(EXPORT_FORMATS)},
+        )
+    if fmt == "parquet" and load_pyarrow() is None:
+        raise ApiError(
+            code="EXPORT_FORMAT_UNAVAILABLE",
+            message="Parquet export needs pyarrow installed on the server",
+            status=501,
+            details={"field": "format"},
+        )
+
+    filters = _parse_filters()
+    include = {part.strip().lower() for part in (request.args.get("include") or "").split(",") if part.strip()}
+    if include - set(LIST_INCLUDES):
+        raise ApiError(
+            code="VALIDATION_ERROR",
+            message=f"'include' may contain {', '.join(LIST_INCLUDES)}",
+            status=400,
+            details={"field": "include", "allowed": list(LIST_INCLUDES)},
+        )
+    with_analysis = "analysis" in include
+
+    # Built without a session; only the statement is needed here.
+    # Ordered by primary key so a snapshot is stable and walks the pkey index.
+    query = _apply_filters(Query(export_columns(with_analysis)), filters)
+    if with_analysis:
+        query = query.outerjoin(AnalysisResult, AnalysisResult.property_id == Property.id)
+    stmt = query.order_by(Property.id).statement
+
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return current_app.response_class(
+        _export_stream(stmt, fmt, with_analysis),
+        mimetype=EXPORT_MIMETYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="properties-{stamp}.{fmt}"'},
+    )
+
+def _detail_key(property_id: int) -> str:
+    return f"property:{property_id}"
+
+
+def invalidate_property_details(property_ids):
+    property_detail_cache.delete_many([_detail_key(pid) for pid in property_ids])
+
+
+def _not_modified(etag: str, last_modified: datetime) -> bool:
+    # If-None-Match wins over If-Modified-Since when both are sent (RFC 9110)
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    return since is not None and last_modified.replace(microsecond=0) <= since
+
+
+def _detail_body(session, property_id: int, stamp: str):
+    key = _detail_key(property_id)
+    cached = property_detail_cache.get(key)
+    if cached is not None:
+        cached_stamp, _, body = cached.partition(b"\n")
+        if cached_stamp.decode("utf-8") == stamp:
+            return body
+
+    prop = (
+        session.query(Property)
+        .options(selectinload(Property.photos))
+        .filter(Property.id == property_id)
+        .one_or_none()
+    )
+    if prop is None:
+        return None
+
+    analysis = (
+        session.query(AnalysisResult)
+        .filter(AnalysisResult.property_id == property_id)
+        .one_or_none()
+    )
+
+    body = (current_app.json.dumps({
+        **prop.to_dict(),
+        "photos": [p.to_dict() for p in (prop.photos or [])],
+        "analysis": analysis.to_dict() if analysis else None,
+    }) + "\n").encode("utf-8")
+    property_detail_cache.set(key, stamp.encode("utf-8") + b"\n" + body)
+    return body
+
+
+@properties_bp.get("/properties/<int:property_id>")
+def get_property(property_id: int):
+    session = get_session()
+    # ---- version probe: decides 304 / cache hit before hydrating anything ----
+    versions = (
+        session.query(Property.updated_at, AnalysisResult.updated_at)
+        .outerjoin(AnalysisResult, AnalysisResult.property_id == Property.id)
+        .filter(Property.id == property_id)
+        .one_or_none()
+    )
+    if versions is None:
+        return jsonify({"error": f"Property {property_id} not found"}), 404
+
+    prop_updated_at, analysis_updated_at = versions
+    stamp = ":".join([
+        str(property_id),
+        prop_updated_at.isoformat(),
+        analysis_updated_at.isoformat() if analysis_updated_at else "-",
+    ])
+    etag = hashlib.sha1(stamp.encode("utf-8")).hexdigest()
+    last_modified = max(v for v in versions if v is not None)
+
+    if _not_modified(etag, last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        body = _detail_body(session, property_id, stamp)
+        if body is None:
+            return jsonify({"error": f"Property {property_id} not found"}), 404
+        response = current_app.response_class(body, mimetype="application/json")
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # clients may keep it but must revalidate (cheap: one indexed probe + 304)
+    response.cache_control.no_cache = True
+    return response
+
+@properties_bp.get("/properties/<int:property_id>/comps")
+def get_property_comps(property_id: int):
+    k = _get_int("k", COMPS_DEFAULT_K, min_value=1, max_value=COMPS_MAX_K)
+
+    session = get_session()
+    subject = (
+        session.query(Property.id, Property.zip, Property.sqft, Property.beds, Property.baths, Property.price)
+        .filter(Property.id == property_id)
+        .one_or_none()
+    )
+    if subject is None:
+        return jsonify({"error": f"Property {property_id} not found"}), 404
+
+    # same zip, nearest on normalized sqft/beds/baths/price; empty
+    # when the subject has no price or sqft to compare on
+    comps = comps_index.nearest(
+        subject.zip, subject.sqft, subject.beds, subject.baths, subject.price, k=k, exclude_id=property_id
+    )
+    distances = {pid: distance for pid, distance, _ in comps}
+
+    rows = session.query(*PROPERTY_LIST_COLUMNS).filter(Property.id.in_(distances)).all() if comps else []
+    items = property_rows_to_dicts(rows)
+    for item in items:
+        item["distance"] = round(distances[item["id"]], 4)
+    items.sort(key=lambda item: (item["distance"], item["id"]))
+
+    arv = comps_index.arv_estimate(
+        property_id, subject.zip, subject.sqft, subject.beds, subject.baths, subject.price, k=k
+    )
+    return json_response({
+        "property_id": property_id,
+        "zip": subject.zip,
+        "k": k,
+        "items": items,
+        "arv_estimate": round(arv, 2) if arv is not None else None,
+    })
+
 @properties_bp.post("/properties/<int:property_id>/analyze")
 def analyze_property(property_id: int):
-    session = SessionLocal()
+    # ?force=true rescores even when inputs and scoring version are unchanged
+    force = (request.args.get("force") or "").strip().lower() in ("1", "true", "yes")
+
+    session = get_session()
     try:
-        prop = session.query(Property).filter(Property.id == property_id).one_or_none()
-        if prop is None:
+        if session.query(Property.id).filter(Property.id == property_id).scalar() is None:
             return jsonify({"error": f"Property {property_id} not found"}), 404
 
-        score_total, score_breakdown, reasons = compute_analysis(prop)
+        result = reanalyze(session, analysis_query(session, force=force).filter(Property.id == property_id))
+        session.commit()
+        if result["updated_ids"]:
+            invalidate_property_details(result["updated_ids"])
 
         analysis = (
             session.query(AnalysisResult)
             .filter(AnalysisResult.property_id == property_id)
-            .one_or_none()
+            .one()
         )
-
-        if analysis is None:
-            analysis = AnalysisResult(
-                property_id=property_id,
-                score_total=Decimal(str(score_total)),
-                score_breakdown=score_breakdown,
-                reasons=reasons,
-            )
-            session.add(analysis)
-        else:
-            analysis.score_total = Decimal(str(score_total))
-            analysis.score_breakdown = score_breakdown
-            analysis.reasons = reasons
-            analysis.analyzed_at = func.now()
-            analysis.updated_at = func.now()
-
-        session.commit()
-        session.refresh(analysis)
-
         return jsonify(analysis.to_dict())
+    except ApiError:
+        session.rollback()
+        raise
     except Exception as e:
         session.rollback()
         return jsonify({"error": "Analyze failed", "details": str(e)}), 500
-    finally:
-        session.close()
 
 
-def compute_analysis(prop: Property):
-    # Baseline metrics (purely from property fields for now)
-    price = float(prop.price) if prop.price is not None else None
-    beds = prop.beds
-    sqft = prop.sqft
-
-    desc = (prop.description or "").lower()
-    rehab_per_sqft = 35 if any(w in desc for w in ["fixer", "rehab", "needs", "tlc"]) else 20
-    rehab_estimate = (sqft * rehab_per_sqft) if sqft else (price * 0.08 if price else None)
-
-    arv_estimate = ((price + rehab_estimate) * 1.10) if (price and rehab_estimate) else None
-    rent_estimate = max(1200, (beds or 0) * 650 + (sqft or 0) * 0.40) if (beds or sqft) else None
-
-    # Ratios
-    rent_to_price = ((rent_estimate * 12) / price) if (rent_estimate and price) else None
-    arv_to_price = (arv_estimate / price) if (arv_estimate and price) else None
-
-    # Score components (0-100 total, simple heuristic)
-    score = 0.0
-    reasons = []
-
-    if rent_to_price is not None:
-        # 0.20 annual rent/price ~= strong
-        score += min(45.0, rent_to_price * 150.0)
-        reasons.append(f"Rent-to-price ratio: {rent_to_price:.3f}")
-
-    if arv_to_price is not None:
-        score += min(35.0, max(0.0, (arv_to_price - 1.0) * 140.0))
-        reasons.append(f"ARV-to-price ratio: {arv_to_price:.3f}")
-
-    if beds is not None:
-        score += min(10.0, beds * 2.0)
-        reasons.append(f"Bedrooms: {beds}")
-
-    # Penalties for missing data
-    if price is None:
-        score -= 15.0
-        reasons.append("Missing price")
-    if sqft is None:
-        score -= 5.0
-        reasons.append("Missing sqft")
-
-    score = max(0.0, min(100.0, score))
-
-    score_breakdown = {
-        "price": price,
-        "beds": beds,
-        "sqft": sqft,
-        "rehab_estimate": rehab_estimate,
-        "arv_estimate": arv_estimate,
-        "rent_estimate": rent_estimate,
-        "rent_to_price": rent_to_price,
-        "arv_to_price": arv_to_price,
-    }
+@properties_bp.post("/properties/analyze")
+def analyze_properties():
+    payload = request.get_json(silent=True) or {}
+
+    ids = payload.get("ids")
+    raw_filters = payload.get("filter")
+
+    if ids is None and raw_filters is None:
+        raise ApiError(
+            code="VALIDATION_ERROR",
+            message="Provide either 'ids' or 'filter'",
+            status=400,
+        )
 
-    return score, score_breakdown, reasons
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            raise ApiError(
+                code="VALIDATION_ERROR",
+                message="'ids' must be a list of integers",
+                status=400,
+                details={"field": "ids"},
+            )
+        if len(ids) > ANALYZE_MAX_IDS:
+            raise ApiError(
+                code="VALIDATION_ERROR",
+                message=f"'ids' must contain at most {ANALYZE_MAX_IDS} items",
+                status=400,
+                details={"field": "ids", "max": ANALYZE_MAX_IDS},
+            )
+
+    if raw_filters is not None and not isinstance(raw_filters, dict):
+        raise ApiError(
+            code="VALIDATION_ERROR",
+            message="'filter' must be an object",
+            status=400,
+            details={"field": "filter"},
+        )
+    filters = _parse_filters(raw_filters or {})
+
+    force = payload.get("force", False)
+    if not isinstance(force, bool):
+        raise ApiError(
+            code="VALIDATION_ERROR",
+            message="'force' must be a boolean",
+            status=400,
+            details={"field": "force"},
+        )
+
+    session = get_session()
+    try:
+        # Only the scoring inputs and current result; fresh properties are
+        # skipped unless force is set
+        query = analysis_query(session, force=force)
+        if ids is not None:
+            query = query.filter(Property.id.in_(set(ids)))
+        query = _apply_filters(query, filters)
+
+        result = reanalyze(session, query, ANALYZE_BATCH_SIZE)
+        session.commit()
+        invalidate_property_details(result["updated_ids"])
+
+        response = {
+            "analyzed_count": result["analyzed_count"],
+            "updated_count": result["updated_count"],
+        }
+        if ids is not None:
+            found = {pid for (pid,) in session.query(Property.id).filter(Property.id.in_(set(ids)))}
+            response["missing_ids"] = sorted(set(ids) - found)
+        return jsonify(response)
+    except Exception:
+        session.rollback()
+        raise
@@ -1,10 +1,11 @@
-from datetime import datetime, timezone
 from flask import Blueprint, request, jsonify
-from sqlalchemy.exc import IntegrityError
 
-from db import SessionLocal
-from models import Property, ScrapeRun
-from scraper.mock_scraper import run_mock_scrape  # you can swap later
+from api_errors import ApiError
+from db import get_session
+from models import ScrapeRun
+from scrape_jobs import acquire_slot, release_slot, enqueue_scrape_run, run_has_owner
+from scraper.registry import ADAPTERS, DEFAULT_SOURCES
+from serialization import SCRAPE_RUN_LIST_COLUMNS, SCRAPE_RUN_LIST_KEYS, json_response, rows_to_dicts
 
 scrape_bp = Blueprint("scrape", __name__)
 
@@ -14,6 +15,7 @@ def run_scrape():
 
     query = (payload.get("query") or "").strip()
     max_results = payload.get("max_results")
+    sources = payload.get("sources") or DEFAULT_SOURCES
 
     # ---- validate input ----
     if not query:
@@ -27,139 +29,156 @@ def run_scrape():
     if max_results < 1 or max_results > 200:
         return jsonify({"error": "'max_results' must be between 1 and 200"}), 400
 
-    session = SessionLocal()
-    run = None
+    if not isinstance(sources, list) or not all(isinstance(s, str) for s in sources):
+        return jsonify({"error": "'sources' must be a list of source names"}), 400
+
+    unknown = [s for s in sources if s not in ADAPTERS]
+    if unknown:
+        return jsonify({
+            "error": f"unknown sources: {', '.join(unknown)}",
+            "available": sorted(ADAPTERS),
+        }), 400
+    sources = list(dict.fromkeys(sources))
+
+    # ---- reserve a worker slot before creating anything ----
+    if not acquire_slot():
+        raise ApiError(
+            code="SCRAPE_QUEUE_FULL",
+            message="Too many scrape runs in progress, try again later",
+            status=429,
+        )
+
+    session = get_session()
     try:
         # ---- create scrape_runs row ----
         run = ScrapeRun(
             query=query,
-            status="started",
+            status="queued",
+            max_results=max_results,
+            sources=sources,
             properties_found=0,
+            inserted_count=0,
+            skipped_count=0,
             error_count=0,
+            cache_hits=0,
+            cache_misses=0,
             error_samples=None,
         )
         session.add(run)
         session.commit()  # get run.id
-
-        inserted = 0
-        skipped = 0
-        errors = 0
-        error_samples = []
-
-        # ---- run scraper synchronously ----
-        scraped_items = run_mock_scrape(query=query, max_results=max_results)
-
-        # ---- ingest into properties (skip duplicates by listing_url) ----
-        for item in scraped_items:
-            try:
-                exists = (
-                    session.query(Property.id)
-                    .filter(Property.listing_url == item["listing_url"])
-                    .first()
-                )
-                if exists:
-                    skipped += 1
-                    continue
-
-                session.add(Property(**item))
-                session.flush()  # forces insert now (catches unique violation)
-                inserted += 1
-
-            except IntegrityError:
-                session.rollback()
-                skipped += 1
-            except Exception as e:
-                session.rollback()
-                errors += 1
-                if len(error_samples) < 10:
-                    error_samples.append({"listing_url": item.get("listing_url"), "error": str(e)})
-
-        session.commit()
-
-        # ---- update run record with counts + status ----
-        run.properties_found = len(scraped_items)
-        run.error_count = errors
-        run.error_samples = error_samples if error_samples else None
-        run.finished_at = datetime.now(timezone.utc)
-        run.status = "succeeded" if errors == 0 else "succeeded_with_errors"
-        session.commit()
-
-        # ---- return summary ----
-        return jsonify({
-            "run_id": run.id,
-            "status": run.status,
-            "query": query,
-            "max_results": max_results,
-            "properties_found": len(scraped_items),
-            "inserted_count": inserted,
-            "skipped_count": skipped,
-            "error_count": errors,
-        })
-
-    except Exception as e:
+        run_id = run.id
+    except Exception:
         session.rollback()
-        # best-effort mark run failed
-        try:
-            if run and run.id:
-                run.status = "failed"
-                run.finished_at = datetime.now(timezone.utc)
-                run.error_count = (run.error_count or 0) + 1
-                run.error_samples = (run.error_samples or []) + [{"error": str(e)}]
-                session.commit()
-        except Exception:
-            session.rollback()
-
-        return jsonify({"error": "Scrape run failed", "details": str(e)}), 500
-    finally:
-        session.close()
+        release_slot()
+        raise
+
+    # ---- run scraper + ingest on the background pool ----
+    enqueue_scrape_run(run_id, query, max_results, sources)
+
+    response = jsonify({
+        "run_id": run_id,
+        "status": "queued",
+        "query": query,
+        "max_results": max_results,
+        "sources": sources,
+    })
+    response.status_code = 202
+    response.headers["Location"] = f"/scrape/runs/{run_id}"
+    return response
 
 @scrape_bp.get("/scrape/runs")
 def list_scrape_runs():
-    session = SessionLocal()
-    try:
-        runs = (
-            session.query(ScrapeRun)
-            .order_by(ScrapeRun.started_at.desc())
-            .limit(50)
-            .all()
-        )
+    session = get_session()
+    rows = (
+        session.query(*SCRAPE_RUN_LIST_COLUMNS)
+        .order_by(ScrapeRun.started_at.desc())
+        .limit(50)
+        .all()
+    )
 
-        return jsonify({
-            "items": [
-                {
-                    "id": r.id,
-                    "query": r.query,
-                    "max_results": getattr(r, "max_results", None),
-                    "status": r.status,
-                    "started_at": r.started_at.isoformat() if r.started_at else None,
-                    "finished_at": r.finished_at.isoformat() if r.finished_at else None,
-                    "properties_found": r.properties_found,
-                    "error_count": r.error_count,
-                }
-                for r in runs
-            ]
-        })
-    finally:
-        session.close()
+    return json_response({"items": rows_to_dicts(rows, SCRAPE_RUN_LIST_KEYS)})
 
 @scrape_bp.get("/scrape/runs/<int:run_id>")
 def get_scrape_run(run_id: int):
-    session = SessionLocal()
-    try:
-        r = session.query(ScrapeRun).filter(ScrapeRun.id == run_id).one_or_none()
-        if r is None:
-            return jsonify({"error": f"ScrapeRun {run_id} not found"}), 404
+    session = get_session()
+    r = session.query(ScrapeRun).filter(ScrapeRun.id == run_id).one_or_none()
+    if r is None:
+        return jsonify({"error": f"ScrapeRun {run_id} not found"}), 404
+
+    return jsonify({
+        "id": r.id,
+        "query": r.query,
+        "max_results": getattr(r, "max_results", None),
+        "sources": r.sources,
+        "status": r.status,
+        "started_at": r.started_at.isoformat() if r.started_at else None,
+        "finished_at": r.finished_at.isoformat() if r.finished_at else None,
+        "properties_found": r.properties_found,
+        "inserted_count": r.inserted_count,
+        "skipped_count": r.skipped_count,
+        "error_count": r.error_count,
+        "cache_hits": r.cache_hits,
+        "cache_misses": r.cache_misses,
+        "error_samples": r.error_samples,
+        "checkpoint": r.checkpoint,
+    })
+
+
+@scrape_bp.post("/scrape/runs/<int:run_id>/resume")
+def resume_scrape_run(run_id: int):
+    session = get_session()
+    # row lock: two resumes of the same run must not both enqueue it
+    run = (
+        session.query(ScrapeRun)
+        .filter(ScrapeRun.id == run_id)
+        .with_for_update()
+        .one_or_none()
+    )
+    if run is None:
+        return jsonify({"error": f"ScrapeRun {run_id} not found"}), 404
+
+    # failed runs, and queued/running ones that no live worker has (the
+    # process died mid-run and never got to mark them failed)
+    previous_status = run.status
+    orphaned = run.status in ("queued", "running") and not run_has_owner(session, run_id)
+    if run.status != "failed" and not orphaned:
+        raise ApiError(
+            code="SCRAPE_RUN_NOT_RESUMABLE",
+            message="Only failed or interrupted runs can be resumed",
+            status=409,
+            details={"status": run.status},
+        )
 
-        return jsonify({
-            "id": r.id,
-            "query": r.query,
-            "max_results": getattr(r, "max_results", None),
-            "status": r.status,
-            "started_at": r.started_at.isoformat() if r.started_at else None,
-            "finished_at": r.finished_at.isoformat() if r.finished_at else None,
-            "properties_found": r.properties_found,
-            "error_count": r.error_count,
-            "error_samples": r.error_samples,
-        })
-    finally:
-        session.close()
\ No newline at end of file
+    if not acquire_slot():
+        raise ApiError(
+            code="SCRAPE_QUEUE_FULL",
+            message="Too many scrape runs in progress, try again later",
+            status=429,
+        )
+
+    try:
+        run.status = "queued"
+        run.finished_at = None
+        session.commit()
+    except Exception:
+        session.rollback()
+        release_slot()
+        raise
+
+    query, max_results, sources, checkpoint = run.query, run.max_results, run.sources, run.checkpoint
+
+    # picks up after the checkpoint; committed pages are not fetched or inserted again
+    enqueue_scrape_run(run_id, query, max_results, sources)
+
+    response = jsonify({
+        "run_id": run_id,
+        "status": "queued",
+        "query": query,
+        "max_results": max_results,
+        "sources": sources,
+        "checkpoint": checkpoint,
+        "previous_status": previous_status,
+    })
+    response.status_code = 202
+    response.headers["Location"] = f"/scrape/runs/{run_id}"
+    return response
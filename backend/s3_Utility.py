@@ -1,11 +1,26 @@
-import boto3
-from botocore.exceptions import NoCredentialsError
+import os
+import threading
 
-s3 = boto3.client('s3')
+_s3 = None
+_s3_pid = None
+_lock = threading.Lock()
+
+
+def get_s3_client():
+    # created on first upload, not at import; boto3 clients must not cross a fork
+    global _s3, _s3_pid
+    with _lock:
+        if _s3 is None or _s3_pid != os.getpid():
+            import boto3
+            _s3 = boto3.client('s3')
+            _s3_pid = os.getpid()
+        return _s3
 
 def uploadFileToS3(file_path, bucket_name, key):
+    from botocore.exceptions import NoCredentialsError
+
     try:
-        s3.upload_file(file_path, bucket_name, key)
+        get_s3_client().upload_file(file_path, bucket_name, key)
         url = f"https://{bucket_name}.s3.amazonaws.com/{key}"
         print(f"File uploaded successfully: {url}")
         return url
@@ -0,0 +1,225 @@
+"""
+Local S3-compatible stand-in for offline photo pipeline runs.
+
+Implements the path-style calls boto3/s3transfer make for uploads: PutObject,
+the multipart trio (create / upload part / complete, plus abort), HeadObject
+and GetObject. Objects live in memory; signatures are not checked. It counts
+bytes received over time and peak requests in flight, so the pipeline's
+concurrency and byte-rate cap can be checked against it.
+
+Run from backend/:
+    python -m s3_stub --port 9000
+then point the pipeline at it:
+    S3_ENDPOINT_URL=http://127.0.0.1:9000 PHOTO_BUCKET=brrrr-ai-photos \
+    AWS_ACCESS_KEY_ID=stub AWS_SECRET_ACCESS_KEY=stub ...
+"""
+import argparse
+import hashlib
+import itertools
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+
+class S3StubStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.put_objects = 0
+        self.multipart_uploads = 0
+        self.received = []  # (monotonic time, bytes) per object or part body
+
+    def enter(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    @property
+    def bytes_received(self) -> int:
+        return sum(n for _, n in self.received)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None, content_type="application/xml"):
+        self.send_response(status)
+        if body or status != 204:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _error(self, status, code):
+        self._send(status, f"<Error><Code>{code}</Code></Error>".encode("utf-8"))
+
+    def _target(self):
+        url = urlsplit(self.path)
+        bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+        params = {k: v[0] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+        return bucket, key, params
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        with self.server.stats._lock:
+            self.server.stats.received.append((time.monotonic(), len(body)))
+        return body
+
+    def _dispatch(self, handler):
+        self.server.stats.enter()
+        try:
+            handler(*self._target())
+        finally:
+            self.server.stats.leave()
+
+    def do_PUT(self):
+        self._dispatch(self._put)
+
+    def do_POST(self):
+        self._dispatch(self._post)
+
+    def do_GET(self):
+        self._dispatch(self._get)
+
+    def do_HEAD(self):
+        self._dispatch(self._get)
+
+    def do_DELETE(self):
+        self._dispatch(self._delete)
+
+    def _put(self, bucket, key, params):
+        body = self._read_body()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        server = self.server
+        if "uploadId" in params:
+            upload = server.uploads.get(params["uploadId"])
+            if upload is None:
+                self._error(404, "NoSuchUpload")
+                return
+            upload["parts"][int(params["partNumber"])] = body
+        else:
+            with server.lock:
+                server.objects[(bucket, key)] = (body, self.headers.get("Content-Type"))
+                server.stats.put_objects += 1
+        self._send(200, headers={"ETag": etag})
+
+    def _post(self, bucket, key, params):
+        server = self.server
+        if "uploads" in params:
+            upload_id = f"upload-{next(server.upload_ids)}"
+            server.uploads[upload_id] = {
+                "bucket": bucket, "key": key, "parts": {},
+                "content_type": self.headers.get("Content-Type"),
+            }
+            self._send(200, (
+                "<InitiateMultipartUploadResult>"
+                f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId>"
+                "</InitiateMultipartUploadResult>"
+            ).encode("utf-8"))
+            return
+
+        if "uploadId" in params:
+            self._read_body()  # part list; parts are assembled in part-number order
+            upload = server.uploads.pop(params["uploadId"], None)
+            if upload is None:
+                self._error(404, "NoSuchUpload")
+                return
+            body = b"".join(part for _, part in sorted(upload["parts"].items()))
+            with server.lock:
+                server.objects[(bucket, key)] = (body, upload["content_type"])
+                server.stats.multipart_uploads += 1
+            etag = f'"{hashlib.md5(body).hexdigest()}-{len(upload["parts"])}"'
+            self._send(200, (
+                "<CompleteMultipartUploadResult>"
+                f"<Location>{escape(self.server.url)}/{escape(bucket)}/{escape(key)}</Location>"
+                f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key><ETag>{escape(etag)}</ETag>"
+                "</CompleteMultipartUploadResult>"
+            ).encode("utf-8"))
+            return
+
+        self._error(400, "InvalidRequest")
+
+    def _get(self, bucket, key, params):
+        obj = self.server.objects.get((bucket, key))
+        if obj is None:
+            self._error(404, "NoSuchKey")
+            return
+        body, content_type = obj
+        self._send(
+            200, body,
+            headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'},
+            content_type=content_type or "binary/octet-stream",
+        )
+
+    def _delete(self, bucket, key, params):
+        if "uploadId" in params:
+            self.server.uploads.pop(params["uploadId"], None)
+        else:
+            with self.server.lock:
+                self.server.objects.pop((bucket, key), None)
+        self._send(204)
+
+
+class S3StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address):
+        super().__init__(address, _Handler)
+        self.lock = threading.Lock()
+        self.objects = {}  # (bucket, key) -> (body, content type)
+        self.uploads = {}
+        self.upload_ids = itertools.count(1)
+        self.stats = S3StubStats()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_s3_stub(host="127.0.0.1", port=0) -> S3StubServer:
+    """Serve on a background thread; port=0 picks a free port (see .url)."""
+    server = S3StubServer((host, port))
+    threading.Thread(target=server.serve_forever, name="s3-stub", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+
+    server = S3StubServer((args.host, args.port))
+    print(f"s3 stub on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        s = server.stats
+        print(
+            f"objects {len(server.objects)} ({s.put_objects} put, {s.multipart_uploads} multipart), "
+            f"{s.bytes_received:,} bytes received, peak in flight {s.peak_in_flight}"
+        )
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
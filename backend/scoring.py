@@ -0,0 +1,221 @@
+import numpy as np
+
+# Stored on every analysis_results row. Bump whenever a change here alters
+# the output for the same inputs, so `python -m reanalysis` rescores everything.
+SCORING_VERSION = 4
+
+REHAB_KEYWORDS = ["fixer", "rehab", "needs", "tlc"]
+
+
+def needs_rehab(description) -> bool:
+    desc = (description or "").lower()
+    return any(w in desc for w in REHAB_KEYWORDS)
+
+
+def compute_analysis(prop, market_ppsf=None, comp_arv=None):
+    # Baseline metrics from the property fields, plus the area's median
+    # $/sqft (market_stats.py) and a comps-based ARV (comps.py) when known
+    price = float(prop.price) if prop.price is not None else None
+    beds = prop.beds
+    sqft = prop.sqft
+
+    rehab_per_sqft = 35 if needs_rehab(prop.description) else 20
+    rehab_estimate = (sqft * rehab_per_sqft) if sqft else (price * 0.08 if price else None)
+
+    if comp_arv is not None:
+        arv_estimate, arv_source = comp_arv, "comps"
+    elif price and rehab_estimate:
+        arv_estimate, arv_source = (price + rehab_estimate) * 1.10, "formula"
+    else:
+        arv_estimate, arv_source = None, None
+    rent_estimate = max(1200, (beds or 0) * 650 + (sqft or 0) * 0.40) if (beds or sqft) else None
+
+    # Ratios
+    rent_to_price = ((rent_estimate * 12) / price) if (rent_estimate and price) else None
+    arv_to_price = (arv_estimate / price) if (arv_estimate and price) else None
+    price_to_market = ((price / sqft) / market_ppsf) if (price and sqft and market_ppsf) else None
+
+    # Score components (0-100 total, simple heuristic)
+    score = 0.0
+    reasons = []
+
+    if rent_to_price is not None:
+        # 0.20 annual rent/price ~= strong
+        score += min(45.0, rent_to_price * 150.0)
+        reasons.append(f"Rent-to-price ratio: {rent_to_price:.3f}")
+
+    if arv_to_price is not None:
+        score += min(35.0, max(0.0, (arv_to_price - 1.0) * 140.0))
+        reasons.append(f"ARV-to-price ratio: {arv_to_price:.3f}")
+
+    if beds is not None:
+        score += min(10.0, beds * 2.0)
+        reasons.append(f"Bedrooms: {beds}")
+
+    if price_to_market is not None:
+        # 20% under the area's median $/sqft earns the full 10
+        score += min(10.0, max(0.0, (1.0 - price_to_market) * 50.0))
+        if price_to_market < 1.0:
+            reasons.append(f"Under market $/sqft: {price_to_market:.3f} of median")
+        else:
+            reasons.append(f"At/above market $/sqft: {price_to_market:.3f} of median")
+
+    # Penalties for missing data
+    if price is None:
+        score -= 15.0
+        reasons.append("Missing price")
+    if sqft is None:
+        score -= 5.0
+        reasons.append("Missing sqft")
+
+    score = max(0.0, min(100.0, score))
+
+    score_breakdown = {
+        "price": price,
+        "beds": beds,
+        "sqft": sqft,
+        "rehab_estimate": rehab_estimate,
+        "arv_estimate": arv_estimate,
+        "arv_source": arv_source,
+        "rent_estimate": rent_estimate,
+        "rent_to_price": rent_to_price,
+        "arv_to_price": arv_to_price,
+        "market_price_per_sqft": market_ppsf,
+        "price_to_market": price_to_market,
+    }
+
+    return score, score_breakdown, reasons
+
+
+def _column(values):
+    # None -> NaN so missing values flow through the arithmetic as masks
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+
+def compute_analysis_batch(prices, beds, sqfts, rehab_flags, market_ppsf=None, comp_arvs=None):
+    """
+    Vectorized compute_analysis over column arrays.
+
+    prices/beds/sqfts are sequences that may contain None, rehab_flags is a
+    sequence of bools (see needs_rehab), market_ppsf and comp_arvs optional
+    sequences of area medians and comps ARVs (None where unknown). Returns a list of
+    (score_total, score_breakdown, reasons) tuples, identical to calling
+    compute_analysis row by row.
+    """
+    beds_in = list(beds)
+    sqft_in = list(sqfts)
+
+    price = _column(prices)
+    bed = _column(beds_in)
+    sqft = _column(sqft_in)
+    flags = np.asarray(rehab_flags, dtype=bool)
+    n = len(price)
+    market_in = list(market_ppsf) if market_ppsf is not None else [None] * n
+    market = _column(market_in)
+    comp_arv = _column(comp_arvs if comp_arvs is not None else [None] * n)
+
+    # Truthiness masks matching the scalar version (None and 0 are both falsy)
+    has_price = ~np.isnan(price)
+    price_truthy = has_price & (price != 0)
+    has_beds = ~np.isnan(bed)
+    has_sqft = ~np.isnan(sqft)
+    sqft_truthy = has_sqft & (sqft != 0)
+    beds_truthy = has_beds & (bed != 0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rehab_per_sqft = np.where(flags, 35.0, 20.0)
+        rehab = np.where(sqft_truthy, sqft * rehab_per_sqft, np.where(price_truthy, price * 0.08, np.nan))
+        has_rehab = ~np.isnan(rehab) & (rehab != 0)
+
+        has_comp_arv = ~np.isnan(comp_arv)
+        has_formula_arv = ~has_comp_arv & price_truthy & has_rehab
+        has_arv = has_comp_arv | has_formula_arv
+        arv = np.where(has_comp_arv, comp_arv, np.where(has_formula_arv, (price + rehab) * 1.10, np.nan))
+
+        has_rent = beds_truthy | sqft_truthy
+        raw_rent = np.where(has_beds, bed, 0.0) * 650 + np.where(has_sqft, sqft, 0.0) * 0.40
+        rent_floor = has_rent & (raw_rent <= 1200)
+        rent = np.where(has_rent, np.maximum(1200.0, raw_rent), np.nan)
+
+        has_rtp = has_rent & price_truthy
+        rtp = np.where(has_rtp, (rent * 12) / price, np.nan)
+        has_atp = has_arv & (arv != 0) & price_truthy
+        atp = np.where(has_atp, arv / price, np.nan)
+
+        has_ptm = price_truthy & sqft_truthy & ~np.isnan(market) & (market != 0)
+        ptm = np.where(has_ptm, (price / sqft) / market, np.nan)
+
+        score = np.zeros(n, dtype=np.float64)
+        score += np.where(has_rtp, np.minimum(45.0, rtp * 150.0), 0.0)
+        score += np.where(has_atp, np.minimum(35.0, np.maximum(0.0, (atp - 1.0) * 140.0)), 0.0)
+        score += np.where(has_beds, np.minimum(10.0, bed * 2.0), 0.0)
+        score += np.where(has_ptm, np.minimum(10.0, np.maximum(0.0, (1.0 - ptm) * 50.0)), 0.0)
+        score -= np.where(has_price, 0.0, 15.0)
+        score -= np.where(has_sqft, 0.0, 5.0)
+        score = np.maximum(0.0, np.minimum(100.0, score))
+
+    # ---- assemble per-row payloads (plain Python types for JSONB) ----
+    def nullable(values, mask):
+        return [v if m else None for v, m in zip(values.tolist(), mask.tolist())]
+
+    price_out = nullable(price, has_price)
+    arv_out = nullable(arv, has_arv)
+    arv_source_out = [
+        "comps" if c else ("formula" if f else None)
+        for c, f in zip(has_comp_arv.tolist(), has_formula_arv.tolist())
+    ]
+    rtp_out = nullable(rtp, has_rtp)
+    atp_out = nullable(atp, has_atp)
+    ptm_out = nullable(ptm, has_ptm)
+    # int * int in the scalar version when sqft is set, 1200 is the int floor
+    rehab_out = [
+        s * (35 if f else 20) if st else (r if hr else None)
+        for s, f, st, r, hr in zip(
+            sqft_in, flags.tolist(), sqft_truthy.tolist(), rehab.tolist(), (~np.isnan(rehab)).tolist()
+        )
+    ]
+    rent_out = [
+        (1200 if fl else r) if hr else None
+        for r, hr, fl in zip(rent.tolist(), has_rent.tolist(), rent_floor.tolist())
+    ]
+
+    reasons_out = [[] for _ in range(n)]
+    for i in np.flatnonzero(has_rtp).tolist():
+        reasons_out[i].append(f"Rent-to-price ratio: {rtp_out[i]:.3f}")
+    for i in np.flatnonzero(has_atp).tolist():
+        reasons_out[i].append(f"ARV-to-price ratio: {atp_out[i]:.3f}")
+    for i in np.flatnonzero(has_beds).tolist():
+        reasons_out[i].append(f"Bedrooms: {beds_in[i]}")
+    for i in np.flatnonzero(has_ptm).tolist():
+        if ptm_out[i] < 1.0:
+            reasons_out[i].append(f"Under market $/sqft: {ptm_out[i]:.3f} of median")
+        else:
+            reasons_out[i].append(f"At/above market $/sqft: {ptm_out[i]:.3f} of median")
+    for i in np.flatnonzero(~has_price).tolist():
+        reasons_out[i].append("Missing price")
+    for i in np.flatnonzero(~has_sqft).tolist():
+        reasons_out[i].append("Missing sqft")
+
+    return [
+        (
+            s,
+            {
+                "price": p,
+                "beds": b,
+                "sqft": sq,
+                "rehab_estimate": rh,
+                "arv_estimate": a,
+                "arv_source": src,
+                "rent_estimate": rn,
+                "rent_to_price": rtp_i,
+                "arv_to_price": atp_i,
+                "market_price_per_sqft": m,
+                "price_to_market": ptm_i,
+            },
+            reasons,
+        )
+        for s, p, b, sq, rh, a, src, rn, rtp_i, atp_i, m, ptm_i, reasons in zip(
+            score.tolist(), price_out, beds_in, sqft_in, rehab_out, arv_out, arv_source_out,
+            rent_out, rtp_out, atp_out, market_in, ptm_out, reasons_out,
+        )
+    ]
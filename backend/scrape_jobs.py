@@ -0,0 +1,299 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from cache import property_count_cache
+from comps import comps_index, mark_comps_stale
+from sqlalchemy import text
+
+from db import SessionLocal, get_engine
+from ingest import INGEST_CHUNK_SIZE, MAX_ERROR_SAMPLES, ingest_properties
+from market_stats import market_stats_cache, refresh_for_properties
+from models import ScrapeRun
+from photos import ingest_photos, photo_store
+from scraper.fetch_cache import fetch_cache
+from scraper.registry import DEFAULT_SOURCES
+
+logger = logging.getLogger(__name__)
+
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "2"))
+SCRAPE_QUEUE_DEPTH = int(os.getenv("SCRAPE_QUEUE_DEPTH", "20"))
+
+# first key of the Postgres advisory lock a worker holds while it runs a run
+# (second key: the run id); released by Postgres if the process dies
+RUN_LOCK_CLASS = 7301
+
+_EMPTY_RESULT = {
+    "inserted_count": 0, "skipped_count": 0, "error_count": 0,
+    "inserted_ids": [], "inserted_photos": {}, "error_samples": [],
+}
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+# runs queued or running on this process's executor
+_active_runs = set()
+
+
+def _get_executor():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=SCRAPE_WORKERS,
+                thread_name_prefix="scrape-worker",
+            )
+            # running + waiting runs; anything beyond this is rejected
+            _slots = threading.BoundedSemaphore(SCRAPE_WORKERS + SCRAPE_QUEUE_DEPTH)
+        return _executor, _slots
+
+
+def acquire_slot() -> bool:
+    """Reserve room for one run without blocking. False when the queue is full."""
+    _, slots = _get_executor()
+    return slots.acquire(blocking=False)
+
+
+def release_slot():
+    _, slots = _get_executor()
+    slots.release()
+
+
+def enqueue_scrape_run(run_id: int, query: str, max_results: int, sources):
+    """Submit a run whose slot was reserved with acquire_slot()."""
+    executor, _ = _get_executor()
+    with _lock:
+        _active_runs.add(run_id)
+    future = executor.submit(execute_scrape_run, run_id, query, max_results, sources)
+    future.add_done_callback(lambda _f: _finish_slot(run_id))
+    return future
+
+
+def _finish_slot(run_id: int):
+    with _lock:
+        _active_runs.discard(run_id)
+    release_slot()
+
+
+def run_has_owner(session, run_id: int) -> bool:
+    """
+    Whether a live worker has this run: queued on this process's executor,
+    or running anywhere (it holds the run's advisory lock). A queued or
+    running run without an owner was cut off by a crash or restart.
+    """
+    with _lock:
+        if run_id in _active_runs:
+            return True
+    # transaction-level probe, gone at the caller's commit
+    free = session.execute(
+        text("SELECT pg_try_advisory_xact_lock(:cls, :run_id)"), {"cls": RUN_LOCK_CLASS, "run_id": run_id}
+    ).scalar()
+    return not free
+
+
+def _lock_run(run_id: int):
+    """Connection holding the run's advisory lock for the run, or None if another worker has it."""
+    conn = get_engine().connect()
+    try:
+        locked = conn.execute(
+            text("SELECT pg_try_advisory_lock(:cls, :run_id)"), {"cls": RUN_LOCK_CLASS, "run_id": run_id}
+        ).scalar()
+        conn.commit()
+    except Exception:
+        conn.close()
+        raise
+    if not locked:
+        conn.close()
+        return None
+    return conn
+
+
+def _unlock_run(conn, run_id: int):
+    try:
+        conn.execute(text("SELECT pg_advisory_unlock(:cls, :run_id)"), {"cls": RUN_LOCK_CLASS, "run_id": run_id})
+        conn.commit()
+    except Exception:
+        # a pooled connection must not go back still holding the lock
+        logger.exception("ScrapeRun %s: releasing the run lock failed", run_id)
+        conn.invalidate()
+    finally:
+        conn.close()
+
+
+def _refresh_market_stats(session, run_id: int, inserted_ids):
+    # Only the zips/cities this run added listings to. Stats are derived data:
+    # a failure here is logged and must not fail the run.
+    if not inserted_ids:
+        return
+    try:
+        changed = refresh_for_properties(session, inserted_ids)
+        session.commit()
+    except Exception:
+        logger.exception("ScrapeRun %s: market stats refresh failed", run_id)
+        session.rollback()
+        return
+    if changed:
+        market_stats_cache.invalidate()
+
+
+def _publish_inserts(session, run_id: int, inserted_ids):
+    _refresh_market_stats(session, run_id, inserted_ids)
+    # new listings become comps right away (no-op until the index is loaded);
+    # other processes pick them up on their next catch-up
+    try:
+        comps_index.catch_up(session)
+    except Exception:
+        logger.exception("ScrapeRun %s: comps index update failed", run_id)
+        session.rollback()
+    # ...and move their neighbours' comps ARV, whether or not this process has the index loaded
+    try:
+        mark_comps_stale(session, inserted_ids)
+        session.commit()
+    except Exception:
+        logger.exception("ScrapeRun %s: marking comps-affected analyses stale failed", run_id)
+        session.rollback()
+
+
+def _store_photos(session, run_id: int, photos_by_property):
+    # Photos are best-effort: listings are already committed, and a failed
+    # download or upload leaves that listing with fewer photos, not a failed run.
+    if photo_store is None or not photos_by_property:
+        return
+    try:
+        stats = ingest_photos(session, photos_by_property)
+        session.commit()
+    except Exception:
+        logger.exception("ScrapeRun %s: photo ingest failed", run_id)
+        session.rollback()
+        return
+    logger.info(
+        "ScrapeRun %s: %s photos, %s distinct, %s uploaded (%s bytes), %s reused, %s download / %s upload errors",
+        run_id, stats["photos"], stats["distinct"], stats["uploaded"], stats["uploaded_bytes"],
+        stats["reused"], stats["download_errors"], stats["upload_errors"],
+    )
+
+
+def _ingest_batch(session, run, items, pages, checkpoint, error_samples, inserted_ids):
+    """Insert one batch and advance the checkpoint past its pages, in one commit."""
+    result = ingest_properties(session, items) if items else _EMPTY_RESULT
+
+    run.properties_found += len(items)
+    run.inserted_count += result["inserted_count"]
+    run.skipped_count += result["skipped_count"]
+    run.error_count += result["error_count"]
+    inserted_ids.extend(result["inserted_ids"])
+    error_samples.extend(result["error_samples"])
+    del error_samples[MAX_ERROR_SAMPLES:]
+    run.error_samples = list(error_samples) or None
+
+    for page in pages:
+        checkpoint[page.source] = {"page": page.page, "page_size": page.page_size, "done": page.done}
+        if page.cache_hit:
+            run.cache_hits += 1
+        elif page.cache_key is not None:
+            run.cache_misses += 1
+    run.checkpoint = {name: dict(state) for name, state in checkpoint.items()}
+    session.commit()
+
+    # only now may a refetch of these pages be answered from the cache
+    if fetch_cache is not None:
+        fetch_cache.mark_ingested(
+            p.cache_key for p in pages if p.cache_key is not None and not p.cache_hit and not p.partial
+        )
+
+    if result["inserted_count"]:
+        # cached list totals no longer match the table
+        property_count_cache.clear()
+
+    _store_photos(session, run.id, result["inserted_photos"])
+
+
+def execute_scrape_run(run_id: int, query: str, max_results: int, sources=None):
+    """
+    Stream pages from the run's sources and ingest them in batches of about
+    INGEST_CHUNK_SIZE items, committing rows, counters and the checkpoint
+    together after each batch. A run that fails keeps everything committed
+    so far; resuming it (same entry point) starts after the checkpoint.
+    """
+    run_lock = _lock_run(run_id)
+    if run_lock is None:
+        logger.warning("ScrapeRun %s is already running in another worker", run_id)
+        return
+
+    session = SessionLocal()
+    run = None
+    inserted_ids = []
+    try:
+        run = session.get(ScrapeRun, run_id)
+        if run is None:
+            logger.warning("ScrapeRun %s disappeared before it could run", run_id)
+            return
+        if run.status != "queued":
+            # a resume re-queued it elsewhere and that copy already ran
+            logger.warning("ScrapeRun %s is %s, not queued; skipping", run_id, run.status)
+            return
+
+        run.status = "running"
+        run.finished_at = None
+        session.commit()
+
+        checkpoint = {name: dict(state) for name, state in (run.checkpoint or {}).items()}
+        error_samples = list(run.error_samples or [])
+        failed_sources = []
+
+        # ---- ingest batch by batch, publishing progress after each ----
+        batch, batch_pages = [], []
+        # httpx and the event loop thread load with the first run, not the web process
+        from scraper.runner import iter_scrape
+
+        pages = iter_scrape(query, max_results, sources or DEFAULT_SOURCES, checkpoint)
+        try:
+            for page in pages:
+                if page.error is not None:
+                    # the source stops here; the checkpoint keeps its progress for a resume
+                    failed_sources.append(page.source)
+                    run.error_count += 1
+                    error_samples.append({"source": page.source, "page": page.page, "error": page.error})
+                    continue
+
+                batch.extend(page.items)
+                batch_pages.append(page)
+                if len(batch) >= INGEST_CHUNK_SIZE:
+                    _ingest_batch(session, run, batch, batch_pages, checkpoint, error_samples, inserted_ids)
+                    batch, batch_pages = [], []
+        finally:
+            pages.close()
+
+        # last partial batch, plus any source-error samples recorded since
+        _ingest_batch(session, run, batch, batch_pages, checkpoint, error_samples, inserted_ids)
+
+        _publish_inserts(session, run_id, inserted_ids)
+
+        run.finished_at = datetime.now(timezone.utc)
+        if failed_sources:
+            run.status = "failed"
+        else:
+            run.status = "succeeded" if run.error_count == 0 else "succeeded_with_errors"
+        session.commit()
+
+    except Exception as e:
+        logger.exception("ScrapeRun %s failed", run_id)
+        session.rollback()
+        # best-effort mark run failed
+        try:
+            if run is not None:
+                run.status = "failed"
+                run.finished_at = datetime.now(timezone.utc)
+                run.error_count = (run.error_count or 0) + 1
+                run.error_samples = ((run.error_samples or []) + [{"error": str(e)}])[-MAX_ERROR_SAMPLES:]
+                session.commit()
+        except Exception:
+            session.rollback()
+        # batches committed before the failure are real listings
+        if inserted_ids:
+            _publish_inserts(session, run_id, inserted_ids)
+    finally:
+        session.close()
+        _unlock_run(run_lock, run_id)
@@ -0,0 +1,80 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class Page:
+    """One page of results from a source."""
+    items: list = field(default_factory=list)
+    has_more: bool = False
+    # total matching results, when the source reports it; lets the runner
+    # fan out exactly the pages that exist instead of probing
+    total: Optional[int] = None
+    # fetch cache key, and whether the page was unchanged since its last ingest
+    cache_key: Optional[str] = None
+    cache_hit: bool = False
+    # set by the runner when the run's quota cut the page short
+    partial: bool = False
+
+
+@dataclass
+class SourcePage:
+    """A page as streamed out of the runner, tagged for checkpointing."""
+    source: str
+    page: int
+    page_size: int
+    items: list = field(default_factory=list)
+    # last page this source will produce for the run
+    done: bool = False
+    # set (with no items) when the source failed; its stream ends here
+    error: Optional[str] = None
+    cache_key: Optional[str] = None
+    cache_hit: bool = False
+    partial: bool = False
+
+
+@dataclass
+class HostPolicy:
+    """Politeness limits applied per host, shared by every run in the process."""
+    concurrency: int = 4  # requests in flight
+    rate: float = 5.0  # requests per second (token bucket refill)
+    burst: int = 5  # bucket capacity
+    max_retries: int = 3
+    backoff_base: float = 0.5  # seconds, doubled per attempt, with jitter
+
+
+class ScraperAdapter:
+    """
+    A listing source. Subclasses set `name` and `page_size` and implement
+    fetch_page(); the runner decides which pages to request and how many at
+    once, and all HTTP goes through the shared PoliteClient passed in.
+    Items are dicts in the ingest shape (see ingest.py).
+    """
+    name = None
+    page_size = 50
+    # host -> HostPolicy overrides for this source's hosts
+    host_policies = {}
+
+    async def fetch_page(self, http, query: str, page: int, page_size: int) -> Page:
+        raise NotImplementedError
+
+    async def fetch_cached_page(self, http, url: str, params: dict, parse) -> Page:
+        """
+        Fetch a page through the fetch cache and parse it with
+        `parse(response) -> Page`. Unchanged pages come back empty with
+        cache_hit set and paging metadata from the cache; they were ingested
+        before, so parsing them again would only produce skips.
+        """
+        fetched = await http.get_conditional(url, params=params)
+        if fetched.hit:
+            meta = fetched.entry.get("meta") or {}
+            return Page(
+                has_more=meta.get("has_more", False),
+                total=meta.get("total"),
+                cache_key=fetched.key,
+                cache_hit=True,
+            )
+        page = parse(fetched.response)
+        page.cache_key = fetched.key
+        http.remember(fetched, {"has_more": page.has_more, "total": page.total})
+        return page
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCRAPE_CACHE_DIR = os.getenv(
+    "SCRAPE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "brrrr-radar-fetch-cache")
+)
+SCRAPE_CACHE_MAX_BYTES = int(os.getenv("SCRAPE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SCRAPE_CACHE_ENABLED = os.getenv("SCRAPE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+class FetchCache:
+    """
+    Per-URL validators for conditional fetches, one small JSON file per URL:
+    ETag, Last-Modified, a sha256 of the body and the page metadata the
+    runner needs to keep paging (has_more, total) without the body.
+
+    An entry only counts as a hit once the items from that fetch are
+    committed (mark_ingested); until then a refetch is a plain GET, so a
+    run that dies between fetch and commit can't hide its pages from the
+    next one. Least recently used files are evicted once the directory
+    passes max_bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = json.load(f)
+            os.utime(path)  # recency for eviction
+            return entry
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.warning("unreadable fetch cache entry %s", path, exc_info=True)
+            return None
+
+    def put(self, key: str, entry: dict):
+        path = self._path(key)
+        data = json.dumps(entry, separators=(",", ":")).encode("utf-8")
+        with self._lock:
+            self._ensure_total()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                old = os.path.getsize(path)
+            except OSError:
+                old = 0
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            self._total_bytes += len(data) - old
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def mark_ingested(self, keys):
+        for key in keys:
+            entry = self.get(key)
+            if entry is not None and not entry.get("ingested"):
+                entry["ingested"] = True
+                self.put(key, entry)
+
+    def _ensure_total(self):
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, _, size in self._scan())
+
+    def _scan(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield st.st_mtime, path, st.st_size
+
+    def _evict(self):
+        # down to 90% so eviction doesn't run on every put at the limit
+        target = self.max_bytes * 0.9
+        t0 = time.perf_counter()
+        removed = 0
+        for _, path, size in sorted(self._scan()):
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._total_bytes -= size
+            removed += 1
+        logger.info("fetch cache evicted %s entries in %.3fs", removed, time.perf_counter() - t0)
+
+
+fetch_cache = FetchCache(SCRAPE_CACHE_DIR, SCRAPE_CACHE_MAX_BYTES) if SCRAPE_CACHE_ENABLED else None
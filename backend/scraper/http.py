@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Optional
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import httpx
+
+from scraper.base import HostPolicy
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`; acquire() waits for one."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class _HostLimiter:
+    def __init__(self, policy: HostPolicy):
+        self.policy = policy
+        self.slots = asyncio.Semaphore(policy.concurrency)
+        self.bucket = TokenBucket(policy.rate, policy.burst)
+
+
+def _retry_after(response) -> float:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+@dataclass
+class CachedFetch:
+    key: Optional[str]  # fetch cache key; None when caching is off
+    response: Optional[httpx.Response]  # None on a hit
+    entry: Optional[dict]  # cached entry on a hit, new validators on a miss
+    hit: bool = False
+
+
+class PoliteClient:
+    """
+    One pooled keep-alive httpx.AsyncClient for every source, with per-host
+    concurrency limits, token-bucket rate limits and retries with
+    exponential backoff (429/5xx and transport errors; Retry-After honoured).
+    """
+
+    def __init__(self, default_policy: HostPolicy, max_connections: int = 100, timeout: float = 15.0, cache=None):
+        self.default_policy = default_policy
+        self.cache = cache
+        self.policies = {}
+        self._limiters = {}
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+            headers={"User-Agent": "brrrr-radar-scraper/1.0"},
+        )
+        self.request_count = 0
+        self.retry_count = 0
+
+    def set_policy(self, host: str, policy: HostPolicy):
+        # only before the host's first request; limiters are created once
+        self.policies.setdefault(host, policy)
+
+    def _limiter(self, host: str) -> _HostLimiter:
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            limiter = self._limiters[host] = _HostLimiter(self.policies.get(host, self.default_policy))
+        return limiter
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        host = urlsplit(url).netloc
+        limiter = self._limiter(host)
+        policy = limiter.policy
+
+        attempt = 0
+        while True:
+            async with limiter.slots:
+                await limiter.bucket.acquire()
+                self.request_count += 1
+                try:
+                    response = await self.client.get(url, **kwargs)
+                    error = None
+                except httpx.TransportError as e:
+                    response, error = None, e
+
+            if error is None and response.status_code not in RETRY_STATUSES:
+                return response
+            if attempt >= policy.max_retries:
+                if error is not None:
+                    raise error
+                response.raise_for_status()
+
+            delay = policy.backoff_base * (2 ** attempt) * random.uniform(0.5, 1.5)
+            if response is not None:
+                delay = max(delay, _retry_after(response))
+            attempt += 1
+            self.retry_count += 1
+            logger.info(
+                "retrying %s in %.2fs (attempt %s, %s)",
+                url, delay, attempt, error or response.status_code,
+            )
+            # sleep outside the host slot so other requests can proceed
+            await asyncio.sleep(delay)
+
+    async def get_conditional(self, url: str, params=None) -> CachedFetch:
+        """
+        GET through the fetch cache. A 304 to our validators, or a body whose
+        hash matches the last ingested one, is a hit: the caller can skip
+        parsing and ingest. Misses must be followed by remember().
+        """
+        if self.cache is None:
+            return CachedFetch(None, await self.get(url, params=params), None)
+
+        full_url = str(httpx.URL(url, params=params))
+        key = self.cache.key(full_url)
+        entry = self.cache.get(key)
+        if entry is not None and not entry.get("ingested"):
+            entry = None
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = await self.get(full_url, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            return CachedFetch(key, None, entry, hit=True)
+        response.raise_for_status()
+
+        validators = {
+            "url": full_url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_hash": hashlib.sha256(response.content).hexdigest(),
+        }
+        if entry is not None and entry.get("content_hash") == validators["content_hash"]:
+            # same body without validator support; keep the entry, refresh validators
+            entry = {**entry, **validators}
+            self.cache.put(key, entry)
+            return CachedFetch(key, None, entry, hit=True)
+        return CachedFetch(key, response, validators)
+
+    def remember(self, fetched: CachedFetch, meta: dict):
+        """Store a miss's validators with the paging metadata parsed from it."""
+        if fetched.key is None or fetched.hit:
+            return
+        self.cache.put(fetched.key, {**fetched.entry, "meta": meta, "ingested": False, "stored_at": time.time()})
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -1,28 +1,49 @@
 from decimal import Decimal
 import hashlib
+from itertools import count, islice
 
-def run_mock_scrape(query: str, max_results: int):
-    items = []
-    for i in range(max_results):
-        h = hashlib.md5(f"{query}:{i}".encode("utf-8")).hexdigest()[:8]
-        city = "Staten Island" if "staten" in query.lower() else "Newark"
-        state = "NY" if city == "Staten Island" else "NJ"
-        zip_code = "10301" if city == "Staten Island" else "07102"
-
-        price = Decimal(str(250000 + (i * 25000)))
-        beds = 2 + (i % 4)
-
-        items.append({
-            "listing_source": "mock",
-            "listing_url": f"https://example.com/{h}",
-            "address": f"{100 + i} {query.title()} St",
-            "city": city,
-            "state": state,
-            "zip": zip_code,
-            "price": price,
-            "beds": beds,
-            "baths": Decimal("1.0") if beds <= 2 else Decimal("2.0"),
-            "sqft": 900 + (i * 120),
-            "description": f"Mock listing for query='{query}'",
-        })
-    return items
+from scraper.base import Page, ScraperAdapter
+
+
+def mock_listing(query: str, i: int) -> dict:
+    h = hashlib.md5(f"{query}:{i}".encode("utf-8")).hexdigest()[:8]
+    city = "Staten Island" if "staten" in query.lower() else "Newark"
+    state = "NY" if city == "Staten Island" else "NJ"
+    zip_code = "10301" if city == "Staten Island" else "07102"
+
+    price = Decimal(str(250000 + (i * 25000)))
+    beds = 2 + (i % 4)
+
+    return {
+        "listing_source": "mock",
+        "listing_url": f"https://example.com/{h}",
+        "address": f"{100 + i} {query.title()} St",
+        "city": city,
+        "state": state,
+        "zip": zip_code,
+        "price": price,
+        "beds": beds,
+        "baths": Decimal("1.0") if beds <= 2 else Decimal("2.0"),
+        "sqft": 900 + (i * 120),
+        "description": f"Mock listing for query='{query}'",
+    }
+
+
+def run_mock_scrape(query: str, max_results: int = None, start: int = 0):
+    """Yield listings lazily from index `start`; endless when max_results is None."""
+    indexes = count(start) if max_results is None else range(start, max_results)
+    for i in indexes:
+        yield mock_listing(query, i)
+
+
+class MockAdapter(ScraperAdapter):
+    """Generates listings locally; no network. Every query has unlimited results."""
+    name = "mock"
+    page_size = 50
+
+    async def fetch_page(self, http, query, page, page_size):
+        start = (page - 1) * page_size
+        return Page(
+            items=list(islice(run_mock_scrape(query, start=start), page_size)),
+            has_more=True,
+        )
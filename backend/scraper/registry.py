@@ -0,0 +1,19 @@
+import os
+
+from scraper.mock_scraper import MockAdapter
+from scraper.stub_source import StubHttpAdapter
+
+# name -> adapter class; add new sources here
+ADAPTERS = {
+    MockAdapter.name: MockAdapter,
+    StubHttpAdapter.name: StubHttpAdapter,
+}
+
+DEFAULT_SOURCES = [s.strip() for s in os.getenv("SCRAPE_SOURCES", "mock").split(",") if s.strip()]
+
+
+def get_adapter(name: str):
+    try:
+        return ADAPTERS[name]()
+    except KeyError:
+        raise ValueError(f"unknown scrape source {name!r}") from None
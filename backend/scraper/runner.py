@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import math
+import os
+import threading
+from collections import deque
+
+from scraper.base import HostPolicy, SourcePage
+from scraper.fetch_cache import fetch_cache
+from scraper.http import PoliteClient
+from scraper.registry import get_adapter
+
+logger = logging.getLogger(__name__)
+
+SCRAPE_HOST_CONCURRENCY = int(os.getenv("SCRAPE_HOST_CONCURRENCY", "4"))
+SCRAPE_HOST_RATE = float(os.getenv("SCRAPE_HOST_RATE", "5"))
+SCRAPE_HOST_BURST = int(os.getenv("SCRAPE_HOST_BURST", "5"))
+SCRAPE_MAX_RETRIES = int(os.getenv("SCRAPE_MAX_RETRIES", "3"))
+SCRAPE_BACKOFF_BASE = float(os.getenv("SCRAPE_BACKOFF_BASE", "0.5"))
+SCRAPE_MAX_CONNECTIONS = int(os.getenv("SCRAPE_MAX_CONNECTIONS", "100"))
+# pages fetched ahead of ingest, per source
+SCRAPE_PAGE_WINDOW = int(os.getenv("SCRAPE_PAGE_WINDOW", "8"))
+# longest wait for the next page, retries included
+SCRAPE_PAGE_TIMEOUT = float(os.getenv("SCRAPE_PAGE_TIMEOUT", "120"))
+
+
+def default_host_policy() -> HostPolicy:
+    return HostPolicy(
+        concurrency=SCRAPE_HOST_CONCURRENCY,
+        rate=SCRAPE_HOST_RATE,
+        burst=SCRAPE_HOST_BURST,
+        max_retries=SCRAPE_MAX_RETRIES,
+        backoff_base=SCRAPE_BACKOFF_BASE,
+    )
+
+
+def _split_quota(total: int, parts: int):
+    base, extra = divmod(total, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+async def iter_source_pages(http, adapter, query: str, quota: int, start_page: int = 1, page_size: int = None):
+    """
+    Yield (page_no, page_size, page, done) for one source, in page order,
+    with page.items trimmed to the quota.
+
+    The first page is fetched alone (it may report the total); after that up
+    to SCRAPE_PAGE_WINDOW pages are in flight ahead of the consumer, subject
+    to the host limits in `http`. Page p always covers results
+    [(p-1)*page_size, p*page_size) of the quota, so a run resumed at
+    `start_page` with the checkpointed page_size picks up exactly where it
+    stopped.
+    """
+    page_size = page_size or min(adapter.page_size, quota)
+    last = math.ceil(quota / page_size) if quota > 0 else 0
+    if start_page > last:
+        return
+    for host, policy in adapter.host_policies.items():
+        http.set_policy(host, policy)
+
+    def trim(page_no, page):
+        keep = quota - (page_no - 1) * page_size
+        if len(page.items) > keep:
+            page.items = page.items[:keep]
+            page.partial = True
+        return page
+
+    first = await adapter.fetch_page(http, query, start_page, page_size)
+    if first.total is not None:
+        last = min(last, math.ceil(first.total / page_size))
+    done = not first.has_more or start_page >= last
+    yield start_page, page_size, trim(start_page, first), done
+    if done:
+        return
+
+    pending = deque()
+    next_page = start_page + 1
+    try:
+        while pending or next_page <= last:
+            while next_page <= last and len(pending) < SCRAPE_PAGE_WINDOW:
+                task = asyncio.ensure_future(adapter.fetch_page(http, query, next_page, page_size))
+                pending.append((next_page, task))
+                next_page += 1
+            page_no, task = pending.popleft()
+            page = await task
+            done = not page.has_more or page_no >= last
+            yield page_no, page_size, trim(page_no, page), done
+            if done:
+                return
+    finally:
+        for _, task in pending:
+            task.cancel()
+
+
+async def scrape_stream(http, query: str, max_results: int, sources, checkpoint=None):
+    """
+    Stream SourcePages from every source concurrently, splitting max_results
+    between them. Each source's pages arrive in order; sources interleave.
+
+    `checkpoint` maps source name -> {"page", "page_size", "done"} for the
+    last page already ingested; those sources resume after it (or are
+    skipped when done). A failing source yields one SourcePage with `error`
+    set and stops; the others carry on.
+    """
+    checkpoint = checkpoint or {}
+    quotas = dict(zip(sources, _split_quota(max_results, len(sources))))
+    queue = asyncio.Queue(maxsize=SCRAPE_PAGE_WINDOW)
+    finished = object()
+
+    async def produce(name):
+        state = checkpoint.get(name) or {}
+        page_no = state.get("page", 0)
+        try:
+            if not state.get("done"):
+                adapter = get_adapter(name)
+                async for page_no, page_size, page, done in iter_source_pages(
+                    http, adapter, query, quotas[name],
+                    start_page=page_no + 1, page_size=state.get("page_size"),
+                ):
+                    await queue.put(SourcePage(
+                        name, page_no, page_size, page.items, done,
+                        cache_key=page.cache_key, cache_hit=page.cache_hit, partial=page.partial,
+                    ))
+        except Exception as e:
+            logger.warning("source %s failed for query %r after page %s: %s", name, query, page_no, e)
+            message = str(e).splitlines()[0] if str(e) else type(e).__name__
+            await queue.put(SourcePage(name, page_no + 1, 0, error=message))
+        await queue.put(finished)
+
+    producers = [asyncio.ensure_future(produce(name)) for name in quotas]
+    try:
+        remaining = len(producers)
+        while remaining:
+            item = await queue.get()
+            if item is finished:
+                remaining -= 1
+            else:
+                yield item
+    finally:
+        for task in producers:
+            task.cancel()
+
+
+# ---- shared event loop ----
+# Scrape runs execute on the scrape_jobs thread pool, but all their HTTP goes
+# through one loop and one PoliteClient so connection reuse and per-host
+# limits hold across concurrent runs, not just within one.
+
+_loop = None
+_http = None
+_lock = threading.Lock()
+
+
+async def _make_client():
+    return PoliteClient(default_host_policy(), max_connections=SCRAPE_MAX_CONNECTIONS, cache=fetch_cache)
+
+
+def _get_loop():
+    global _loop, _http
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="scrape-io", daemon=True).start()
+            _http = asyncio.run_coroutine_threadsafe(_make_client(), loop).result()
+            _loop = loop
+        return _loop, _http
+
+
+def iter_scrape(query: str, max_results: int, sources, checkpoint=None):
+    """
+    Blocking generator for worker threads; see scrape_stream(). Pages are
+    pulled one at a time, so fetching never runs more than the prefetch
+    window ahead of ingest. Closing the generator cancels in-flight fetches.
+    """
+    loop, http = _get_loop()
+    stream = scrape_stream(http, query, max_results, sources, checkpoint)
+    try:
+        while True:
+            future = asyncio.run_coroutine_threadsafe(stream.__anext__(), loop)
+            try:
+                yield future.result(timeout=SCRAPE_PAGE_TIMEOUT)
+            except StopAsyncIteration:
+                return
+            except TimeoutError:
+                future.cancel()
+                raise
+    finally:
+        try:
+            asyncio.run_coroutine_threadsafe(stream.aclose(), loop).result(timeout=SCRAPE_PAGE_TIMEOUT)
+        except Exception:
+            logger.debug("scrape stream did not close cleanly", exc_info=True)
+
+
+def run_async(coro_fn, timeout: float = None):
+    """
+    Blocking: run `coro_fn(http)` on the shared loop with the shared
+    PoliteClient, for other fetches (e.g. listing photos) that should obey
+    the same per-host limits as scraping.
+    """
+    loop, http = _get_loop()
+    future = asyncio.run_coroutine_threadsafe(coro_fn(http), loop)
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        future.cancel()
+        raise
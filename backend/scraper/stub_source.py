@@ -0,0 +1,300 @@
+"""
+Local HTTP listing source for offline throughput and politeness testing.
+
+The server pages through deterministic listings, sleeps `latency` seconds per
+request, and answers 429 (with Retry-After) once clients exceed `rate`
+requests/second. Pages carry an ETag and answer If-None-Match with 304
+unless `etags` is off (then only the body hash can tell a page is
+unchanged). With `photos` set, listings carry photo_urls served from
+/photos/ (the first one shared between listings). With `fail_after` set, every request past that many
+answers 500, to exercise failed-run resume. It counts requests, 429s and the peak number of requests
+in flight, which is what the per-host limits in scraper.http should cap.
+
+Run from backend/:
+    python -m scraper.stub_source --port 8765 --latency 0.05 --rate 20
+and scrape it with {"sources": ["stub"]} (STUB_SOURCE_URL points at it).
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+from decimal import Decimal
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from scraper.base import Page, ScraperAdapter
+from scraper.mock_scraper import mock_listing
+
+STUB_SOURCE_URL = os.getenv("STUB_SOURCE_URL", "http://127.0.0.1:8765")
+STUB_MAX_PAGE_SIZE = 100
+STUB_STOCK_PHOTOS = 7
+STUB_PHOTO_WIDTH, STUB_PHOTO_HEIGHT = 1200, 800
+
+
+def stub_listing(query: str, i: int, base_url: str = None, photos: int = 0) -> dict:
+    item = mock_listing(query, i)
+    h = hashlib.md5(f"stub:{query}:{i}".encode("utf-8")).hexdigest()[:12]
+    item["listing_source"] = "stub"
+    item["listing_url"] = f"https://stub.example.com/listing/{h}"
+    item["description"] = f"Stub listing for query='{query}'"
+    if photos:
+        # the first photo is one of a few shared "stock" images, so content dedupe has work to do
+        names = [f"stock-{i % STUB_STOCK_PHOTOS}"] + [f"{h}-{n}" for n in range(1, photos)]
+        item["photo_urls"] = [f"{base_url}/photos/{name}.jpg" for name in names]
+    return item
+
+
+@lru_cache(maxsize=256)
+def _stub_jpeg(name: str) -> bytes:
+    from PIL import Image
+
+    rng = random.Random(name)
+    im = Image.linear_gradient("L").resize((STUB_PHOTO_WIDTH, STUB_PHOTO_HEIGHT))
+    im = Image.merge("RGB", [im.point(lambda v, k=rng.random(): int(v * k)) for _ in range(3)])
+    out = io.BytesIO()
+    im.save(out, "JPEG", quality=85)
+    return out.getvalue()
+
+
+def stub_photo(name: str, size: int) -> bytes:
+    # a real (decodable) JPEG per name, padded past its end marker up to
+    # `size` so transfer volume can be tuned independently
+    data = _stub_jpeg(name)
+    return data + random.Random(name).randbytes(max(0, size - len(data)))
+
+
+# ---- server ----
+
+class StubStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.not_modified = 0
+        self.bytes_sent = 0  # response bodies only
+        self.photos = 0
+        self.served_at = []  # monotonic timestamps of 200 responses
+
+    def enter(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def max_rate(self, window: float = 1.0) -> int:
+        """Most 200 responses served inside any `window`-second span."""
+        times = sorted(self.served_at)
+        best, lo = 0, 0
+        for hi, t in enumerate(times):
+            while t - times[lo] > window:
+                lo += 1
+            best = max(best, hi - lo + 1)
+        return best
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        if status == 200 and self.server.etags:
+            etag = f'"{hashlib.md5(body).hexdigest()[:16]}"'
+            headers = {**(headers or {}), "ETag": etag}
+            if self.headers.get("If-None-Match") == etag:
+                status, body = 304, b""
+        with self.server.stats._lock:
+            self.server.stats.bytes_sent += len(body)
+            self.server.stats.not_modified += status == 304
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_photo(self, name):
+        body = stub_photo(name, self.server.photo_size)
+        with self.server.stats._lock:
+            self.server.stats.bytes_sent += len(body)
+            self.server.stats.photos += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        if url.path != "/search" and not url.path.startswith("/photos/"):
+            self._send(404, {"error": "not found"})
+            return
+
+        server.stats.enter()
+        try:
+            if server.fail_after is not None and server.stats.requests > server.fail_after:
+                self._send(500, {"error": "injected failure"})
+                return
+
+            if not server.admit():
+                with server.stats._lock:
+                    server.stats.rejected += 1
+                self._send(429, {"error": "rate limited"}, {"Retry-After": "1"})
+                return
+
+            if url.path.startswith("/photos/"):
+                self._send_photo(url.path[len("/photos/"):].rsplit(".", 1)[0])
+                return
+
+            params = parse_qs(url.query)
+            query = params.get("q", [""])[0]
+            page = max(1, int(params.get("page", ["1"])[0]))
+            page_size = min(STUB_MAX_PAGE_SIZE, max(1, int(params.get("page_size", ["25"])[0])))
+
+            time.sleep(server.latency)
+
+            start = (page - 1) * page_size
+            end = min(start + page_size, server.total)
+            items = [stub_listing(query, i, server.url, server.photos) for i in range(start, end)]
+            with server.stats._lock:
+                server.stats.served_at.append(time.monotonic())
+            self._send(200, {
+                "items": items,
+                "page": page,
+                "total": server.total,
+                "has_more": end < server.total,
+            })
+        finally:
+            server.stats.leave()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self, address, latency=0.05, rate=20.0, total=1000, fail_after=None, etags=True,
+        photos=0, photo_size=150_000,
+    ):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.photos = photos
+        self.photo_size = photo_size
+        self.etags = etags
+        self.fail_after = fail_after
+        self.rate = rate
+        self.total = total
+        self.stats = StubStats()
+        self._tokens = float(max(1, rate))
+        self._updated = time.monotonic()
+        self._admit_lock = threading.Lock()
+
+    def admit(self) -> bool:
+        if not self.rate:
+            return True
+        with self._admit_lock:
+            now = time.monotonic()
+            self._tokens = min(max(1.0, self.rate), self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_stub_server(host="127.0.0.1", port=0, **kwargs) -> StubServer:
+    """Serve on a background thread; port=0 picks a free port (see .url)."""
+    server = StubServer((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, name="stub-source", daemon=True).start()
+    return server
+
+
+# ---- adapter ----
+
+def _parse_item(raw: dict) -> dict:
+    item = dict(raw)
+    for key in ("price", "baths"):
+        if item.get(key) is not None:
+            item[key] = Decimal(str(item[key]))
+    return item
+
+
+class StubHttpAdapter(ScraperAdapter):
+    name = "stub"
+    page_size = 25
+
+    def __init__(self, base_url: str = None):
+        self.base_url = (base_url or STUB_SOURCE_URL).rstrip("/")
+
+    async def fetch_page(self, http, query, page, page_size):
+        return await self.fetch_cached_page(
+            http,
+            f"{self.base_url}/search",
+            {"q": query, "page": page, "page_size": page_size},
+            self._parse_page,
+        )
+
+    @staticmethod
+    def _parse_page(response):
+        data = response.json()
+        return Page(
+            items=[_parse_item(raw) for raw in data["items"]],
+            has_more=data["has_more"],
+            total=data.get("total"),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rate", type=float, default=20.0, help="requests/second before 429s; 0 disables")
+    parser.add_argument("--total", type=int, default=1000, help="results per query")
+    parser.add_argument("--fail-after", type=int, default=None, help="answer 500 after this many requests")
+    parser.add_argument("--no-etags", action="store_true", help="never send ETag / 304")
+    parser.add_argument("--photos", type=int, default=0, help="photo_urls per listing")
+    parser.add_argument("--photo-size", type=int, default=150_000, help="bytes per photo")
+    args = parser.parse_args()
+
+    server = StubServer(
+        (args.host, args.port),
+        latency=args.latency, rate=args.rate, total=args.total,
+        fail_after=args.fail_after, etags=not args.no_etags,
+        photos=args.photos, photo_size=args.photo_size,
+    )
+    print(f"stub source on {server.url} (latency {args.latency}s, rate {args.rate}/s, {args.total} results/query)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        s = server.stats
+        print(
+            f"requests {s.requests}, 429s {s.rejected}, 304s {s.not_modified}, "
+            f"peak in flight {s.peak_in_flight}, {s.bytes_sent:,} body bytes"
+        )
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:  # optional speedup; the stdlib encoder produces the same JSON
+    orjson = None
+
+from models import AnalysisResult, Property, ScrapeRun
+
+# Read-only list endpoints select these columns as plain tuples instead of
+# hydrating ORM instances (no identity map, no attribute instrumentation).
+# Keys match the corresponding to_dict() so the payloads are unchanged.
+
+PROPERTY_LIST_COLUMNS = (
+    Property.id,
+    Property.listing_source,
+    Property.listing_url,
+    Property.address,
+    Property.city,
+    Property.state,
+    Property.zip,
+    Property.price,
+    Property.beds,
+    Property.baths,
+    Property.sqft,
+    Property.description,
+    Property.score_total,
+    Property.scraped_at,
+    Property.created_at,
+    Property.updated_at,
+)
+PROPERTY_LIST_KEYS = tuple(c.key for c in PROPERTY_LIST_COLUMNS)
+
+_ANALYSIS_COLUMNS = (
+    AnalysisResult.id,
+    AnalysisResult.property_id,
+    AnalysisResult.score_total,
+    AnalysisResult.score_breakdown,
+    AnalysisResult.reasons,
+    AnalysisResult.analyzed_at,
+    AnalysisResult.created_at,
+    AnalysisResult.updated_at,
+)
+ANALYSIS_LIST_KEYS = tuple(c.key for c in _ANALYSIS_COLUMNS)
+# labelled so they don't collide with the property columns in a joined row
+ANALYSIS_LIST_COLUMNS = tuple(c.label(f"analysis_{c.key}") for c in _ANALYSIS_COLUMNS)
+
+SCRAPE_RUN_LIST_COLUMNS = (
+    ScrapeRun.id,
+    ScrapeRun.query,
+    ScrapeRun.max_results,
+    ScrapeRun.sources,
+    ScrapeRun.status,
+    ScrapeRun.started_at,
+    ScrapeRun.finished_at,
+    ScrapeRun.properties_found,
+    ScrapeRun.inserted_count,
+    ScrapeRun.skipped_count,
+    ScrapeRun.error_count,
+    ScrapeRun.cache_hits,
+    ScrapeRun.cache_misses,
+)
+SCRAPE_RUN_LIST_KEYS = tuple(c.key for c in SCRAPE_RUN_LIST_COLUMNS)
+
+
+def property_rows_to_dicts(rows, with_analysis: bool = False):
+    n = len(PROPERTY_LIST_KEYS)
+    if not with_analysis:
+        return [dict(zip(PROPERTY_LIST_KEYS, row)) for row in rows]
+
+    items = []
+    for row in rows:
+        item = dict(zip(PROPERTY_LIST_KEYS, row[:n]))
+        analysis = row[n:]
+        item["analysis"] = dict(zip(ANALYSIS_LIST_KEYS, analysis)) if analysis[0] is not None else None
+        items.append(item)
+    return items
+
+
+def rows_to_dicts(rows, keys):
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def _default(value):
+    # Same conversions as the models' to_dict()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload) -> bytes:
+    if orjson is not None:
+        # datetimes are encoded natively, in the same form as isoformat()
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(payload, default=_default, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def json_response(payload, status: int = 200):
+    return current_app.response_class(dumps(payload), status=status, mimetype="application/json")
@@ -0,0 +1,234 @@
+"""
+Resized variants of stored listing photos, for srcset.
+
+Each stored original gets THUMBNAIL_WIDTHS x THUMBNAIL_FORMATS variants next
+to it (photos/<aa>/<sha256>-<width>w.<ext>). Decoding and encoding run in a
+ProcessPoolExecutor, since resizing is CPU-bound and holds the GIL. The
+photo pipeline derives variants for new originals as they are uploaded,
+while it still has the bytes. `python -m thumbnails` backfills photos that
+have a stored original but no variants yet, then fetches photos still
+served from their original host (seed data, generated listings) into the
+store so they get variants too (photos.adopt_external_photos; skipped with
+--stored-only).
+
+PropertyPhoto.variants is NULL until derivation has run, [] when the image
+could not be decoded or is already narrower than the smallest variant, and
+otherwise a list of {"width", "height", "format", "url"}.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from posixpath import splitext
+from urllib.parse import urlsplit
+
+from sqlalchemy import bindparam, update
+
+from models import PropertyPhoto
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WIDTHS = [int(w) for w in os.getenv("THUMBNAIL_WIDTHS", "320,640,1024").split(",") if w.strip()]
+THUMBNAIL_FORMATS = [f.strip() for f in os.getenv("THUMBNAIL_FORMATS", "webp,jpeg").split(",") if f.strip()]
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+THUMBNAIL_WEBP_METHOD = int(os.getenv("THUMBNAIL_WEBP_METHOD", "2"))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", str(os.cpu_count() or 1)))
+THUMBNAIL_ENABLED = os.getenv("THUMBNAIL_ENABLED", "true").lower() in ("1", "true", "yes")
+THUMBNAIL_BACKFILL_BATCH = 200
+
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+CONTENT_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+_pool = None
+_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            # spawn: the web/worker process has threads (scrape pool, asyncio loop)
+            # that a forked child would inherit mid-flight
+            _pool = ProcessPoolExecutor(
+                max_workers=THUMBNAIL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def derive_many(blobs: dict):
+    """{content_hash: bytes} -> {content_hash: (width, height, variants) or exception}"""
+    # Pillow is only needed where photos are processed, not in every importer
+    from imaging import derive_variants
+
+    pool = _get_pool()
+    futures = {
+        content_hash: pool.submit(
+            derive_variants, data, THUMBNAIL_WIDTHS, THUMBNAIL_FORMATS, THUMBNAIL_QUALITY, THUMBNAIL_WEBP_METHOD
+        )
+        for content_hash, data in blobs.items()
+    }
+    results = {}
+    for content_hash, future in futures.items():
+        try:
+            results[content_hash] = future.result()
+        except Exception as e:
+            results[content_hash] = e
+    return results
+
+
+def derive_and_store(store, blobs: dict):
+    """
+    Derive and upload variants for {content_hash: original bytes}.
+
+    Returns {content_hash: {"width", "height", "variants"}} for every hash
+    that is done, including undecodable images (variants []). Hashes whose
+    variant uploads failed are left out, so they stay NULL and get retried.
+    """
+    if not THUMBNAIL_ENABLED or not blobs:
+        return {}
+
+    done = {}
+    objects = {}
+    planned = {}
+    results = derive_many(blobs)
+    if any(isinstance(r, BrokenExecutor) for r in results.values()):
+        # a worker died (OOM, killed); those photos stay pending for a retry
+        logger.error("thumbnail pool broke; restarting it")
+        _reset_pool()
+    for content_hash, result in results.items():
+        if isinstance(result, BrokenExecutor):
+            continue
+        if isinstance(result, Exception):
+            logger.warning("photo %s: cannot derive variants: %s", content_hash, result)
+            done[content_hash] = {"width": None, "height": None, "variants": []}
+            continue
+        width, height, variants = result
+        planned[content_hash] = (width, height, [])
+        for v_width, v_height, fmt, data in variants:
+            key = store.variant_key(content_hash, v_width, EXTENSIONS[fmt])
+            objects[key] = (data, CONTENT_TYPES[fmt])
+            planned[content_hash][2].append((key, v_width, v_height, fmt))
+
+    stored, failed = store.upload_objects(objects)
+    for key, error in failed.items():
+        logger.warning("variant %s upload failed: %s", key, error)
+
+    for content_hash, (width, height, variants) in planned.items():
+        if any(key in failed for key, *_ in variants):
+            continue
+        done[content_hash] = {
+            "width": width,
+            "height": height,
+            "variants": [
+                {"width": v_width, "height": v_height, "format": fmt, "url": stored[key]}
+                for key, v_width, v_height, fmt in variants
+            ],
+        }
+    return done
+
+
+def save_variants(session, derived: dict):
+    """
+    Record derived variants on every PropertyPhoto with those hashes that has
+    none yet, and bump the owning properties so cached details refresh.
+    """
+    from photos import touch_properties
+
+    if not derived:
+        return
+    photos = PropertyPhoto.__table__
+    stmt = (
+        update(photos)
+        .where(photos.c.content_hash == bindparam("b_content_hash"))
+        .where(photos.c.variants.is_(None))
+        .values(
+            width=bindparam("b_width"),
+            height=bindparam("b_height"),
+            variants=bindparam("b_variants", type_=photos.c.variants.type),
+        )
+    )
+    session.connection().execute(stmt, [
+        {"b_content_hash": h, "b_width": d["width"], "b_height": d["height"], "b_variants": d["variants"]}
+        for h, d in derived.items()
+    ])
+    property_ids = [
+        pid for (pid,) in session.query(PropertyPhoto.property_id)
+        .filter(PropertyPhoto.content_hash.in_(list(derived)))
+        .distinct()
+    ]
+    touch_properties(session, property_ids)
+
+
+def backfill(session, store, batch_size: int = THUMBNAIL_BACKFILL_BATCH):
+    """
+    Derive variants for stored photos that have none, batch by batch, one
+    commit per batch. Already-derived hashes are never touched again.
+    """
+    processed = 0
+    last_hash = ""
+    while True:
+        rows = (
+            session.query(PropertyPhoto.content_hash, PropertyPhoto.photo_url)
+            .filter(PropertyPhoto.content_hash.isnot(None))
+            .filter(PropertyPhoto.variants.is_(None))
+            .filter(PropertyPhoto.content_hash > last_hash)
+            .distinct(PropertyPhoto.content_hash)
+            .order_by(PropertyPhoto.content_hash)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return processed
+        last_hash = rows[-1].content_hash
+
+        blobs = {}
+        for content_hash, photo_url in rows:
+            extension = splitext(urlsplit(photo_url).path)[1].lstrip(".") or "bin"
+            try:
+                blobs[content_hash] = store.download(store.key_for(content_hash, extension))
+            except Exception as e:
+                logger.warning("photo %s: original not readable: %s", content_hash, e)
+
+        derived = derive_and_store(store, blobs)
+        save_variants(session, derived)
+        session.commit()
+        processed += len(derived)
+        logger.info("thumbnails: %s photos derived so far", processed)
+
+
+def main():
+    from db import SessionLocal
+    from photos import adopt_external_photos, photo_store
+
+    parser = argparse.ArgumentParser(description="Derive missing photo variants")
+    parser.add_argument("--batch-size", type=int, default=THUMBNAIL_BACKFILL_BATCH)
+    parser.add_argument("--stored-only", action="store_true", help="skip photos not in the store yet")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if photo_store is None:
+        raise SystemExit("PHOTO_BUCKET is not set")
+
+    session = SessionLocal()
+    try:
+        print(f"derived variants for {backfill(session, photo_store, args.batch_size)} photos")
+        if not args.stored_only:
+            print(f"fetched and stored {adopt_external_photos(session, photo_store)} external photos")
+    finally:
+        session.close()
+        photo_store.shutdown()
+
+
+if __name__ == "__main__":
+    main()